@@ -1,29 +1,43 @@
 import asyncio
 import aiohttp
+import copy
 import logging
 import io
 import os
 import ssl
+import threading
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 import certifi
+from collections import OrderedDict
 import json
 from requests import status_codes, adapters, PreparedRequest
-from typing import Any, Dict, Optional, Union
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, Union
 from enum import Enum
 from urllib.parse import urlencode, urlparse
 from requests import status_codes, adapters, PreparedRequest, Session
-from darabonba.exceptions import RequiredArgumentException, RetryError
-from darabonba.model import DaraModel
+from requests.utils import super_len
+from darabonba.event import SSEEvent
+from darabonba.exceptions import RequiredArgumentException, ResponseException, RetryError
+from darabonba.model import DaraModel, DaraSlotsModel
 from darabonba.request import DaraRequest
 from darabonba.response import DaraResponse
-from darabonba.utils.stream import BaseStream, SSEResponseWrapper, SyncSSEResponseWrapper
+from darabonba.utils import json_codec
+from darabonba.utils.stream import (BaseStream, DEFAULT_SSE_MAX_EVENT_SIZE, DEFAULT_SSE_MAX_LINE_SIZE, SSEParser,
+                                     SSEResponseWrapper, Stream, SyncSSEResponseWrapper)
 from darabonba.policy.retry import RetryOptions, RetryPolicyContext
+from darabonba.pool import AsyncSessionPool, SessionPool
 
 
 DEFAULT_CONNECT_TIMEOUT = 5000
 DEFAULT_READ_TIMEOUT = 10000
 DEFAULT_POOL_SIZE = 10
+DEFAULT_UPLOAD_CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_CONCURRENCY = DEFAULT_POOL_SIZE
+DEFAULT_SSE_RETRY_DELAY = 3000
+DEFAULT_SSE_MAX_RECONNECTS = 3
+DEFAULT_SSE_SEEN_IDS = 1024
 MAX_DELAY_TIME = 120 * 1000
 MIN_DELAY_TIME = 100
 
@@ -34,12 +48,123 @@ logger.addHandler(ch)
 
 class _ModelEncoder(json.JSONEncoder):
     def default(self, o: Any) -> Any:
-        if isinstance(o, DaraModel):
+        if isinstance(o, (DaraModel, DaraSlotsModel)):
             return o.to_map()
         elif isinstance(o, bytes):
             return o.decode('utf-8')
         super().default(o)
 
+
+_model_default = _ModelEncoder().default
+
+class _UploadBody:
+    """
+    A request body read chunk by chunk while it is sent, requests sets
+    Content-Length from __len__ when the length is known and falls back
+    to chunked encoding otherwise.
+    """
+
+    def __init__(self, stream, chunk_size, length=None):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.length = length
+
+    def __iter__(self):
+        readinto = getattr(self.stream, 'readinto', None)
+        if readinto is not None:
+            # reuse one buffer, each chunk is fully sent before the next read
+            buf = bytearray(self.chunk_size)
+            view = memoryview(buf)
+            while True:
+                n = readinto(buf)
+                if not n:
+                    return
+                yield view[:n]
+        while True:
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                return
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            yield chunk
+
+
+class _SizedUploadBody(_UploadBody):
+    def __len__(self):
+        return self.length
+
+
+async def _iter_stream_async(stream, chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE):
+    # read the chunks like the sync upload, off the event loop as the
+    # stream may read a file
+    loop = asyncio.get_running_loop()
+    chunks = iter(_UploadBody(stream, chunk_size))
+    while True:
+        chunk = await loop.run_in_executor(None, next, chunks, None)
+        if chunk is None:
+            return
+        # the buffer of readinto is reused for the next chunk, which the
+        # transport may not have sent yet
+        yield bytes(chunk) if isinstance(chunk, memoryview) else chunk
+
+class _SSEResumeState:
+    """
+    The position of a resumable SSE stream: the last event id to resume
+    from, the reconnection delay set by the server and the recent event
+    ids used to drop the events replayed after a reconnection.
+    """
+
+    def __init__(self, last_event_id: str = None, retry: int = DEFAULT_SSE_RETRY_DELAY,
+                 max_seen: int = DEFAULT_SSE_SEEN_IDS):
+        self.last_event_id = last_event_id
+        self.retry = retry
+        self.reconnects = 0
+        self._max_seen = max_seen
+        self._seen = OrderedDict()
+        if last_event_id is not None:
+            self._seen[last_event_id] = None
+
+    def prepare(self, request: DaraRequest) -> DaraRequest:
+        """
+        @return: a copy of the request with the Last-Event-ID header
+        """
+        request = copy.copy(request)
+        request.headers = dict(request.headers)
+        if self.last_event_id:
+            request.headers['last-event-id'] = self.last_event_id
+        return request
+
+    def accept(self, event: SSEEvent) -> bool:
+        """
+        Record the event
+        @return: False if the event was already delivered
+        """
+        if event.retry is not None:
+            self.retry = event.retry
+        if event.id is not None:
+            if event.id in self._seen:
+                return False
+            self._seen[event.id] = None
+            if len(self._seen) > self._max_seen:
+                self._seen.popitem(last=False)
+            self.last_event_id = event.id
+        # only new events show progress, replayed ones do not
+        self.reconnects = 0
+        return True
+
+    def update(self, parser: SSEParser):
+        # the id and retry fields also count in blocks without data, an id
+        # already seen comes from a replay and would resume from further back
+        if parser.last_event_id is not None and parser.last_event_id not in self._seen:
+            self.last_event_id = parser.last_event_id
+        if parser.retry is not None:
+            self.retry = parser.retry
+
+    def should_reconnect(self, max_reconnects: int) -> bool:
+        self.reconnects += 1
+        return self.reconnects <= max_reconnects
+
+
 class TLSVersion(Enum):
     TLSv1 = 'TLSv1'
     TLSv1_1 = 'TLSv1.1'
@@ -49,8 +174,15 @@ class TLSVersion(Enum):
 class _TLSAdapter(adapters.HTTPAdapter):
     """A HTTPAdapter that uses an arbitrary TLS version."""
 
-    def __init__(self, ssl_context=None, **kwargs):
+    def __init__(self, ssl_context=None, ssl_options: tuple = None, **kwargs):
+        """
+        @param ssl_context: the SSL context of the connections
+        @param ssl_options: the (ca, cert, tls_min_version) to get the SSL
+        context by DaraCore.get_ssl_context for each connection pool, so
+        that a modified CA file is loaded again
+        """
         self.ssl_context = ssl_context
+        self.ssl_options = ssl_options
         super().__init__(**kwargs)
 
     def init_poolmanager(self, *args, **kwargs):
@@ -58,11 +190,33 @@ class _TLSAdapter(adapters.HTTPAdapter):
         kwargs['ssl_context'] = self.ssl_context
         super().init_poolmanager(*args, **kwargs)
 
+    def build_connection_pool_key_attributes(self, request, verify, cert=None):
+        """The SSL context already holds the CA and the client certificate."""
+        if self.ssl_options is not None:
+            self.ssl_context = DaraCore.get_ssl_context(*self.ssl_options)
+        if self.ssl_context is None:
+            return super().build_connection_pool_key_attributes(request, verify, cert)
+        host_params, pool_kwargs = super().build_connection_pool_key_attributes(request, bool(verify), None)
+        # a new context, e.g. of a modified CA file, keys a new connection pool
+        pool_kwargs['ssl_context'] = self.ssl_context
+        return host_params, pool_kwargs
+
+    def cert_verify(self, conn, url, verify, cert):
+        """Do not load the CA and the client certificate into the shared SSL context again."""
+        if self.ssl_context is None:
+            return super().cert_verify(conn, url, verify, cert)
+        conn.cert_reqs = 'CERT_REQUIRED' if verify else 'CERT_NONE'
+
 
 class DaraCore:
-    _sessions = {}
+    _sessions = SessionPool()
+    _async_sessions = AsyncSessionPool()
+    # not used by the pooled sessions, which get adapters sized by
+    # maxIdleConns, kept for the code mounting them
     http_adapter = adapters.HTTPAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE * 4)
     https_adapter = adapters.HTTPAdapter(pool_connections=DEFAULT_POOL_SIZE, pool_maxsize=DEFAULT_POOL_SIZE * 4)
+    _ssl_contexts = {}
+    _ssl_contexts_lock = threading.Lock()
 
     @staticmethod
     def to_json_string(
@@ -74,9 +228,7 @@ class DaraCore:
         """
         if isinstance(val, str):
             return str(val)
-        return json.dumps(
-            val, cls=_ModelEncoder, ensure_ascii=False, separators=(",", ":")
-        )
+        return json_codec.dumps(val, default=_model_default)
 
     @staticmethod
     def _set_tls_minimum_version(sls_context, tls_min_version):
@@ -93,16 +245,68 @@ class DaraCore:
         return context
     
     @staticmethod
-    def get_adapter(prefix, tls_min_version: str = None):
-        ca_cert = certifi.where()
-        context = ssl.create_default_context()
-        if ca_cert and prefix.upper() == 'HTTPS':
+    def get_ssl_context(ca: str = None, cert=None, tls_min_version: str = None) -> ssl.SSLContext:
+        """
+        Get the shared SSL context of the settings, it is created once
+        and rebuilt only when the CA file is modified
+        @param ca: the CA file, the certifi bundle by default
+        @param cert: the client certificate file or (certificate, key) pair
+        @param tls_min_version: the minimum TLS version
+        @return: the SSL context
+        """
+        ca = ca or certifi.where()
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        key = (ca, cert, tls_min_version)
+        try:
+            mtime = os.stat(ca).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        with DaraCore._ssl_contexts_lock:
+            cached = DaraCore._ssl_contexts.get(key)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+
+            context = ssl.create_default_context()
             context = DaraCore._set_tls_minimum_version(context, tls_min_version)
-            context.load_verify_locations(ca_cert)
-        adapter = _TLSAdapter(ssl_context=context, pool_connections=DEFAULT_POOL_SIZE,
-                              pool_maxsize=DEFAULT_POOL_SIZE * 4)
+            if os.path.isdir(ca):
+                context.load_verify_locations(capath=ca)
+            else:
+                context.load_verify_locations(ca)
+            if cert is not None:
+                if isinstance(cert, tuple):
+                    context.load_cert_chain(certfile=cert[0], keyfile=cert[1] if len(cert) > 1 else None)
+                else:
+                    context.load_cert_chain(certfile=cert, keyfile=None)
+            DaraCore._ssl_contexts[key] = (mtime, context)
+            return context
+
+    @staticmethod
+    def get_adapter(prefix, tls_min_version: str = None, max_idle_conns: int = None,
+                    verify: Union[bool, str] = True, cert=None):
+        context = options = None
+        if prefix.upper() == 'HTTPS' and verify:
+            ca = verify if isinstance(verify, str) else None
+            options = (ca, cert, tls_min_version)
+            context = DaraCore.get_ssl_context(*options)
+        # connections beyond the pool size are opened rather than waited
+        # for, and discarded once released
+        adapter = _TLSAdapter(ssl_context=context, ssl_options=options, pool_connections=DEFAULT_POOL_SIZE,
+                              pool_maxsize=int(max_idle_conns or DEFAULT_POOL_SIZE * 4),
+                              pool_block=False)
         return adapter
 
+    @staticmethod
+    def _get_connector(ssl_context: ssl.SSLContext = None, keep_alive: bool = None) -> aiohttp.TCPConnector:
+        # aiohttp keeps every idle connection and its limit caps the
+        # connections in use, so maxIdleConns is not mapped to it and the
+        # requests are not throttled below the default limit
+        kwargs = {'force_close': keep_alive is False}
+        if ssl_context is not None:
+            kwargs['ssl'] = ssl_context
+        return aiohttp.TCPConnector(**kwargs)
+
     @staticmethod
     def _prepare_http_debug(request, symbol):
         base = ''
@@ -157,6 +361,62 @@ class DaraCore:
             url += urlencode(encode_query)
         return url.rstrip("?&")
 
+    @staticmethod
+    def _get_session_key(request: DaraRequest, verify, cert, tls_min_version, proxies, *options) -> tuple:
+        """
+        Get the identity of a pooled session, requests with the same
+        endpoint, TLS and proxy settings share one session
+        """
+        protocol = request.protocol.lower()
+        host = (request.headers.get('host') or '').rstrip('/')
+        if protocol != 'https':
+            verify = cert = tls_min_version = None
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        return (protocol, host, request.port, verify, cert, tls_min_version, proxies) + options
+
+    @staticmethod
+    def _prepare_body(body, chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE):
+        """
+        Wrap a readable body so that it is uploaded chunk by chunk with an
+        exact Content-Length instead of being buffered
+        @return: the data to prepare the request with
+        """
+        if isinstance(body, (bytes, bytearray, memoryview)) or not hasattr(body, 'read'):
+            return body
+        if isinstance(body, BaseStream):
+            try:
+                length = len(body)
+            except NotImplementedError:
+                length = None
+        else:
+            length = super_len(body) or None
+        if length is None:
+            return _UploadBody(body, chunk_size)
+        return _SizedUploadBody(body, chunk_size, length)
+
+    @staticmethod
+    def _prepare_async_body(request, chunk_size: int = DEFAULT_UPLOAD_CHUNK_SIZE):
+        """
+        Get the aiohttp payload of the request body, streams are sent
+        chunk by chunk rather than read into memory
+        @param chunk_size: the size of the chunks read from a stream
+        @return: the payload and the headers to send with it
+        """
+        headers = request.headers.copy()
+        body = request.body
+        if isinstance(body, BaseStream):
+            if not any(k.lower() == 'content-length' for k in headers):
+                try:
+                    headers['content-length'] = str(len(body))
+                except NotImplementedError:
+                    # unknown length, aiohttp falls back to chunked encoding
+                    pass
+            return _iter_stream_async(body, chunk_size), headers
+        elif isinstance(body, str):
+            return body.encode('utf-8'), headers
+        return body or b'', headers
+
     @staticmethod
     async def async_do_action(
             request: DaraRequest,
@@ -194,31 +454,10 @@ class DaraCore:
             if not proxy:
                 proxy = os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy')
 
-        connector = None
-        ca_cert = certifi.where()
         ssl_context = None
-        if isinstance(verify, str) and request.protocol.upper() == 'HTTPS':
-            ssl_context = ssl.create_default_context()
-            ssl_context = DaraCore._set_tls_minimum_version(ssl_context, tls_min_version)
-            ssl_context.load_verify_locations(verify)
-            # Handle cert if provided
-            if cert is not None:
-                if isinstance(cert, (list, tuple)):
-                    ssl_context.load_cert_chain(certfile=cert[0], keyfile=cert[1] if len(cert) > 1 else None)
-                else:
-                    ssl_context.load_cert_chain(certfile=cert, keyfile=None)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-        elif ca_cert and request.protocol.upper() == 'HTTPS' and verify:
-            ssl_context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-            ssl_context = DaraCore._set_tls_minimum_version(ssl_context, tls_min_version)
-            ssl_context.load_verify_locations(ca_cert)
-            # Handle cert if provided
-            if cert is not None:
-                if isinstance(cert, (list, tuple)):
-                    ssl_context.load_cert_chain(certfile=cert[0], keyfile=cert[1] if len(cert) > 1 else None)
-                else:
-                    ssl_context.load_cert_chain(certfile=cert, keyfile=None)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
+        if request.protocol.upper() == 'HTTPS' and verify:
+            ca = verify if isinstance(verify, str) else None
+            ssl_context = DaraCore.get_ssl_context(ca, cert, tls_min_version)
         else:
             verify = False
 
@@ -226,22 +465,23 @@ class DaraCore:
             sock_read=read_timeout,
             sock_connect=connect_timeout
         )
-        async with aiohttp.ClientSession(
-                connector=connector
-        ) as s:
-            body = b''
-            if isinstance(request.body, BaseStream):
-                for content in request.body:
-                    body += content
-            elif isinstance(request.body, str):
-                body = request.body.encode('utf-8')
-            else:
-                body = request.body or b''
-            try:
+
+        keep_alive = runtime_option.get('keepAlive')
+
+        def session_factory():
+            connector = DaraCore._get_connector(ssl_context, keep_alive)
+            return aiohttp.ClientSession(connector=connector)
+
+        session_key = DaraCore._get_session_key(request, verify, cert, tls_min_version, proxy, keep_alive)
+
+        chunk_size = runtime_option.get('uploadChunkSize') or DEFAULT_UPLOAD_CHUNK_SIZE
+        body, headers = DaraCore._prepare_async_body(request, int(chunk_size))
+        try:
+            async with DaraCore._async_sessions.session(session_key, session_factory) as s:
                 ssl_param: Union[bool, ssl.SSLContext] = ssl_context if ssl_context is not None else bool(verify)
                 async with s.request(request.method, url,
                                      data=body,
-                                     headers=request.headers,
+                                     headers=headers,
                                      ssl=ssl_param,
                                      proxy=proxy,
                                      timeout=timeout) as response:
@@ -251,10 +491,18 @@ class DaraCore:
                     tea_resp.status_code = response.status
                     tea_resp.status_message = response.reason
                     tea_resp.response = response
-            except IOError as e:
-                raise RetryError(str(e))
+        except IOError as e:
+            raise RetryError(str(e))
         return tea_resp
 
+    @staticmethod
+    async def close_async_sessions():
+        """
+        Close the pooled aiohttp sessions of the running event loop now,
+        otherwise they are closed along with the loop
+        """
+        await DaraCore._async_sessions.close()
+
     @staticmethod
     def do_action(
             request: DaraRequest,
@@ -281,14 +529,17 @@ class DaraCore:
 
         if isinstance(request.body, str):
             request.body = request.body.encode('utf-8')
+        chunk_size = runtime_option.get('uploadChunkSize') or DEFAULT_UPLOAD_CHUNK_SIZE
 
         p = PreparedRequest()
         p.prepare(
             method=request.method.upper(),
             url=url,
-            data=request.body,
+            data=DaraCore._prepare_body(request.body, int(chunk_size)),
             headers=request.headers,
         )
+        if runtime_option.get('keepAlive') is False:
+            p.headers['Connection'] = 'close'
 
         proxies = {}
         http_proxy = runtime_option.get('httpProxy')
@@ -307,12 +558,12 @@ class DaraCore:
         if no_proxy:
             proxies['no_proxy'] = no_proxy
 
-        host = request.headers.get('host')
-        host = host.rstrip('/')
-
-        session_key = f'{request.protocol.lower()}://{host}:{request.port}'
+        max_idle_conns = runtime_option.get('maxIdleConns')
+        session_key = DaraCore._get_session_key(request, verify, cert, tls_min_version,
+                                                tuple(sorted(proxies.items())), max_idle_conns)
         session = DaraCore._get_session(session_key=session_key, protocol=request.protocol,
-                                       tls_min_version=tls_min_version, verify=verify)
+                                        tls_min_version=tls_min_version, verify=verify,
+                                        max_idle_conns=max_idle_conns, cert=cert)
         try:
             resp = session.send(
                 p,
@@ -323,6 +574,8 @@ class DaraCore:
             )
         except IOError as e:
             raise RetryError(str(e))
+        finally:
+            DaraCore._sessions.release(session_key, session)
 
         debug = runtime_option.get('debug') or os.getenv('DEBUG')
         if debug and debug.lower() == 'sdk':
@@ -336,6 +589,62 @@ class DaraCore:
         response.response = resp
         return response
 
+    @staticmethod
+    def do_actions_batch(
+            requests: List[DaraRequest],
+            runtime_option=None,
+            concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    ) -> List[Union[DaraResponse, Exception]]:
+        """
+        Send the independent requests concurrently on a thread pool,
+        sharing the pooled sessions and connections
+        @param requests: the requests to send
+        @param runtime_option: the runtime options of every request
+        @param concurrency: the maximum number of requests in flight
+        @return: the responses in the order of the requests, the exception
+        raised by a request is returned in its place
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be a positive integer')
+
+        def send(request):
+            try:
+                return DaraCore.do_action(request, runtime_option)
+            except Exception as e:
+                return e
+
+        if not requests:
+            return []
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(requests))) as executor:
+            return list(executor.map(send, requests))
+
+    @staticmethod
+    async def async_do_actions_batch(
+            requests: List[DaraRequest],
+            runtime_option=None,
+            concurrency: int = DEFAULT_BATCH_CONCURRENCY
+    ) -> List[Union[DaraResponse, Exception]]:
+        """
+        Send the independent requests concurrently on the running loop,
+        sharing the pooled sessions and connections
+        @param requests: the requests to send
+        @param runtime_option: the runtime options of every request
+        @param concurrency: the maximum number of requests in flight
+        @return: the responses in the order of the requests, the exception
+        raised by a request is returned in its place
+        """
+        if concurrency < 1:
+            raise ValueError('concurrency must be a positive integer')
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(request):
+            async with semaphore:
+                try:
+                    return await DaraCore.async_do_action(request, runtime_option)
+                except Exception as e:
+                    return e
+
+        return list(await asyncio.gather(*[send(request) for request in requests]))
 
     @staticmethod
     async def async_do_sse_action(
@@ -374,33 +683,13 @@ class DaraCore:
             if not proxy:
                 proxy = os.environ.get('HTTPS_PROXY') or os.environ.get('https_proxy')
 
-        connector = None
-        ca_cert = certifi.where()
         ssl_context = None
-        if isinstance(verify, str) and request.protocol.upper() == 'HTTPS':
-            ssl_context = ssl.create_default_context()
-            ssl_context = DaraCore._set_tls_minimum_version(ssl_context, tls_min_version)
-            ssl_context.load_verify_locations(verify)
-            # Handle cert if provided
-            if cert is not None:
-                if isinstance(cert, (list, tuple)):
-                    ssl_context.load_cert_chain(certfile=cert[0], keyfile=cert[1] if len(cert) > 1 else None)
-                else:
-                    ssl_context.load_cert_chain(certfile=cert, keyfile=None)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
-        elif ca_cert and request.protocol.upper() == 'HTTPS' and verify:
-            ssl_context = ssl.create_default_context(ssl.Purpose.SERVER_AUTH)
-            ssl_context = DaraCore._set_tls_minimum_version(ssl_context, tls_min_version)
-            ssl_context.load_verify_locations(ca_cert)
-            # Handle cert if provided
-            if cert is not None:
-                if isinstance(cert, (list, tuple)):
-                    ssl_context.load_cert_chain(certfile=cert[0], keyfile=cert[1] if len(cert) > 1 else None)
-                else:
-                    ssl_context.load_cert_chain(certfile=cert, keyfile=None)
-            connector = aiohttp.TCPConnector(ssl=ssl_context)
+        if request.protocol.upper() == 'HTTPS' and verify:
+            ca = verify if isinstance(verify, str) else None
+            ssl_context = DaraCore.get_ssl_context(ca, cert, tls_min_version)
         else:
             verify = False
+        connector = DaraCore._get_connector(ssl_context, runtime_option.get('keepAlive'))
 
         timeout = aiohttp.ClientTimeout(
             sock_read=read_timeout,
@@ -409,17 +698,10 @@ class DaraCore:
 
         session = aiohttp.ClientSession(connector=connector)
         
-        body = b''
-        if isinstance(request.body, BaseStream):
-            for content in request.body:
-                body += content
-        elif isinstance(request.body, str):
-            body = request.body.encode('utf-8')
-        else:
-            body = request.body or b''
+        chunk_size = runtime_option.get('uploadChunkSize') or DEFAULT_UPLOAD_CHUNK_SIZE
+        body, headers = DaraCore._prepare_async_body(request, int(chunk_size))
 
         try:
-            headers = request.headers.copy()
             ssl_param: Union[bool, ssl.SSLContext] = ssl_context if ssl_context is not None else bool(verify)
             response = await session.request(
                 request.method, 
@@ -467,14 +749,17 @@ class DaraCore:
 
         if isinstance(request.body, str):
             request.body = request.body.encode('utf-8')
+        chunk_size = runtime_option.get('uploadChunkSize') or DEFAULT_UPLOAD_CHUNK_SIZE
 
         p = PreparedRequest()
         p.prepare(
             method=request.method.upper(),
             url=url,
-            data=request.body,
+            data=DaraCore._prepare_body(request.body, int(chunk_size)),
             headers=request.headers,
         )
+        if runtime_option.get('keepAlive') is False:
+            p.headers['Connection'] = 'close'
 
         proxies = {}
         http_proxy = runtime_option.get('httpProxy')
@@ -493,12 +778,12 @@ class DaraCore:
         if no_proxy:
             proxies['no_proxy'] = no_proxy
 
-        host = request.headers.get('host')
-        host = host.rstrip('/') if host else ''
-
-        session_key = f'{request.protocol.lower()}://{host}:{request.port}'
+        max_idle_conns = runtime_option.get('maxIdleConns')
+        session_key = DaraCore._get_session_key(request, verify, cert, tls_min_version,
+                                                tuple(sorted(proxies.items())), max_idle_conns)
         session = DaraCore._get_session(session_key=session_key, protocol=request.protocol,
-                                    tls_min_version=tls_min_version, verify=verify)
+                                        tls_min_version=tls_min_version, verify=verify,
+                                        max_idle_conns=max_idle_conns, cert=cert)
         try:
             resp = session.send(
                 p,
@@ -509,7 +794,11 @@ class DaraCore:
                 stream=True
             )
         except IOError as e:
+            DaraCore._sessions.release(session_key, session)
             raise RetryError(str(e))
+        except BaseException:
+            DaraCore._sessions.release(session_key, session)
+            raise
 
         debug = runtime_option.get('debug') or os.getenv('DEBUG')
         if debug and debug.lower() == 'sdk':
@@ -519,9 +808,97 @@ class DaraCore:
         response.status_message = resp.reason
         response.status_code = resp.status_code
         response.headers = {k.lower(): v for k, v in resp.headers.items()}
-        response.body = SyncSSEResponseWrapper(session, resp)
+        # the session stays in use until the events are read
+        response.body = SyncSSEResponseWrapper(
+            session, resp, release=lambda: DaraCore._sessions.release(session_key, session))
         
         return response
+
+    @staticmethod
+    def do_resumable_sse_action(
+            request: DaraRequest,
+            runtime_option=None,
+            max_reconnects: int = DEFAULT_SSE_MAX_RECONNECTS,
+            last_event_id: str = None
+    ) -> Generator[SSEEvent, None, None]:
+        """
+        Send the SSE request and read its events, when the connection drops
+        it is sent again with the Last-Event-ID header after the delay set
+        by the server retry field, and the replayed events are skipped
+        @param request: the request, it must be repeatable
+        @param runtime_option: the runtime options
+        @param max_reconnects: the maximum reconnections in a row without a new event
+        @param last_event_id: the event id to resume from
+        @return: the generator of the events
+        """
+        state = _SSEResumeState(last_event_id)
+        while True:
+            try:
+                response = DaraCore.do_sse_action(state.prepare(request), runtime_option)
+                if not 200 <= response.status_code < 300:
+                    raise DaraCore._sse_response_error(response, Stream.read_as_string(response.body))
+                parser = SSEParser(DEFAULT_SSE_MAX_LINE_SIZE, DEFAULT_SSE_MAX_EVENT_SIZE)
+                try:
+                    for event in parser.parse(response.body):
+                        if state.accept(event):
+                            yield event
+                finally:
+                    state.update(parser)
+                return
+            except (RetryError, IOError) as e:
+                if not state.should_reconnect(max_reconnects):
+                    raise e
+            DaraCore.sleep(state.retry)
+
+    @staticmethod
+    async def async_do_resumable_sse_action(
+            request: DaraRequest,
+            runtime_option=None,
+            max_reconnects: int = DEFAULT_SSE_MAX_RECONNECTS,
+            last_event_id: str = None
+    ) -> AsyncGenerator[SSEEvent, None]:
+        """
+        Send the SSE request and read its events, when the connection drops
+        it is sent again with the Last-Event-ID header after the delay set
+        by the server retry field, and the replayed events are skipped
+        @param request: the request, it must be repeatable
+        @param runtime_option: the runtime options
+        @param max_reconnects: the maximum reconnections in a row without a new event
+        @param last_event_id: the event id to resume from
+        @return: the async generator of the events
+        """
+        state = _SSEResumeState(last_event_id)
+        while True:
+            try:
+                response = await DaraCore.async_do_sse_action(state.prepare(request), runtime_option)
+                if not 200 <= response.status_code < 300:
+                    raise DaraCore._sse_response_error(response, await Stream.read_as_string_async(response.body))
+                parser = SSEParser(DEFAULT_SSE_MAX_LINE_SIZE, DEFAULT_SSE_MAX_EVENT_SIZE)
+                try:
+                    async for chunk in response.body:
+                        for event in parser.feed(chunk):
+                            if state.accept(event):
+                                yield event
+                    for event in parser.close():
+                        if state.accept(event):
+                            yield event
+                finally:
+                    state.update(parser)
+                return
+            except (RetryError, IOError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if not state.should_reconnect(max_reconnects):
+                    raise e
+            await DaraCore.sleep_async(state.retry)
+
+    @staticmethod
+    def _sse_response_error(response: DaraResponse, body: str) -> ResponseException:
+        return ResponseException(
+            code=str(response.status_code),
+            message=body or response.status_message,
+            status_code=response.status_code,
+            data={'statusCode': response.status_code}
+        )
+
     @staticmethod
     def get_response_body(resp) -> str:
         return resp.content.decode("utf-8")
@@ -601,7 +978,7 @@ class DaraCore:
         for item in dic_list:
             if isinstance(item, dict):
                 dic_result.update(item)
-            elif isinstance(item, DaraModel):
+            elif isinstance(item, (DaraModel, DaraSlotsModel)):
                 dic_result.update(item.to_map())
         return dic_result
 
@@ -620,7 +997,7 @@ class DaraCore:
 
     @staticmethod
     def to_map(model: Optional[DaraModel]) -> Dict[str, Any]:
-        if isinstance(model, DaraModel):
+        if isinstance(model, (DaraModel, DaraSlotsModel)):
             return model.to_map()
         else:
             return dict()
@@ -640,10 +1017,21 @@ class DaraCore:
     @staticmethod
     def from_map(
             model: DaraModel,
-            dic: Dict[str, Any]
+            dic: Dict[str, Any],
+            lazy: bool = False
     ) -> DaraModel:
-        if isinstance(model, DaraModel):
+        """
+        Fill the model by a map
+        @param model: the model
+        @param dic: the map
+        @param lazy: build the nested models on their first access, if the
+        model declares its fields
+        @return: the model
+        """
+        if isinstance(model, (DaraModel, DaraSlotsModel)):
             try:
+                if lazy and model.supports_lazy():
+                    return model.from_map(dic, lazy=True)
                 return model.from_map(dic)
             except Exception:
                 model._map = dic
@@ -652,16 +1040,38 @@ class DaraCore:
             return model
 
     @staticmethod
-    def _get_session(session_key: str, protocol: str, tls_min_version: str = None, verify: bool = True):
-        if session_key not in DaraCore._sessions:
+    def _get_session(session_key, protocol: str, tls_min_version: str = None, verify: Union[bool, str] = True,
+                     max_idle_conns: int = None, cert=None):
+        """
+        Get the pooled session of the key in use, it must be released
+        with DaraCore._sessions.release once the request is done
+        """
+        def session_factory():
             session = Session()
-            adapter = DaraCore.get_adapter(protocol, tls_min_version)
-            if protocol.upper() == 'HTTPS':
-                if verify:
-                    session.mount('https://', adapter)
-                else:
-                    session.mount('https://', DaraCore.https_adapter)
-            else:
-                session.mount('http://', adapter)
-            DaraCore._sessions[session_key] = session
-        return DaraCore._sessions[session_key]
\ No newline at end of file
+            adapter = DaraCore.get_adapter(protocol, tls_min_version, max_idle_conns, verify, cert)
+            session.mount(f'{protocol.lower()}://', adapter)
+            return session
+
+        return DaraCore._sessions.acquire(session_key, session_factory)
+
+    @staticmethod
+    def set_session_pool(max_size: int = None, idle_timeout: float = None):
+        """
+        Set the bounds of the pooled requests and aiohttp sessions, the
+        least recently used sessions beyond them are closed unless in use
+        @param max_size: the maximum number of sessions, 64 by default
+        @param idle_timeout: the seconds after which an idle session is
+        closed, 300 by default
+        """
+        for pool in (DaraCore._sessions, DaraCore._async_sessions):
+            if max_size is not None:
+                pool.max_size = int(max_size)
+            if idle_timeout is not None:
+                pool.idle_timeout = idle_timeout
+
+    @staticmethod
+    def close_sessions():
+        """
+        Close all the pooled requests sessions
+        """
+        DaraCore._sessions.close_all()
@@ -1,48 +1,60 @@
-from darabonba.model import DaraModel
+from darabonba.model import DaraModel, DaraField
 
 class Event(DaraModel):
+    _fields = (
+        DaraField('id', 'id', str, required=True),
+        DaraField('event', 'event', str, required=True),
+        DaraField('data', 'data', str, required=True),
+        DaraField('retry', 'retry', int, required=True),
+        DaraField('truncated', 'truncated', bool),
+    )
+
     def __init__(
         self,
         id: str = None,
         event: str = None,
         data: str = None,
         retry: int = None,
+        truncated: bool = None,
     ):
         self.id = id
         self.event = event
         self.data = data
         self.retry = retry
+        self.truncated = truncated
+
 
-    def validate(self):
-        self.validate_required(self.id, 'id')
-        self.validate_required(self.event, 'event')
-        self.validate_required(self.data, 'data')
-        self.validate_required(self.retry, 'retry')
+class SSEEvent(Event):
+    """
+    Event parsed from an SSE stream, it also carries the error raised when
+    decoding its data, which is then left as is, the error is not part of
+    the map of the event
+    """
 
-    def to_map(self):
-        _map = super().to_map()
-        if _map is not None:
-            return _map
+    def __init__(
+        self,
+        id: str = None,
+        event: str = None,
+        data: str = None,
+        retry: int = None,
+        truncated: bool = None,
+        error: Exception = None,
+    ):
+        self.id = id
+        self.event = event
+        self.data = data
+        self.retry = retry
+        self.truncated = truncated
+        self.error = error
 
-        result = dict()
-        if self.id is not None:
-            result['id'] = self.id
-        if self.event is not None:
-            result['event'] = self.event
-        if self.data is not None:
-            result['data'] = self.data
-        if self.retry is not None:
-            result['retry'] = self.retry
-        return result
+    def __repr__(self):
+        fields = ', '.join(f'{field.name}={getattr(self, field.name)!r}' for field in self._fields)
+        return f'SSEEvent({fields}, error={self.error!r})'
 
-    def from_map(self, m: dict = None):
-        m = m or dict()
-        if m.get('id') is not None:
-            self.id = m.get('id')
-        if m.get('event') is not None:
-            self.event = m.get('event')
-        if m.get('data') is not None:
-            self.data = m.get('data')
-        if m.get('retry') is not None:
-            self.retry = m.get('retry')
-        return self
\ No newline at end of file
+    def to_event(self) -> Event:
+        return Event(
+            id=self.id,
+            event=self.event,
+            data=self.data,
+            retry=self.retry,
+            truncated=self.truncated)
@@ -48,6 +48,16 @@ class ResponseException(DaraException):
         self.retry_after = retry_after
         self.stack = stack
 
+class SSEOverflowException(DaraException):
+    def __init__(self, message: str, limit: int):
+        super().__init__({
+            'code': 'SSEOverflow',
+            'message': message
+        })
+        self.name = 'SSEOverflowException'
+        self.limit = limit
+
+
 class ValidateException(Exception):
     pass
 
@@ -1,19 +1,405 @@
-import re
+import sys
+import keyword
+from contextlib import contextmanager
+from contextvars import ContextVar
 from darabonba.exceptions import RequiredArgumentException, ValidateException
+from darabonba.utils.validation import compile_pattern
 from Tea.model import TeaModel
 
+_skip_validation = ContextVar('darabonba_skip_validation', default=False)
 
-class DaraModel(TeaModel):
-    _map = None
+
+@contextmanager
+def skip_validation():
+    """
+    Skip the generated validate of the models with declared fields, for
+    the trusted callers building models that are known to be valid
+    """
+    token = _skip_validation.set(True)
+    try:
+        yield
+    finally:
+        _skip_validation.reset(token)
+
+
+class DaraField:
+    """
+    Description of one field of a model, the model serializers are
+    generated from the fields
+    """
+    __slots__ = ('name', 'wire_name', 'type', 'container', 'required',
+                 'max_length', 'min_length', 'maximum', 'minimum', 'pattern')
+
+    def __init__(
+        self,
+        name: str,
+        wire_name: str = None,
+        type=None,
+        container: type = None,
+        required: bool = False,
+        max_length: int = None,
+        min_length: int = None,
+        maximum=None,
+        minimum=None,
+        pattern: str = None,
+    ):
+        """
+        @param name: the attribute name
+        @param wire_name: the key in the map, it is the attribute name if it is None
+        @param type: the value type, a model class, or the name of a model
+        class of the same module or enclosing class that is not defined yet
+        @param container: list or dict if the field holds a list or a map of the type
+        @param required: the value must not be None
+        @param max_length: the maximum length of the value
+        @param min_length: the minimum length of the value
+        @param maximum: the maximum of the value
+        @param minimum: the minimum of the value
+        @param pattern: the regular expression the value must match
+        """
+        if not name.isidentifier() or keyword.iskeyword(name):
+            raise ValueError(f'The field name "{name}" is not a valid attribute name')
+        if container not in (None, list, dict):
+            raise ValueError('The field container must be list, dict or None')
+        self.name = name
+        self.wire_name = name if wire_name is None else wire_name
+        self.type = type
+        self.container = container
+        self.required = required
+        self.max_length = max_length
+        self.min_length = min_length
+        self.maximum = maximum
+        self.minimum = minimum
+        self.pattern = pattern
+
+    def __repr__(self):
+        return f'DaraField({self.name!r}, {self.wire_name!r})'
+
+
+def _resolve_type(cls, field: DaraField):
+    t = field.type
+    if isinstance(t, str):
+        if t == cls.__name__:
+            return cls
+        # look up the enclosing classes, then the module
+        scopes = [sys.modules.get(cls.__module__)]
+        for name in cls.__qualname__.split('.')[:-1]:
+            if name == '<locals>':
+                break
+            scopes.append(getattr(scopes[-1], name, None))
+        resolved = None
+        for scope in reversed(scopes):
+            resolved = getattr(scope, t, None)
+            if resolved is not None:
+                break
+        if resolved is None:
+            raise NameError(f'The type "{t}" of the field {cls.__qualname__}.{field.name} is not defined')
+        return resolved
+    return t
+
+
+_KIND_VALUE, _KIND_MODEL, _KIND_LIST, _KIND_DICT = range(4)
+
+
+def _nested_map(v, r):
+    # the map of a nested model, the raw map r itself if v is the
+    # unchanged lazy model of r and its to_map is the generated one
+    plan = getattr(type(v).to_map, 'lazy_plan', None)
+    if r is not None and plan is not None and v._lazy_map is r and getattr(v, '_map', None) is None:
+        return _lazy_map_of(v, r, plan)
+    return v.to_map()
+
+
+def _lazy_map_of(self, raw: dict, plan: tuple) -> dict:
+    # the raw map of a lazy model is returned as is unless a field is
+    # changed, the fields that are not built yet cannot be changed
+    changes = None
+    for name, wire, kind in plan:
+        try:
+            v = object.__getattribute__(self, name)
+        except AttributeError:
+            continue
+        r = raw.get(wire)
+        if v is r:
+            continue
+        if v is not None and kind != _KIND_VALUE:
+            if kind == _KIND_MODEL:
+                m = _nested_map(v, r)
+                same = m is r
+            elif kind == _KIND_LIST:
+                if isinstance(r, list) and len(v) == len(r):
+                    m = [_nested_map(k, i) if k else None for k, i in zip(v, r)]
+                else:
+                    m = [k.to_map() if k else None for k in v]
+                same = isinstance(r, list) and len(m) == len(r) and all(a is b for a, b in zip(m, r))
+            else:
+                if isinstance(r, dict):
+                    m = {k: _nested_map(i, r.get(k)) if i else None for k, i in v.items()}
+                else:
+                    m = {k: i.to_map() if i else None for k, i in v.items()}
+                same = isinstance(r, dict) and m.keys() == r.keys() and all(m[k] is r[k] for k in m)
+            if same:
+                continue
+            v = m
+        if changes is None:
+            changes = {}
+        changes[wire] = v
+    if changes is None:
+        return raw
+    result = dict(raw)
+    for wire, v in changes.items():
+        if v is None:
+            result.pop(wire, None)
+        else:
+            result[wire] = v
+    return result
+
+
+def _lazy_to_map(self, raw: dict, plan: tuple) -> dict:
+    # a copy of the raw map, the caller may change the result
+    result = _lazy_map_of(self, raw, plan)
+    return dict(raw) if result is raw else result
+
+
+def _supports_lazy(t) -> bool:
+    # only the generated from_map can defer the nested fields
+    return (issubclass(t, _DaraModelBase) and bool(t._all_fields)
+            and (t.from_map is _DaraModelBase.from_map or getattr(t.from_map, 'generated', False)))
+
+
+def _validate_field(field: DaraField, i: int, namespace: dict) -> list:
+    # the checks of DaraModel.validate_* unrolled, with the messages and
+    # the pattern prepared once
+    name = field.name
+    lines = []
+    if field.required:
+        lines += ['    if v is None:', f'        raise _Required({name!r})']
+    checks = []
+    if field.max_length is not None:
+        checks += [f'        if len(v) > {field.max_length!r}:',
+                   f"            raise _Invalid({f'{name} is exceed max-length: {field.max_length}'!r})"]
+    if field.min_length is not None:
+        checks += [f'        if len(v) < {field.min_length!r}:',
+                   f"            raise _Invalid({f'{name} is less than min-length: {field.min_length}'!r})"]
+    if field.pattern is not None:
+        namespace[f'_p{i}'] = compile_pattern(field.pattern).search
+        checks += [f'        if not _p{i}(str(v)):',
+                   f"            raise _Invalid({f'{name} is not match: {field.pattern}'!r})"]
+    if field.maximum is not None:
+        checks += [f'        if v > {field.maximum!r}:',
+                   f"            raise _Invalid({f'{name} is greater than the maximum: {field.maximum}'!r})"]
+    if field.minimum is not None:
+        checks += [f'        if v < {field.minimum!r}:',
+                   f"            raise _Invalid({f'{name} is less than the minimum: {field.minimum}'!r})"]
+    if checks:
+        lines += ['    if v is not None:'] + checks
+    if lines:
+        lines.insert(0, f'    v = self.{name}')
+    return lines
+
+
+def _compile_serializers(cls) -> tuple:
+    # generate the unrolled to_map and from_map of the class fields,
+    # as a generated model would write them by hand
+    namespace = {
+        '_cls': cls,
+        '_type': type,
+        '_lazy_to_map': _lazy_to_map,
+        '_skipped': _skip_validation.get,
+        '_Required': RequiredArgumentException,
+        '_Invalid': ValidateException,
+    }
+    to_map = [
+        'def to_map(self):',
+        '    if _type(self) is not _cls:',
+        '        # reached by super() from a subclass that has more fields',
+        '        return _type(self)._install_serializers()[0](self)',
+        '    _map = self._map',
+        '    if _map is not None:',
+        '        return _map',
+        '    raw = self._lazy_map',
+        '    if raw is not None:',
+        '        return _lazy_to_map(self, raw, _plan)',
+        '    result = {}',
+    ]
+    from_map = [
+        'def from_map(self, m=None, lazy=False):',
+        '    if _type(self) is not _cls:',
+        '        return _type(self)._install_serializers()[1](self, m, lazy)',
+        '    m = m or {}',
+    ]
+    # the nested fields of a lazy model are built by the hydrators on first access
+    lazy_from_map = ['    if lazy:']
+    hydrators = []
+    plan = []
+    validate = [
+        'def validate(self):',
+        '    if _type(self) is not _cls:',
+        '        return _type(self)._install_serializers()[3](self)',
+        '    if _skipped():',
+        '        return',
+    ]
+    for i, field in enumerate(cls._all_fields):
+        t = _resolve_type(cls, field)
+        name, wire = field.name, repr(field.wire_name)
+        validate += _validate_field(field, i, namespace)
+        if isinstance(t, type) and hasattr(t, 'validate'):
+            validate += [f'    v = self.{name}', '    if v:']
+            if field.container is list:
+                validate += ['        for k in v:', '            if k:', '                k.validate()']
+            elif field.container is dict:
+                validate += ['        for k in v.values():', '            if k:', '                k.validate()']
+            else:
+                validate.append('        v.validate()')
+        to_map += [f'    v = self.{name}', '    if v is not None:']
+        from_map += [f'    v = m.get({wire})', '    if v is not None:']
+        if not isinstance(t, type) or not hasattr(t, 'to_map'):
+            to_map.append(f'        result[{wire}] = v')
+            from_map.append(f'        self.{name} = v')
+            lazy_from_map += [f'        v = m.get({wire})', '        if v is not None:', f'            self.{name} = v']
+            plan.append((name, field.wire_name, _KIND_VALUE))
+            continue
+        namespace[f'_t{i}'] = t
+        # models are built then filled, other classes build from the map themselves
+        build = f'_t{i}().from_map' if issubclass(t, (TeaModel, _DaraModelBase)) else f'_t{i}.from_map'
+        lazy = ', True' if _supports_lazy(t) else ''
+        if field.container is list:
+            to_map.append(f'        result[{wire}] = [k.to_map() if k else None for k in v]')
+            from_map.append(f'        self.{name} = [{build}(k) for k in v]')
+            hydrate = f'[{build}(k{lazy}) for k in v]'
+            plan.append((name, field.wire_name, _KIND_LIST))
+        elif field.container is dict:
+            to_map.append(f'        result[{wire}] = {{k: i.to_map() if i else None for k, i in v.items()}}')
+            from_map.append(f'        self.{name} = {{k: {build}(i) for k, i in v.items()}}')
+            hydrate = f'{{k: {build}(i{lazy}) for k, i in v.items()}}'
+            plan.append((name, field.wire_name, _KIND_DICT))
+        else:
+            to_map.append(f'        result[{wire}] = v.to_map()')
+            from_map.append(f'        self.{name} = {build}(v)')
+            hydrate = f'{build}(v{lazy})'
+            plan.append((name, field.wire_name, _KIND_MODEL))
+        lazy_from_map += [
+            f'        if m.get({wire}) is not None:',
+            '            try:',
+            f'                del self.{name}',
+            '            except AttributeError:',
+            '                pass',
+        ]
+        hydrators += [
+            f'def _h{i}(raw):',
+            f'    v = raw.get({wire})',
+            '    if v is None:',
+            '        return None',
+            f'    return {hydrate}',
+            '',
+        ]
+    to_map.append('    return result')
+    lazy_from_map += ['        self._lazy_map = m', '        return self']
+    from_map[4:4] = lazy_from_map
+    from_map.append('    return self')
+    namespace['_plan'] = tuple(plan)
+    source = '\n\n'.join('\n'.join(lines) for lines in (to_map, from_map, validate, hydrators)) + '\n'
+    exec(compile(source, f'<{cls.__qualname__} serializers>', 'exec'), namespace)
+    to_map, from_map, validate = namespace['to_map'], namespace['from_map'], namespace['validate']
+    to_map.generated = from_map.generated = validate.generated = True
+    to_map.lazy_plan = namespace['_plan']
+    hydrators = {field.name: namespace[f'_h{i}'] for i, field in enumerate(cls._all_fields) if f'_h{i}' in namespace}
+    return to_map, from_map, hydrators, validate
+
+
+class _DaraModelBase:
+    """
+    The behaviour shared by DaraModel and DaraSlotsModel
+    """
+    __slots__ = ()
+    # the DaraField declarations of the class, the fields of the
+    # base classes are inherited
+    _fields = ()
+    _all_fields = ()
+    # the map given to a lazy from_map
+    _lazy_map = None
+    # field name: function building the field from the map of a lazy model
+    _hydrators = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if '_fields' in cls.__dict__:
+            fields = {field.name: field for field in cls._all_fields}
+            fields.update((field.name, field) for field in cls._fields)
+            cls._all_fields = tuple(fields.values())
+        if not cls._all_fields:
+            return
+        # every class gets its own serializers, those of the base class
+        # do not know the new fields
+        for method in ('to_map', 'from_map', 'validate'):
+            if method not in cls.__dict__ and getattr(getattr(cls, method), 'generated', False):
+                setattr(cls, method, getattr(_DaraModelBase, method))
+
+    @classmethod
+    def get_fields(cls) -> tuple:
+        """
+        @return: the DaraField declarations of the model, including the inherited ones
+        """
+        return cls._all_fields
+
+    @classmethod
+    def _install_serializers(cls) -> tuple:
+        serializers = cls.__dict__.get('_serializers')
+        if serializers is None:
+            serializers = cls._serializers = _compile_serializers(cls)
+            cls._hydrators = serializers[2]
+        # only replace the generic methods, never an explicit implementation
+        if cls.to_map is _DaraModelBase.to_map:
+            cls.to_map = serializers[0]
+        if cls.from_map is _DaraModelBase.from_map:
+            cls.from_map = serializers[1]
+        if cls.validate is _DaraModelBase.validate:
+            cls.validate = serializers[3]
+        return serializers
+
+    @classmethod
+    def supports_lazy(cls) -> bool:
+        """
+        @return: whether from_map of the model accepts lazy=True
+        """
+        return _supports_lazy(cls)
+
+    def __getattr__(self, name):
+        # only called for the missing attributes, i.e. the nested fields
+        # of a lazy model that are not built yet
+        raw = self._lazy_map
+        if raw is not None:
+            hydrator = self._hydrators.get(name)
+            if hydrator is not None:
+                value = hydrator(raw)
+                setattr(self, name, value)
+                return value
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
 
     def validate(self):
-        pass
+        """
+        Check the declared constraints of the fields and validate the nested
+        models, it is skipped within skip_validation()
+        """
+        if self._all_fields:
+            type(self)._install_serializers()[3](self)
 
     def to_map(self):
-        return self._map
+        if self._map is not None or not self._all_fields:
+            return self._map
+        return type(self)._install_serializers()[0](self)
 
-    def from_map(self, map=None):
-        pass
+    def from_map(self, map=None, lazy=False):
+        """
+        Fill the model by a map
+        @param map: the map
+        @param lazy: only for the models that declare their fields, the nested
+        models are built on their first access, and to_map returns the map
+        as is until a field is changed
+        @return: the model
+        """
+        if not self._all_fields:
+            return
+        return type(self)._install_serializers()[1](self, map, lazy)
 
     @staticmethod
     def validate_required(prop, prop_name):
@@ -32,7 +418,7 @@ class DaraModel(TeaModel):
 
     @staticmethod
     def validate_pattern(prop, prop_name, pattern):
-        match_obj = re.search(pattern, str(prop), re.M | re.I)
+        match_obj = compile_pattern(pattern).search(str(prop))
         if not match_obj:
             raise ValidateException(f'{prop_name} is not match: {pattern}')
 
@@ -52,3 +438,56 @@ class DaraModel(TeaModel):
             return str(s)
         else:
             return object.__str__(self)
+
+
+class DaraModel(_DaraModelBase, TeaModel):
+    _map = None
+
+
+class _SlotsModelMeta(type):
+    def __new__(mcs, name, bases, namespace, **kwargs):
+        slots = namespace.get('__slots__', ())
+        slots = [slots] if isinstance(slots, str) else list(slots)
+        inherited = set()
+        for base in bases:
+            for klass in base.__mro__:
+                base_slots = klass.__dict__.get('__slots__', ())
+                inherited.update([base_slots] if isinstance(base_slots, str) else base_slots)
+        # every declared field is stored in a slot
+        for field in namespace.get('_fields', ()):
+            if field.name not in inherited and field.name not in slots:
+                slots.append(field.name)
+        namespace['__slots__'] = tuple(slots)
+        return super().__new__(mcs, name, bases, namespace, **kwargs)
+
+
+class DaraSlotsModel(_DaraModelBase, metaclass=_SlotsModelMeta):
+    """
+    Compact model whose instances have no __dict__, every field declared
+    by _fields is stored in a slot, so the attributes that are not declared
+    cannot be set unless they are listed in __slots__
+    """
+    __slots__ = ('__map', '__lazy_map')
+
+    # the slots are read without falling back to __getattr__ when they are not set
+    @property
+    def _map(self):
+        try:
+            return object.__getattribute__(self, '_DaraSlotsModel__map')
+        except AttributeError:
+            return None
+
+    @_map.setter
+    def _map(self, value):
+        self.__map = value
+
+    @property
+    def _lazy_map(self):
+        try:
+            return object.__getattribute__(self, '_DaraSlotsModel__lazy_map')
+        except AttributeError:
+            return None
+
+    @_lazy_map.setter
+    def _lazy_map(self, value):
+        self.__lazy_map = value
@@ -0,0 +1,335 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_SESSION_IDLE_TIMEOUT = 300
+
+
+class _PooledSession:
+    __slots__ = ('session', 'last_used', 'in_use')
+
+    def __init__(self, session):
+        self.session = session
+        self.last_used = time.monotonic()
+        self.in_use = 0
+
+
+class _SessionLRU:
+    """
+    Sessions ordered by last use, bounded by count and idle time.
+    Entries that are in use are never evicted.
+    """
+
+    def __init__(self, max_size: int, idle_timeout: float):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, session) -> _PooledSession:
+        entry = _PooledSession(session)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        return entry
+
+    def evict(self, now: float = None, keep=None) -> list:
+        """
+        Drop idle and overflowing entries
+        @param keep: the key of an entry not to drop, e.g. the one being returned
+        @return: the evicted sessions, which the caller must close
+        """
+        now = time.monotonic() if now is None else now
+        evicted = []
+        overflow = len(self._entries) - self.max_size
+        for key, entry in list(self._entries.items()):
+            if entry.in_use or key == keep:
+                continue
+            if overflow > 0 or (self.idle_timeout is not None
+                                and now - entry.last_used > self.idle_timeout):
+                del self._entries[key]
+                evicted.append(entry.session)
+                overflow -= 1
+        return evicted
+
+    def pop_all(self) -> list:
+        sessions = [entry.session for entry in self._entries.values()]
+        self._entries.clear()
+        return sessions
+
+
+class SessionPool:
+    """
+    Thread-safe requests sessions, bounded by count and idle time
+    and evicted least recently used first.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT,
+    ):
+        self._lru = _SessionLRU(max_size, idle_timeout)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_size(self) -> int:
+        return self._lru.max_size
+
+    @max_size.setter
+    def max_size(self, value: int):
+        self._lru.max_size = value
+
+    @property
+    def idle_timeout(self) -> float:
+        return self._lru.idle_timeout
+
+    @idle_timeout.setter
+    def idle_timeout(self, value: float):
+        self._lru.idle_timeout = value
+
+    def __len__(self):
+        return len(self._lru)
+
+    def __contains__(self, key):
+        return key in self._lru
+
+    def __getitem__(self, key):
+        with self._lock:
+            entry = self._lru.get(key)
+        if entry is None:
+            raise KeyError(key)
+        return entry.session
+
+    def get(self, key, factory):
+        """
+        Get the session of the key, the factory is called under the
+        lock to create it if it is missing
+        @param key: the session identity
+        @param factory: the callable to create a new session
+        @return: the session
+        """
+        return self._get(key, factory, False)
+
+    def acquire(self, key, factory):
+        """
+        Get the session of the key like get, and mark it in use so that
+        it is not evicted until it is released
+        @param key: the session identity
+        @param factory: the callable to create a new session
+        @return: the session
+        """
+        return self._get(key, factory, True)
+
+    def release(self, key, session):
+        """
+        Release a session got from acquire
+        @param key: the session identity
+        @param session: the session
+        """
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None and entry.session is session and entry.in_use:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+
+    def _get(self, key, factory, acquire: bool):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self._lru.put(key, factory())
+            else:
+                self.hits += 1
+                entry.last_used = time.monotonic()
+            if acquire:
+                entry.in_use += 1
+            evicted = self._lru.evict(keep=key)
+            self.evictions += len(evicted)
+        for session in evicted:
+            session.close()
+        return entry.session
+
+    def stats(self) -> dict:
+        """
+        @return: the size and the hit, miss and eviction counters
+        """
+        with self._lock:
+            return {
+                'size': len(self._lru),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def close_all(self):
+        """
+        Close and drop all the sessions
+        """
+        with self._lock:
+            sessions = self._lru.pop_all()
+        for session in sessions:
+            session.close()
+
+
+async def _close_sessions(sessions):
+    await asyncio.gather(*(session.close() for session in sessions), return_exceptions=True)
+
+
+class _LoopCloser:
+    """
+    The close method set on an event loop, it closes the pooled sessions
+    of the loop right before the loop itself, e.g. at the end of
+    asyncio.run. The loop holds the sessions through it, so that they are
+    collected along with a loop that is never closed.
+    """
+
+    def __init__(self, pool, loop, previous):
+        self.pool = pool
+        self.loop = weakref.ref(loop)
+        # the close set on the loop before, e.g. by another pool
+        self.previous = previous
+        self.lru = None
+
+    def __call__(self):
+        loop = self.loop()
+        if loop is None:
+            # called by the finalizer of the loop, its sessions are gone
+            return
+        with self.pool._lock:
+            lru, self.lru = self.lru, None
+        if lru is not None and not loop.is_running() and not loop.is_closed():
+            sessions = lru.pop_all()
+            if sessions:
+                loop.run_until_complete(_close_sessions(sessions))
+        if self.previous is not None:
+            self.previous()
+        else:
+            type(loop).close(loop)
+
+
+class AsyncSessionPool:
+    """
+    Long-lived aiohttp sessions shared per event loop, so that keep-alive
+    connections survive across requests.
+    """
+
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SESSIONS,
+        idle_timeout: float = DEFAULT_SESSION_IDLE_TIMEOUT,
+    ):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        # loop: its _LoopCloser, both weakly referenced, the sessions hold
+        # their loop so only the loop itself may hold them
+        self._loops = weakref.WeakKeyDictionary()
+        # loop: sessions, for the loops that do not allow setting close,
+        # e.g. uvloop, released once the loop is found closed
+        self._pinned = {}
+        self._lock = threading.Lock()
+
+    def _closer(self, loop):
+        closer = self._loops.get(loop)
+        return closer() if closer is not None else None
+
+    def _find_lru(self, loop):
+        closer = self._closer(loop)
+        if closer is not None:
+            return closer.lru
+        return self._pinned.get(loop)
+
+    def _get_lru(self, loop) -> _SessionLRU:
+        with self._lock:
+            lru = self._find_lru(loop)
+            if lru is None:
+                self._release_closed_loops()
+                lru = _SessionLRU(self.max_size, self.idle_timeout)
+                closer = self._closer(loop) or self._close_with_loop(loop)
+                if closer is not None:
+                    closer.lru = lru
+                else:
+                    self._pinned[loop] = lru
+        lru.max_size = self.max_size
+        lru.idle_timeout = self.idle_timeout
+        return lru
+
+    def _close_with_loop(self, loop):
+        # set once per loop, later sessions of the loop go to the same closer
+        closer = _LoopCloser(self, loop, getattr(loop, '__dict__', {}).get('close'))
+        try:
+            loop.close = closer
+        except AttributeError:
+            # the loop does not allow it, e.g. uvloop, its sessions are
+            # detached once it is found closed
+            return None
+        self._loops[loop] = weakref.ref(closer)
+        return closer
+
+    def _release_closed_loops(self):
+        # sessions of a closed loop can no longer be awaited, detach them
+        # so that they are switched to closed state and collected
+        for loop in list(self._pinned.keys()):
+            if loop.is_closed():
+                for session in self._pinned.pop(loop).pop_all():
+                    session.detach()
+        for loop, closer in list(self._loops.items()):
+            closer = closer()
+            if closer is not None and closer.lru is not None and loop.is_closed():
+                lru, closer.lru = closer.lru, None
+                for session in lru.pop_all():
+                    session.detach()
+
+    @asynccontextmanager
+    async def session(self, key, factory):
+        """
+        Borrow the session of the key for the running loop, the factory is
+        called to create it if it is missing or closed
+        @param key: the session identity
+        @param factory: the callable to create a new aiohttp session
+        """
+        lru = self._get_lru(asyncio.get_running_loop())
+        entry = lru.get(key)
+        if entry is None or entry.session.closed:
+            entry = lru.put(key, factory())
+        entry.in_use += 1
+        try:
+            for stale in lru.evict():
+                await stale.close()
+            yield entry.session
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    async def close(self):
+        """
+        Close all the sessions of the running loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            closer = self._closer(loop)
+            if closer is not None:
+                lru, closer.lru = closer.lru, None
+            else:
+                lru = self._pinned.pop(loop, None)
+        if lru is None:
+            return
+        for session in lru.pop_all():
+            await session.close()
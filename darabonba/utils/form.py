@@ -1,5 +1,4 @@
 import os
-import sys
 from _io import BytesIO
 import random
 from darabonba.utils.stream import BaseStream, READABLE
@@ -42,22 +41,35 @@ def _length(o):
 
 
 class FileFormInputStream(BaseStream):
+    """
+    The multipart/form-data body of a form, the text parts first, sorted by
+    name, then the file parts. The headers are encoded once into a plan of
+    segments, the byte strings and the file contents in between, which is
+    walked by offset, so the files are never buffered as a whole.
+    """
+
     def __init__(self, form, boundary, size=1024):
         super().__init__(size)
         self.form = form
         self.boundary = boundary
-        self.file_size_left = 0
 
         self.forms = {}
         self.files = {}
         self.files_keys = []
         self._to_map()
 
-        self.form_str = b''
-        self._build_str_forms()
-        self.str_length = len(self.form_str)
+        # memoryviews of the encoded bytes and the file contents in between
+        self._plan = []
+        self._index = 0
+        self._offset = 0
+        # the end of a chunk longer than asked, e.g. a text file chunk once encoded
+        self._pending = None
+        self._build_plan()
 
     def _to_map(self):
+        self.forms = {}
+        self.files = {}
+        self.files_keys = []
         for k, v in self.form.items():
             if isinstance(v, FileField):
                 self.files[k] = v
@@ -65,25 +77,38 @@ class FileFormInputStream(BaseStream):
             else:
                 self.forms[k] = v
 
-    def _build_str_forms(self):
-        form_str = ''
+    def _build_plan(self):
         str_fmt = '--%s\r\nContent-Disposition: form-data; name="%s"\r\n\r\n%s\r\n'
-        forms_list = sorted(list(self.forms))
-        for key in forms_list:
-            value = self.forms[key]
-            form_str += str_fmt % (self.boundary, key, value)
-        self.form_str = form_str.encode('utf-8')
+        file_fmt = '--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n' \
+                   'Content-Type: %s\r\n\r\n'
+        plan = []
+        parts = [str_fmt % (self.boundary, key, self.forms[key]) for key in sorted(self.forms)]
+        for key in self.files_keys:
+            file_field = self.files[key]
+            parts.append(file_fmt % (self.boundary, key, file_field.filename, file_field.content_type))
+            content = file_field.content
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            if isinstance(content, (bytes, bytearray, memoryview)):
+                parts.append(content)
+                parts.append('\r\n')
+                continue
+            plan.append(self._encode(parts))
+            plan.append(content)
+            parts = ['\r\n']
+        parts.append('--%s--\r\n' % self.boundary)
+        plan.append(self._encode(parts))
+        self._plan = plan
+        self._index = 0
+        self._offset = 0
+        self._pending = None
 
-    def _get_stream_length(self):
-        file_length = 0
-        for k, ff in self.files.items():
-            field_length = len(ff.filename.encode('utf-8')) + len(ff.content_type) +\
-                           len(k.encode('utf-8')) + len(self.boundary) + 78
-
-            file_length += _length(ff.content) + field_length
+    @staticmethod
+    def _encode(parts):
+        return memoryview(b''.join(p.encode('utf-8') if isinstance(p, str) else p for p in parts))
 
-        stream_length = self.str_length + file_length + len(self.boundary) + 6
-        return stream_length
+    def _get_stream_length(self):
+        return sum(len(s) if isinstance(s, memoryview) else _length(s) for s in self._plan)
 
     def __len__(self):
         return self._get_stream_length()
@@ -94,83 +119,88 @@ class FileFormInputStream(BaseStream):
     def __next__(self):
         return self.read(self.size, loop=True)
 
-    def file_str(self, size):
-        # handle file object
-        form_str = b''
-        start_fmt = '--%s\r\nContent-Disposition: form-data; name="%s";'
-        content_fmt = b' filename="%s"\r\nContent-Type: %s\r\n\r\n%s'
-
-        if self.file_size_left:
-            for key in self.files_keys[:]:
-                if size <= 0:
-                    break
-                file_field = self.files[key]
-                file_content = file_field.content.read(size)
-                if isinstance(file_content, str):
-                    file_content = file_content.encode('utf-8')
-
-                if self.file_size_left <= size:
-                    form_str += b'%s\r\n' % file_content
-                    self.file_size_left = 0
-                    size -= len(file_content)
-                    self.files_keys.remove(key)
-                else:
-                    form_str += file_content
-                    self.file_size_left -= size
-                    size -= len(file_content)
-        else:
-            for key in self.files_keys[:]:
-                if size <= 0:
-                    break
-                file_field = self.files[key]
-
-                file_size = _length(file_field.content)
-                self.file_size_left = file_size
-                file_content = file_field.content.read(size)
-                if isinstance(file_content, str):
-                    file_content = file_content.encode('utf-8')
-
-                # build form_str
-                start = start_fmt % (self.boundary, key)
-                content = content_fmt % (
-                    file_field.filename.encode('utf-8'),
-                    file_field.content_type.encode('utf-8'),
-                    file_content
-                )
-                if self.file_size_left < size:
-                    form_str += b'%s%s\r\n' % (start.encode('utf-8'), content)
-                    self.file_size_left = 0
-                    size -= len(file_content)
-                    self.files_keys.remove(key)
-                else:
-                    form_str += b'%s%s' % (start.encode('utf-8'), content)
-                    self.file_size_left -= size
-                    size -= len(file_content)
-
-        return form_str
+    def _next_chunk(self, size):
+        # the next chunk of at most size bytes, any size if it is None,
+        # or None at the end of the body
+        while self._index < len(self._plan):
+            if self._pending:
+                chunk = self._pending[:size]
+                self._pending = self._pending[len(chunk):]
+                return chunk
+            segment = self._plan[self._index]
+            if isinstance(segment, memoryview):
+                chunk = segment[self._offset:] if size is None else segment[self._offset:self._offset + size]
+                self._offset += len(chunk)
+                if self._offset >= len(segment):
+                    self._index += 1
+                    self._offset = 0
+                if chunk:
+                    return chunk
+                continue
+            chunk = segment.read(-1 if size is None else size)
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                self._index += 1
+                continue
+            if size is not None and len(chunk) > size:
+                self._pending = memoryview(chunk)[size:]
+                chunk = chunk[:size]
+            return chunk
+        return None
 
     def read(self, size=None, loop=False):
-        if not self.files_keys and not self.form_str:
+        if self._index >= len(self._plan):
             self.refresh()
             if loop:
                 raise StopIteration
             else:
                 return b''
 
-        if size is None:
-            size = sys.maxsize
-
-        if self.form_str:
-            form_str = self.form_str[:size]
-            self.form_str = self.form_str[size:]
-            if len(form_str) < size:
-                form_str += self.file_str(size)
-        else:
-            form_str = self.file_str(size)
-
-        if not self.form_str and not self.files_keys:
-            form_str += b'--%s--\r\n' % self.boundary.encode('utf-8')
-        return form_str
+        if size is not None and size < 0:
+            size = None
+        chunks = []
+        while size is None or size > 0:
+            chunk = self._next_chunk(size)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+            if size is not None:
+                size -= len(chunk)
+        if len(chunks) == 1 and isinstance(chunks[0], bytes):
+            return chunks[0]
+        return b''.join(chunks)
+
+    def readinto(self, b):
+        """
+        Read the body into a writable buffer, the encoded bytes are copied
+        from the plan and the files read straight into the buffer when they
+        support readinto
+        @param b: the buffer
+        @return: the number of bytes read, 0 at the end of the body
+        """
+        if self._index >= len(self._plan):
+            self.refresh()
+            return 0
+
+        view = memoryview(b).cast('B')
+        pos = 0
+        while pos < len(view):
+            if not self._pending and self._index < len(self._plan):
+                segment = self._plan[self._index]
+                if not isinstance(segment, memoryview) and hasattr(segment, 'readinto'):
+                    n = segment.readinto(view[pos:])
+                    if not n:
+                        self._index += 1
+                    else:
+                        pos += n
+                    continue
+            chunk = self._next_chunk(len(view) - pos)
+            if chunk is None:
+                break
+            view[pos:pos + len(chunk)] = chunk
+            pos += len(chunk)
+        return pos
 
     def refresh_cursor(self):
         for ff in self.files.values():
@@ -178,9 +208,8 @@ class FileFormInputStream(BaseStream):
                 ff.content.seek(0, 0)
 
     def refresh(self):
-        self.file_size_left = 0
         self._to_map()
-        self._build_str_forms()
+        self._build_plan()
         self.refresh_cursor()
 
 class FileField(DaraModel):
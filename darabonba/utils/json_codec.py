@@ -0,0 +1,371 @@
+import json
+import re
+import sys
+from typing import Any, Callable, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+BACKEND_ORJSON = 'orjson'
+BACKEND_MSGSPEC = 'msgspec'
+BACKEND_UJSON = 'ujson'
+BACKEND_JSON = 'json'
+
+
+# name: loads, the fast backends are only used for parsing once selected
+# with set_backend, encoding always goes through the stdlib so that the
+# output is the same whatever is installed
+_backends = {BACKEND_JSON: json.loads}
+
+if ujson is not None:
+    _backends[BACKEND_UJSON] = ujson.loads
+
+if msgspec is not None:
+    _backends[BACKEND_MSGSPEC] = msgspec.json.decode
+
+if orjson is not None:
+    _backends[BACKEND_ORJSON] = orjson.loads
+
+
+_backend = BACKEND_JSON
+_loads = json.loads
+
+
+def get_backend() -> str:
+    """
+    @return: the name of the JSON backend in use
+    """
+    return _backend
+
+
+def set_backend(name: str = None):
+    """
+    Select the JSON backend used for parsing, the fast backends turn the
+    integers out of the 64-bit range into floats or reject them
+    @param name: 'orjson', 'msgspec', 'ujson' or 'json', the stdlib json
+    if it is None
+    """
+    global _backend, _loads
+    name = name or BACKEND_JSON
+    if name not in _backends:
+        raise ValueError(f'The JSON backend "{name}" is not available')
+    _backend = name
+    _loads = _backends[name]
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """
+    Parse a JSON document, bytes are parsed without decoding them first
+    @param data: the JSON bytes or string
+    @return: the parsed result
+    """
+    if not isinstance(data, (bytes, str)) and _backend != BACKEND_ORJSON:
+        data = bytes(data)
+    if _loads is json.loads:
+        return json.loads(data)
+    try:
+        return _loads(data)
+    except Exception:
+        # the fast backends are stricter, e.g. on NaN, and raise their own
+        # errors, the stdlib parses the document again or raises ValueError
+        return json.loads(data if isinstance(data, (bytes, str)) else bytes(data))
+
+
+def dumps(obj: Any, default: Callable[[Any], Any] = None) -> str:
+    """
+    Stringify a value by compact JSON format, non-ASCII characters are
+    not escaped
+    @param obj: the value
+    @param default: called with the values that are not natively
+    serializable, it returns a serializable value or raises TypeError
+    @return: the JSON string
+    """
+    return json.dumps(obj, default=default, ensure_ascii=False, separators=(',', ':'))
+
+
+_WHITESPACE = re.compile(rb'[ \t\r\n]*')
+_STRING = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"')
+# the rest of a string after its quote, up to the closing quote, or to the
+# end of the buffer or a trailing backslash if the string is not complete yet
+_STRING_REST = re.compile(rb'[^"\\]*(?:\\.[^"\\]*)*')
+# a complete string, a bracket, or the quote of a string that is not complete yet
+_STRUCTURE = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]|"')
+_SCALAR = re.compile(rb'[^ \t\r\n,\]}]*')
+
+
+def _nested(depth: int) -> bytes:
+    # the content of a container with at most depth levels of nesting,
+    # possessive quantifiers keep the matching linear
+    string = rb'"[^"\\]*+(?:\\.[^"\\]*+)*+"'
+    content = rb'(?:[^"\[\]{}]++|' + string + rb')*+'
+    for _ in range(depth):
+        content = rb'(?:[^"\[\]{}]++|' + string + rb'|\{' + content + rb'\}|\[' + content + rb'\])*+'
+    return content
+
+
+# a run of elements each followed by a comma, the elements nested deeper
+# than the pattern or not complete yet are left to _value_end, possessive
+# quantifiers need Python 3.11, the elements are all scanned one by one before
+_ITEMS = None
+if sys.version_info >= (3, 11):
+    _NESTED = _nested(5)
+    _ITEMS = re.compile(
+        rb'(?:(?:\{' + _NESTED + rb'\}|\[' + _NESTED + rb'\]|"[^"\\]*+(?:\\.[^"\\]*+)*+"|[^ \t\r\n,\[\]{}"]++)'
+        rb'[ \t\r\n]*+,[ \t\r\n]*+)++')
+
+
+class _NeedMore(Exception):
+    pass
+
+
+class JSONItemParser:
+    """
+    Incremental parser of the elements of one array in a JSON document,
+    each element is parsed as soon as its last byte is fed, so that the
+    document is never held in memory as a whole.
+    The array is found by the path of object keys leading to it, the
+    objects on the path may hold other keys before and after it. The rest
+    of the document is checked as well, it may only end with whitespace.
+    """
+
+    def __init__(self, path=None):
+        """
+        @param path: the keys to the array as a list or a dotted string,
+        the document itself is the array if it is empty
+        """
+        if isinstance(path, str):
+            path = path.split('.')
+        self.path = list(path or [])
+        self._buffer = bytearray()
+        self._offset = 0
+        self._state = 'root'
+        self._depth = 0
+        # the objects on the path that are open
+        self._objects = 0
+        # the end of the array is reached, or the array is missing
+        self._finished = False
+        # resumable scan of a string or container value:
+        # (offset, scanned length, nesting depth, inside a string)
+        self._scan = None
+        self._eof = False
+
+    @property
+    def done(self) -> bool:
+        """
+        @return: whether the end of the array is reached, or the array is missing
+        """
+        return self._finished
+
+    def feed(self, chunk) -> list:
+        """
+        Parse a chunk of the document
+        @param chunk: the bytes or string chunk
+        @return: the elements completed by the chunk
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if self._state == 'end' or not chunk:
+            return []
+        self._buffer += chunk
+        return self._parse()
+
+    def close(self) -> list:
+        """
+        Parse the end of the document
+        @return: the remaining elements
+        """
+        self._eof = True
+        items = self._parse()
+        if self._state != 'end':
+            self._error(len(self._buffer))
+        return items
+
+    def parse(self, chunks):
+        """
+        Parse the elements of an iterable of chunks
+        @param chunks: the bytes or string chunks of the document
+        @return: the generator of the elements
+        """
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.close()
+
+    def _error(self, pos: int):
+        raise ValueError(f'Invalid JSON document at offset {self._offset + pos}')
+
+    def _char(self, buf, pos: int) -> tuple:
+        pos = _WHITESPACE.match(buf, pos).end()
+        if pos >= len(buf):
+            if self._eof:
+                self._error(pos)
+            raise _NeedMore()
+        return buf[pos:pos + 1], pos
+
+    def _value_end(self, buf, start: int) -> int:
+        c = buf[start:start + 1]
+        if c not in (b'"', b'{', b'['):
+            end = _SCALAR.match(buf, start).end()
+            if end == len(buf) and not self._eof:
+                raise _NeedMore()
+            if end == start:
+                self._error(start)
+            return end
+        pos, depth, in_string = start, 0, False
+        if self._scan is not None and self._scan[0] == self._offset + start:
+            _, scanned, depth, in_string = self._scan
+            pos = start + scanned
+        elif c == b'"':
+            pos, in_string = start + 1, True
+        while True:
+            if in_string:
+                end = _STRING_REST.match(buf, pos).end()
+                if end == len(buf) or buf[end] != 0x22:
+                    # save where the scan stopped, at the end or at a trailing backslash
+                    self._scan = (self._offset + start, end - start, depth, True)
+                    if self._eof:
+                        self._error(start)
+                    raise _NeedMore()
+                pos, in_string = end + 1, False
+                if depth == 0:
+                    self._scan = None
+                    return pos
+                continue
+            m = _STRUCTURE.search(buf, pos)
+            if m is None:
+                self._scan = (self._offset + start, len(buf) - start, depth, False)
+                if self._eof:
+                    self._error(start)
+                raise _NeedMore()
+            pos = m.end()
+            token = buf[m.start()]
+            if token == 0x22 and pos - m.start() == 1:
+                # a string that is not complete yet
+                in_string = True
+            elif token in (0x7B, 0x5B):
+                depth += 1
+            elif token in (0x7D, 0x5D):
+                depth -= 1
+                if depth == 0:
+                    self._scan = None
+                    return pos
+
+    def _close_object(self):
+        # the object on the path is closed, the array is missing if it is
+        # not found yet, the enclosing object goes on with its next key
+        self._finished = True
+        self._objects -= 1
+        self._state = 'next_key' if self._objects else 'tail'
+
+    def _parse(self) -> list:
+        items = []
+        buf = self._buffer
+        pos = 0
+        try:
+            while self._state != 'end':
+                if self._state == 'root':
+                    c, pos_next = self._char(buf, pos)
+                    if c != (b'{' if self.path else b'['):
+                        self._error(pos_next)
+                    pos = pos_next + 1
+                    self._objects = 1 if self.path else 0
+                    self._state = 'first_key' if self.path else 'first_item'
+                elif self._state in ('first_key', 'key'):
+                    c, start = self._char(buf, pos)
+                    if c == b'}' and self._state == 'first_key':
+                        pos = start + 1
+                        self._close_object()
+                        continue
+                    m = _STRING.match(buf, start)
+                    if m is None:
+                        if self._eof or c != b'"':
+                            self._error(start)
+                        raise _NeedMore()
+                    c, colon = self._char(buf, m.end())
+                    if c != b':':
+                        self._error(colon)
+                    c, value = self._char(buf, colon + 1)
+                    if not self._finished and loads(bytes(buf[start:m.end()])) == self.path[self._depth]:
+                        last = self._depth == len(self.path) - 1
+                        if c != (b'[' if last else b'{'):
+                            # the value on the path is not an array or object, e.g. null
+                            self._finished = True
+                        else:
+                            self._depth += 1
+                            pos = value + 1
+                            if last:
+                                self._state = 'first_item'
+                            else:
+                                self._objects += 1
+                                self._state = 'first_key'
+                            continue
+                    pos = self._value_end(buf, value)
+                    self._state = 'next_key'
+                elif self._state == 'next_key':
+                    c, pos = self._char(buf, pos)
+                    if c == b',':
+                        self._state = 'key'
+                    elif c == b'}':
+                        self._close_object()
+                    else:
+                        self._error(pos)
+                    pos += 1
+                elif self._state in ('first_item', 'item'):
+                    c, start = self._char(buf, pos)
+                    if c == b']' and self._state == 'first_item':
+                        pos = start + 1
+                        self._finished = True
+                        self._state = 'next_key' if self.path else 'tail'
+                        continue
+                    # an element that is being scanned is not complete yet, it
+                    # is not matched again from its start
+                    m = None
+                    if _ITEMS is not None and (self._scan is None or self._scan[0] != self._offset + start):
+                        m = _ITEMS.match(buf, start)
+                    if m is not None:
+                        # parse the whole run at once
+                        items.extend(loads(b'[' + bytes(buf[start:m.end()]).rstrip(b' \t\r\n,') + b']'))
+                        pos = m.end()
+                        self._state = 'item'
+                        continue
+                    end = self._value_end(buf, start)
+                    items.append(loads(bytes(buf[start:end])))
+                    pos = end
+                    self._state = 'next_item'
+                elif self._state == 'next_item':
+                    c, pos = self._char(buf, pos)
+                    if c == b',':
+                        self._state = 'item'
+                    elif c == b']':
+                        self._finished = True
+                        self._state = 'next_key' if self.path else 'tail'
+                    else:
+                        self._error(pos)
+                    pos += 1
+                elif self._state == 'tail':
+                    # only whitespace may follow the document
+                    pos = _WHITESPACE.match(buf, pos).end()
+                    if pos < len(buf):
+                        self._error(pos)
+                    if not self._eof:
+                        raise _NeedMore()
+                    self._state = 'end'
+        except _NeedMore:
+            pass
+        if self._state == 'end':
+            buf.clear()
+        else:
+            del buf[:pos]
+            self._offset += pos
+        return items
@@ -1,624 +1,748 @@
-import json
-import re
-import aiohttp
-import codecs
-from darabonba.event import Event
-
-from io import BytesIO, StringIO
-from typing import Any, BinaryIO, Generator, AsyncGenerator, Dict
-
-# define WRITEABLE
-sse_line_pattern = re.compile('(?P<name>[^:]*):?( ?(?P<value>.*))?')
-
-class BaseStream:
-    def __init__(self, size=1024):
-        self.size = size
-
-    def read(self, size=1024):
-        raise NotImplementedError('read method must be overridden')
-
-    def __len__(self):
-        raise NotImplementedError('__len__ method must be overridden')
-
-    def __next__(self):
-        raise NotImplementedError('__next__ method must be overridden')
-
-    def __iter__(self):
-        return self
-
-
-class _ReadableMc(type):
-    def __instancecheck__(self, instance):
-        if hasattr(instance, 'read') and hasattr(instance, '__iter__'):
-            return True
-
-
-class READABLE(metaclass=_ReadableMc):
-    pass
-
-class SyncSSEResponseWrapper:
-    def __init__(self, session, response):
-        self.session = session
-        self.response = response
-        self._closed = False
-    
-    def close(self):
-        if not self._closed:
-            self.response.close()
-            self.session.close()
-            self._closed = True
-    
-    def __iter__(self):
-        return self._read_chunks()
-    
-    def _read_chunks(self):
-        try:
-            for chunk in self.response.iter_content(chunk_size=8192):
-                yield chunk
-        finally:
-            self.close()
-    
-    def read(self) -> bytes:
-        try:
-            return self.response.content
-        finally:
-            self.close()
-
-class SSEResponseWrapper:
-    def __init__(self, session: aiohttp.ClientSession, response: aiohttp.ClientResponse):
-        self.session = session
-        self.response = response
-        self._closed = False
-        self._content_cache = None
-    
-    async def close(self):
-        if not self._closed:
-            self.response.close()
-            await self.session.close()
-            self._closed = True
-    
-    def __aiter__(self):
-        return self._read_chunks()
-    
-    async def _read_chunks(self):
-        try:
-            async for chunk in self.response.content.iter_chunked(8192):
-                yield chunk
-        finally:
-            await self.close()
-    
-    async def read(self) -> bytes:
-        if self._content_cache is not None:
-            return self._content_cache
-        
-        try:
-            content = await self.response.read()
-            self._content_cache = content
-            return content
-        finally:
-            await self.close()
-
-class _WriteableMc(type):
-    def __instancecheck__(self, instance):
-        if hasattr(instance, 'write'):
-            return True
-
-
-class WRITABLE(metaclass=_WriteableMc):
-    pass
-
-
-STREAM_CLASS = (READABLE, WRITABLE)
-
-class Stream:
-
-    def __init__(self, data=None):
-        self.data = data if data is not None else b''
-        self.position = 0
-
-    @staticmethod
-    def __read_part(f, size=1024):
-        while True:
-            part = f.read(size)
-            if part:
-                yield part
-            else:
-                return
-
-    @staticmethod
-    def __to_string(
-        val: bytes,
-    ) -> str:
-        """
-        Convert a bytes to string(utf8)
-        @return: the return string
-        """
-        if isinstance(val, str):
-            return val
-        elif isinstance(val, bytes):
-            return val.decode('utf-8')
-        else:
-            return str(val)
-
-    @staticmethod
-    def __parse_json(
-        val: str,
-    ) -> Any:
-        """
-        Parse it by JSON format
-        @return: the parsed result
-        """
-        try:
-            return json.loads(val)
-        except ValueError:
-            raise RuntimeError(f'Failed to parse the value as json format, Value: "{val}".')
-
-    @staticmethod
-    def read_as_bytes(stream) -> bytes:
-        """
-        Read data from a readable stream, and compose it to a bytes
-        @param stream: the readable stream
-        @return: the bytes result
-        """
-        if isinstance(stream, SyncSSEResponseWrapper):
-            return stream.read()
-        elif isinstance(stream, READABLE):
-            b = b''
-            for part in Stream.__read_part(stream, 1024):
-                b += part
-            return b
-        elif isinstance(stream, bytes):
-            return stream
-        else:
-            return bytes(stream, encoding='utf-8')
-    
-    @staticmethod
-    async def read_as_bytes_async(stream) -> bytes:
-        """
-        Read data from a readable stream, and compose it to a bytes
-        @param stream: the readable stream
-        @return: the bytes result
-        """
-        if isinstance(stream, bytes):
-            return stream
-        elif isinstance(stream, str):
-            return bytes(stream, encoding='utf-8')
-        else:
-            return await stream.read()
-    
-    @staticmethod
-    def read_as_json(stream) -> Any:
-        """
-        Read data from a readable stream, and parse it by JSON format
-        @param stream: the readable stream
-        @return: the parsed result
-        """
-        return Stream.__parse_json(Stream.read_as_string(stream))
-
-    @staticmethod
-    async def read_as_json_async(stream) -> Any:
-        """
-        Read data from a readable stream, and parse it by JSON format
-        @param stream: the readable stream
-        @return: the parsed result
-        """
-        return Stream.__parse_json(
-            await Stream.read_as_string_async(stream)
-        )
-
-
-    @staticmethod
-    def read_as_string(stream) -> str:
-        """
-        Read data from a readable stream, and compose it to a string
-        @param stream: the readable stream
-        @return: the string result
-        """
-        buff = Stream.read_as_bytes(stream)
-        return Stream.__to_string(buff)
-    
-    @staticmethod
-    async def read_as_string_async(stream) -> str:
-        """
-        Read data from a readable stream, and compose it to a string
-        @param stream: the readable stream
-        @return: the string result
-        """
-        buff = await Stream.read_as_bytes_async(stream)
-        return Stream.__to_string(buff)
-    
-    @staticmethod
-    def read_as_sse(stream) -> Generator[Event, None, None]:
-        """
-        Read events from SSE stream (synchronous version)
-        """
-        if isinstance(stream, SyncSSEResponseWrapper):
-            for event in Stream._parse_sse_stream_sync(stream):
-                yield Event(
-                    id=event.get('id'),
-                    data=event.get('data'),
-                    event=event.get('event'),
-                    retry=event.get('retry'))
-        elif hasattr(stream, 'iter_content'):
-            # Read directly from the content stream of requests response object
-            for event in Stream._parse_sse_stream_from_response_sync(stream):
-                yield Event(
-                    id=event.get('id'),
-                    data=event.get('data'),
-                    event=event.get('event'),
-                    retry=event.get('retry'))
-        else:
-            for event in Stream._parse_sse_stream_sync(stream):
-                yield Event(
-                    id=event.get('id'),
-                    data=event.get('data'),
-                    event=event.get('event'),
-                    retry=event.get('retry'))
-
-    @staticmethod
-    async def read_as_sse_async(stream) -> AsyncGenerator[Event, None]:
-        """
-        Read events from SSE stream
-        """
-        if isinstance(stream, SSEResponseWrapper):
-            async for event in Stream._parse_sse_stream(stream):
-                yield Event(
-                    id = event.get('id'),
-                    data = event.get('data'),
-                    event= event.get('event'),
-                    retry = event.get('retry'))
-        elif hasattr(stream, 'content'):
-            # Read directly from the content stream of aiohttp response object
-            async for event in Stream._parse_sse_stream_from_response(stream):
-                yield Event(
-                    id = event.get('id'),
-                    data = event.get('data'),
-                    event= event.get('event'),
-                    retry = event.get('retry'))
-        else:
-            async for event in Stream._parse_sse_stream(stream):
-                yield Event(
-                    id = event.get('id'),
-                    data = event.get('data'),
-                    event= event.get('event'),
-                    retry = event.get('retry'))
-
-    def read(self, size=None):
-        if size is None:
-            return self.data[self.position:]
-        
-        start = self.position
-        end = min(start + size, len(self.data))
-        self.position = end
-        return self.data[start:end]
-
-    def write(self, data):
-        if isinstance(data, (bytes, str)):
-            self.data = data
-        else:
-            raise TypeError("Data should be bytes or string.")
-
-    def pipe(self, output_stream, buffer_size=1024):
-        if not isinstance(output_stream, Stream):
-            raise TypeError("Output stream should be an instance of Stream.")
-        
-        while True:
-            chunk = self.read(buffer_size)
-            if not chunk:
-                break
-            output_stream.write(chunk)
-    
-    @staticmethod
-    def to_readable(
-        value: Any,
-    ) -> BinaryIO:
-        """
-        Assert a value, if it is a readable, return it, otherwise throws
-        @return: the readable value
-        """
-        if isinstance(value, str):
-            value = value.encode('utf-8')
-
-        if isinstance(value, bytes):
-            value = BytesIO(value)
-        elif not isinstance(value, READABLE):
-            raise ValueError(f'The value is not a readable')
-        return value
-
-    @staticmethod
-    def to_writeable(
-        value: Any,
-    ) -> WRITABLE:
-        """
-        Assert a value, if it is a writeable, return it, otherwise throws
-        @return: the writeable value
-        """
-        if isinstance(value, str):
-            value = StringIO(value)
-
-        elif isinstance(value, bytes):
-            value = BytesIO(value)
-        elif not isinstance(value, WRITABLE):
-            raise ValueError(f'The value is not a writeable')
-        return value
-    
-    @staticmethod
-    async def _parse_sse_stream(wrapper: SSEResponseWrapper) -> AsyncGenerator[Dict[str, Any], None]:
-        """
-        Analyze SSE stream data
-        """
-        buffer = ""
-        current_event = Event()
-        
-        MAX_BUFFER_SIZE = 1024 * 1024  # 1MB
-        dec = codecs.getincrementaldecoder('utf-8')()
-        
-        async for chunk in wrapper:
-            try:
-                chunk_str = dec.decode(chunk)
-            except UnicodeDecodeError:
-                chunk_str = chunk.decode('utf-8', errors='replace')
-            
-            if len(buffer) + len(chunk_str) > MAX_BUFFER_SIZE:
-                import logging
-                logging.warning("SSE stream data too large, skipping chunk")
-                continue
-                
-            buffer += chunk_str
-
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                line = line.rstrip('\r')  # Remove \r
-                
-                if not line.strip():
-                    if current_event.data is not None:
-                        yield {
-                            'id': current_event.id,
-                            'event': current_event.event or 'message',
-                            'data': current_event.data,
-                            'retry': current_event.retry
-                        }
-                        current_event = Event()
-                    continue
-                
-                if line.startswith(':'):
-                    continue
-                
-                if ':' in line:
-                    match = sse_line_pattern.match(line)
-                    if match:
-                        name = match.group('name').strip()
-                        value = match.group('value').strip()
-                        
-                        if name == 'event':
-                            current_event.event = value
-                        elif name == 'id':
-                            current_event.id = value
-                        elif name == 'data':
-                            if current_event.data is None:
-                                current_event.data = value
-                            else:
-                                current_event.data += '\n' + value
-                        elif name == 'retry':
-                            try:
-                                current_event.retry = int(value)
-                            except ValueError:
-                                pass
-                else:
-                    if current_event.data is None:
-                        current_event.data = line
-                    else:
-                        current_event.data += '\n' + line
-
-        if buffer.strip() and current_event.data is not None:
-            yield {
-                'id': current_event.id,
-                'event': current_event.event or 'message',
-                'data': current_event.data,
-                'retry': current_event.retry
-            }
-
-    @staticmethod
-    async def _parse_sse_stream_from_response(response) -> AsyncGenerator[Dict[str, Any], None]:
-        buffer = ""
-        current_event = Event()
-
-        async for chunk in response.content.iter_chunked(8192):
-            try:
-                chunk_str = chunk.decode('utf-8')
-            except UnicodeDecodeError:
-                continue
-            
-            buffer += chunk_str
-            
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                line = line.rstrip('\r')
-                
-                if not line.strip():
-                    if current_event.data is not None:
-                        yield {
-                            'id': current_event.id,
-                            'event': current_event.event or 'message',
-                            'data': current_event.data,
-                            'retry': current_event.retry
-                        }
-                        current_event = Event()
-                    continue
-                
-                if line.startswith(':'):
-                    continue
-                
-                if ':' in line:
-                    match = sse_line_pattern.match(line)
-                    if match:
-                        name = match.group('name').strip()
-                        value = match.group('value').strip()
-                        
-                        if name == 'event':
-                            current_event.event = value
-                        elif name == 'id':
-                            current_event.id = value
-                        elif name == 'data':
-                            if current_event.data is None:
-                                current_event.data = value
-                            else:
-                                current_event.data += '\n' + value
-                        elif name == 'retry':
-                            try:
-                                current_event.retry = int(value)
-                            except ValueError:
-                                pass
-                else:
-                    if current_event.data is None:
-                        current_event.data = line
-                    else:
-                        current_event.data += '\n' + line
-
-        if buffer.strip() and current_event.data is not None:
-            yield {
-                'id': current_event.id,
-                'event': current_event.event or 'message',
-                'data': current_event.data,
-                'retry': current_event.retry
-            }
-    
-    @staticmethod
-    def _parse_sse_stream_sync(wrapper: SyncSSEResponseWrapper) -> Generator[Dict[str, Any], None, None]:
-        """
-        Analyze SSE stream data (synchronous version)
-        """
-        buffer = ""
-        current_event = Event()
-
-        for chunk in wrapper:
-            # Decoding byte data into strings
-            try:
-                chunk_str = chunk.decode('utf-8')
-            except UnicodeDecodeError:
-                # If decoding fails, skip this chunk
-                continue
-            
-            buffer += chunk_str
-            
-            # Split processing by row
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                line = line.rstrip('\r')  # Remove \r
-                
-                if not line.strip():
-                    if current_event.data is not None:
-                        yield {
-                            'id': current_event.id,
-                            'event': current_event.event or 'message',
-                            'data': current_event.data,
-                            'retry': current_event.retry
-                        }
-                        current_event = Event()
-                    continue
-                
-                # Skip comment lines
-                if line.startswith(':'):
-                    continue
-                
-                if ':' in line:
-                    match = sse_line_pattern.match(line)
-                    if match:
-                        name = match.group('name').strip()
-                        value = match.group('value').strip()
-                        
-                        if name == 'event':
-                            current_event.event = value
-                        elif name == 'id':
-                            current_event.id = value
-                        elif name == 'data':
-                            if current_event.data is None:
-                                current_event.data = value
-                            else:
-                                current_event.data += '\n' + value
-                        elif name == 'retry':
-                            try:
-                                current_event.retry = int(value)
-                            except ValueError:
-                                pass
-                else:
-                    if current_event.data is None:
-                        current_event.data = line
-                    else:
-                        current_event.data += '\n' + line
-
-        if buffer.strip() and current_event.data is not None:
-            yield {
-                'id': current_event.id,
-                'event': current_event.event or 'message',
-                'data': current_event.data,
-                'retry': current_event.retry
-            }
-
-    @staticmethod
-    def _parse_sse_stream_from_response_sync(response) -> Generator[Dict[str, Any], None, None]:
-        """
-        Parse SSE stream from requests response object (synchronous version)
-        """
-        buffer = ""
-        current_event = Event()
-
-        for chunk in response.iter_content(chunk_size=8192):
-            try:
-                chunk_str = chunk.decode('utf-8')
-            except UnicodeDecodeError:
-                continue
-            
-            buffer += chunk_str
-            
-            while '\n' in buffer:
-                line, buffer = buffer.split('\n', 1)
-                line = line.rstrip('\r')
-                
-                if not line.strip():
-                    if current_event.data is not None:
-                        yield {
-                            'id': current_event.id,
-                            'event': current_event.event or 'message',
-                            'data': current_event.data,
-                            'retry': current_event.retry
-                        }
-                        current_event = Event()
-                    continue
-                
-                if line.startswith(':'):
-                    continue
-                
-                if ':' in line:
-                    match = sse_line_pattern.match(line)
-                    if match:
-                        name = match.group('name').strip()
-                        value = match.group('value').strip()
-                        
-                        if name == 'event':
-                            current_event.event = value
-                        elif name == 'id':
-                            current_event.id = value
-                        elif name == 'data':
-                            if current_event.data is None:
-                                current_event.data = value
-                            else:
-                                current_event.data += '\n' + value
-                        elif name == 'retry':
-                            try:
-                                current_event.retry = int(value)
-                            except ValueError:
-                                pass
-                else:
-                    if current_event.data is None:
-                        current_event.data = line
-                    else:
-                        current_event.data += '\n' + line
-
-        if buffer.strip() and current_event.data is not None:
-            yield {
-                'id': current_event.id,
-                'event': current_event.event or 'message',
-                'data': current_event.data,
-                'retry': current_event.retry
-            }
\ No newline at end of file
+import os
+import stat
+import aiohttp
+from darabonba.event import SSEEvent
+from darabonba.utils import json_codec
+from darabonba.utils.json_codec import JSONItemParser
+from darabonba.exceptions import SSEOverflowException
+
+from io import BytesIO, StringIO
+from typing import Any, BinaryIO, Callable, Generator, AsyncGenerator, Union
+
+READ_BLOCK_SIZE = 64 * 1024
+DEFAULT_SSE_MAX_LINE_SIZE = 16 * 1024 * 1024
+DEFAULT_SSE_MAX_EVENT_SIZE = 16 * 1024 * 1024
+SSE_OVERFLOW_RAISE = 'raise'
+SSE_OVERFLOW_TRUNCATE = 'truncate'
+
+class BaseStream:
+    def __init__(self, size=1024):
+        self.size = size
+
+    def read(self, size=1024):
+        raise NotImplementedError('read method must be overridden')
+
+    def __len__(self):
+        raise NotImplementedError('__len__ method must be overridden')
+
+    def __next__(self):
+        raise NotImplementedError('__next__ method must be overridden')
+
+    def __iter__(self):
+        return self
+
+
+class _ReadableMc(type):
+    def __instancecheck__(self, instance):
+        if hasattr(instance, 'read') and hasattr(instance, '__iter__'):
+            return True
+
+
+class READABLE(metaclass=_ReadableMc):
+    pass
+
+class SyncSSEResponseWrapper:
+    def __init__(self, session, response, release=None):
+        """
+        @param session: the session of the response
+        @param response: the streamed response
+        @param release: returns a pooled session to its pool, the session
+        is shared then and is left open, otherwise it is closed with the response
+        """
+        self.session = session
+        self.response = response
+        self._release = release
+        self._closed = False
+    
+    def close(self):
+        if not self._closed:
+            self.response.close()
+            self._closed = True
+            if self._release is not None:
+                self._release()
+            else:
+                self.session.close()
+    
+    def __iter__(self):
+        return self._read_chunks()
+    
+    def _read_chunks(self):
+        try:
+            for chunk in self.response.iter_content(chunk_size=8192):
+                yield chunk
+        finally:
+            self.close()
+    
+    def read(self) -> bytes:
+        try:
+            return self.response.content
+        finally:
+            self.close()
+
+class SSEResponseWrapper:
+    def __init__(self, session: aiohttp.ClientSession, response: aiohttp.ClientResponse):
+        self.session = session
+        self.response = response
+        self._closed = False
+        self._content_cache = None
+    
+    async def close(self):
+        if not self._closed:
+            self.response.close()
+            await self.session.close()
+            self._closed = True
+    
+    def __aiter__(self):
+        return self._read_chunks()
+    
+    async def _read_chunks(self):
+        try:
+            async for chunk in self.response.content.iter_chunked(8192):
+                yield chunk
+        finally:
+            await self.close()
+    
+    async def read(self) -> bytes:
+        if self._content_cache is not None:
+            return self._content_cache
+        
+        try:
+            content = await self.response.read()
+            self._content_cache = content
+            return content
+        finally:
+            await self.close()
+
+class SSEParser:
+    """
+    Incremental parser of the text/event-stream format. Chunks are
+    scanned as bytes by offset, lines may end with CRLF, LF or CR and
+    may be split across chunks at any byte.
+    Lines and event data are bounded, exceeding a limit either raises
+    SSEOverflowException or truncates the event and flags it.
+    With raw set, the data of the events is left as undecoded bytes,
+    with decode set, it is replaced by the result of decode on the bytes
+    and a failure is reported on the event error instead of raised.
+    The last event id and the reconnection time are kept like the id and
+    retry of the events, also when they come in a block without data.
+    """
+
+    def __init__(
+        self,
+        max_line_size: int = None,
+        max_event_size: int = None,
+        overflow: str = SSE_OVERFLOW_RAISE,
+        raw: bool = False,
+        decode: Callable[[bytes], Any] = None,
+    ):
+        if overflow not in (SSE_OVERFLOW_RAISE, SSE_OVERFLOW_TRUNCATE):
+            raise ValueError(f'overflow must be "{SSE_OVERFLOW_RAISE}" or "{SSE_OVERFLOW_TRUNCATE}"')
+        self.max_line_size = max_line_size
+        self.max_event_size = max_event_size
+        self.overflow = overflow
+        self.raw = raw
+        self.decode = decode
+        self._buffer = bytearray()
+        # offset from which the buffer has not been scanned for line endings
+        self._scanned = 0
+        # the last chunk ended with CR, a leading LF of the next one belongs to it
+        self._after_cr = False
+        # the rest of a truncated line is dropped until its line ending
+        self._skip_line = False
+        self.last_event_id = None
+        self.retry = None
+        self._reset()
+
+    def _reset(self):
+        self._id = None
+        self._event = None
+        self._data = None
+        self._data_size = 0
+        self._retry = None
+        self._truncated = False
+
+    @property
+    def buffered(self) -> int:
+        """
+        @return: the size of the incomplete line held in the buffer
+        """
+        return len(self._buffer)
+
+    def _overflow(self, message: str, limit: int):
+        if self.overflow == SSE_OVERFLOW_RAISE:
+            raise SSEOverflowException(message, limit)
+        self._truncated = True
+
+    def feed(self, chunk) -> list:
+        """
+        Parse a chunk of the stream
+        @param chunk: the bytes or string chunk
+        @return: the events completed by the chunk
+        """
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        events = []
+        if not chunk:
+            return events
+        if self._skip_line:
+            end = len(chunk)
+            for sep in (b'\n', b'\r'):
+                index = chunk.find(sep, 0, end)
+                if index >= 0:
+                    end = index
+            if end == len(chunk):
+                return events
+            self._skip_line = False
+            chunk = chunk[end:]
+        buf = self._buffer
+        pos = 0
+        if self._after_cr:
+            self._after_cr = False
+            if not buf and chunk[:1] == b'\n':
+                pos = 1
+        buf += chunk
+        n = len(buf)
+        scan = max(pos, self._scanned)
+        lf = buf.find(b'\n', scan)
+        while pos < n:
+            if 0 <= lf < pos:
+                lf = buf.find(b'\n', pos)
+            cr = buf.find(b'\r', max(pos, scan), lf if lf >= 0 else n)
+            if cr >= 0:
+                end = cr
+                nxt = cr + 1
+                if nxt < n and buf[nxt] == 0x0A:
+                    nxt += 1
+                elif nxt == n:
+                    self._after_cr = True
+            elif lf >= 0:
+                end = lf
+                nxt = lf + 1
+            else:
+                break
+            self._parse_line(bytes(buf[pos:end]), events)
+            pos = nxt
+        del buf[:pos]
+        if self.max_line_size is not None and len(buf) > self.max_line_size:
+            self._overflow(f'SSE line exceeds {self.max_line_size} bytes', self.max_line_size)
+            del buf[self.max_line_size:]
+            self._skip_line = True
+        self._scanned = len(buf)
+        return events
+
+    def close(self) -> list:
+        """
+        Flush the incomplete line and the pending event at the end of the stream
+        @return: the remaining events
+        """
+        events = []
+        if self._buffer:
+            line = bytes(self._buffer)
+            self._buffer.clear()
+            self._scanned = 0
+            self._parse_line(line, events)
+        self._dispatch(events)
+        return events
+
+    def parse(self, chunks) -> Generator[SSEEvent, None, None]:
+        """
+        Parse the events of an iterable of chunks, a chunk is only pulled
+        once the events of the previous one are consumed
+        @param chunks: the bytes or string chunks of the stream
+        @return: the generator of the events
+        """
+        for chunk in chunks:
+            yield from self.feed(chunk)
+        yield from self.close()
+
+    def _dispatch(self, events: list):
+        if self._id is not None:
+            self.last_event_id = self._id
+        if self._data is not None:
+            data = b'\n'.join(self._data)
+            error = None
+            if self.decode is not None:
+                try:
+                    data = self.decode(data)
+                except ValueError as e:
+                    error = e
+            if error is not None or (self.decode is None and not self.raw):
+                data = data.decode('utf-8', errors='replace')
+            events.append(SSEEvent(
+                self._id,
+                self._event or 'message',
+                data,
+                self._retry,
+                True if self._truncated else None,
+                error))
+        self._reset()
+
+    def _parse_line(self, line: bytes, events: list):
+        if not line.strip():
+            self._dispatch(events)
+            return
+        if self.max_line_size is not None and len(line) > self.max_line_size:
+            self._overflow(f'SSE line exceeds {self.max_line_size} bytes', self.max_line_size)
+            line = line[:self.max_line_size]
+        # comment line
+        if line[0] == 0x3A:
+            return
+        colon = line.find(b':')
+        if colon < 0:
+            # lines without field name are taken as data
+            name = b'data'
+            start = 0
+        else:
+            name = line[:colon].strip()
+            start = colon + 1
+            if line[start:start + 1] == b' ':
+                start += 1
+
+        if name == b'data':
+            # data is kept as views of the lines and joined once on dispatch
+            value = memoryview(line)[start:] if start else line
+            size = self._data_size + len(value) + (0 if self._data is None else 1)
+            if self.max_event_size is not None and size > self.max_event_size:
+                self._overflow(f'SSE event data exceeds {self.max_event_size} bytes', self.max_event_size)
+                remaining = self.max_event_size - self._data_size - (0 if self._data is None else 1)
+                if remaining < 0:
+                    return
+                value = value[:remaining]
+                size = self.max_event_size
+            self._data_size = size
+            if self._data is None:
+                self._data = [value]
+            else:
+                self._data.append(value)
+        elif name == b'event':
+            self._event = line[start:].decode('utf-8', errors='replace')
+        elif name == b'id':
+            self._id = line[start:].decode('utf-8', errors='replace')
+        elif name == b'retry':
+            value = line[start:]
+            if value.isdigit():
+                self._retry = self.retry = int(value)
+
+
+class _WriteableMc(type):
+    def __instancecheck__(self, instance):
+        if hasattr(instance, 'write'):
+            return True
+
+
+class WRITABLE(metaclass=_WriteableMc):
+    pass
+
+
+STREAM_CLASS = (READABLE, WRITABLE)
+
+class Stream:
+
+    def __init__(self, data=None):
+        self.data = data if data is not None else b''
+        self.position = 0
+
+    @staticmethod
+    def __read_part(f, size=1024):
+        while True:
+            part = f.read(size)
+            if part:
+                yield part
+            else:
+                return
+
+    @staticmethod
+    def __remaining_length(f):
+        """
+        Get the unread length of a regular file or an in-memory stream
+        @return: the length, or None if it is unknown
+        """
+        try:
+            try:
+                st = os.fstat(f.fileno())
+            except (AttributeError, OSError, ValueError):
+                if not hasattr(f, 'getbuffer'):
+                    return None
+                with f.getbuffer() as view:
+                    size = view.nbytes
+            else:
+                if not stat.S_ISREG(st.st_mode):
+                    return None
+                size = st.st_size
+            return max(size - f.tell(), 0)
+        except (AttributeError, OSError, ValueError):
+            return None
+
+    @staticmethod
+    def __read_all(f, block_size=READ_BLOCK_SIZE) -> bytes:
+        """
+        Read a readable stream to the end, the reads are sized by the
+        remaining length when it is known, read into one growing buffer
+        when the stream supports readinto, or joined once otherwise
+        @return: the bytes result
+        """
+        length = Stream.__remaining_length(f)
+        if length is not None:
+            head = f.read(length) if length else b''
+            # the file may have grown since its size was taken
+            tail = b''.join(Stream.__read_part(f, block_size))
+            return head + tail if tail else bytes(head)
+
+        if hasattr(f, 'readinto'):
+            buf = bytearray(block_size)
+            n = 0
+            while True:
+                if n == len(buf):
+                    buf.extend(bytes(len(buf)))
+                with memoryview(buf) as view, view[n:] as free:
+                    r = f.readinto(free)
+                if not r:
+                    break
+                n += r
+            del buf[n:]
+            return bytes(buf)
+
+        return b''.join(Stream.__read_part(f, block_size))
+
+    @staticmethod
+    def __to_string(
+        val: bytes,
+    ) -> str:
+        """
+        Convert a bytes to string(utf8)
+        @return: the return string
+        """
+        if isinstance(val, str):
+            return val
+        elif isinstance(val, bytes):
+            return val.decode('utf-8')
+        else:
+            return str(val)
+
+    @staticmethod
+    def __parse_json(
+        val: Union[bytes, str],
+    ) -> Any:
+        """
+        Parse it by JSON format, bytes are parsed without decoding them first
+        @return: the parsed result
+        """
+        try:
+            return json_codec.loads(val)
+        except ValueError:
+            if isinstance(val, bytes):
+                val = val.decode('utf-8', errors='replace')
+            raise RuntimeError(f'Failed to parse the value as json format, Value: "{val}".')
+
+    @staticmethod
+    def read_as_bytes(stream, block_size: int = READ_BLOCK_SIZE) -> bytes:
+        """
+        Read data from a readable stream, and compose it to a bytes
+        @param stream: the readable stream
+        @param block_size: the size of each read when the length is unknown
+        @return: the bytes result
+        """
+        if isinstance(stream, SyncSSEResponseWrapper):
+            return stream.read()
+        elif isinstance(stream, READABLE):
+            return Stream.__read_all(stream, block_size)
+        elif isinstance(stream, bytes):
+            return stream
+        else:
+            return bytes(stream, encoding='utf-8')
+    
+    @staticmethod
+    async def read_as_bytes_async(stream) -> bytes:
+        """
+        Read data from a readable stream, and compose it to a bytes
+        @param stream: the readable stream
+        @return: the bytes result
+        """
+        if isinstance(stream, bytes):
+            return stream
+        elif isinstance(stream, str):
+            return bytes(stream, encoding='utf-8')
+        else:
+            return await stream.read()
+    
+    @staticmethod
+    def read_as_json(stream) -> Any:
+        """
+        Read data from a readable stream, and parse it by JSON format
+        @param stream: the readable stream
+        @return: the parsed result
+        """
+        if not isinstance(stream, str):
+            stream = Stream.read_as_bytes(stream)
+        return Stream.__parse_json(stream)
+
+    @staticmethod
+    async def read_as_json_async(stream) -> Any:
+        """
+        Read data from a readable stream, and parse it by JSON format
+        @param stream: the readable stream
+        @return: the parsed result
+        """
+        if not isinstance(stream, str):
+            stream = await Stream.read_as_bytes_async(stream)
+        return Stream.__parse_json(stream)
+
+
+    @staticmethod
+    def __iter_chunks(stream, block_size: int = READ_BLOCK_SIZE):
+        if isinstance(stream, SyncSSEResponseWrapper):
+            return iter(stream)
+        elif isinstance(stream, READABLE):
+            return Stream.__read_part(stream, block_size)
+        elif isinstance(stream, (bytes, str)):
+            return iter((stream,))
+        else:
+            return iter((bytes(stream, encoding='utf-8'),))
+
+    @staticmethod
+    async def __iter_chunks_async(stream):
+        if isinstance(stream, (bytes, str)):
+            yield stream
+        elif hasattr(stream, '__aiter__'):
+            async for chunk in stream:
+                yield chunk
+        elif hasattr(stream, 'content'):
+            # the content stream of aiohttp response object
+            async for chunk in stream.content.iter_chunked(READ_BLOCK_SIZE):
+                yield chunk
+        else:
+            yield await stream.read()
+
+    @staticmethod
+    def read_as_json_items(stream, path=None, block_size: int = READ_BLOCK_SIZE) -> Generator[Any, None, None]:
+        """
+        Read a JSON document from a readable stream, and yield the elements
+        of one of its arrays while they are read, e.g. a huge list response
+        @param stream: the readable stream
+        @param path: the object keys leading to the array, as a list or a
+        dotted string like 'Instances.Instance', the document itself is the
+        array if it is None
+        @param block_size: the size of each read
+        @return: the generator of the elements
+        """
+        try:
+            yield from JSONItemParser(path).parse(Stream.__iter_chunks(stream, block_size))
+        except ValueError as e:
+            raise RuntimeError(f'Failed to parse the value as json format, {e}.')
+
+    @staticmethod
+    async def read_as_json_items_async(stream, path=None) -> AsyncGenerator[Any, None]:
+        """
+        Read a JSON document from a readable stream, and yield the elements
+        of one of its arrays while they are read, e.g. a huge list response
+        @param stream: the readable stream
+        @param path: the object keys leading to the array, as a list or a
+        dotted string like 'Instances.Instance', the document itself is the
+        array if it is None
+        @return: the async generator of the elements
+        """
+        parser = JSONItemParser(path)
+        try:
+            async for chunk in Stream.__iter_chunks_async(stream):
+                for item in parser.feed(chunk):
+                    yield item
+            for item in parser.close():
+                yield item
+        except ValueError as e:
+            raise RuntimeError(f'Failed to parse the value as json format, {e}.')
+
+    @staticmethod
+    def read_as_string(stream) -> str:
+        """
+        Read data from a readable stream, and compose it to a string
+        @param stream: the readable stream
+        @return: the string result
+        """
+        buff = Stream.read_as_bytes(stream)
+        return Stream.__to_string(buff)
+    
+    @staticmethod
+    async def read_as_string_async(stream) -> str:
+        """
+        Read data from a readable stream, and compose it to a string
+        @param stream: the readable stream
+        @return: the string result
+        """
+        buff = await Stream.read_as_bytes_async(stream)
+        return Stream.__to_string(buff)
+    
+    @staticmethod
+    def __get_decoder(decode):
+        if decode is None or callable(decode):
+            return decode
+        if decode == 'json':
+            return json_codec.loads
+        raise ValueError(f'Unsupported SSE decode mode: {decode}')
+
+    @staticmethod
+    def read_as_sse(
+        stream,
+        max_line_size: int = DEFAULT_SSE_MAX_LINE_SIZE,
+        max_event_size: int = DEFAULT_SSE_MAX_EVENT_SIZE,
+        overflow: str = SSE_OVERFLOW_RAISE,
+        raw: bool = False,
+        decode: Union[str, Callable[[bytes], Any]] = None,
+    ) -> Generator[SSEEvent, None, None]:
+        """
+        Read events from SSE stream (synchronous version), the stream is
+        read only as fast as the events are consumed
+        @param stream: the SSE stream
+        @param max_line_size: the maximum size in bytes of a line
+        @param max_event_size: the maximum size in bytes of the data of an event
+        @param overflow: 'raise' to raise SSEOverflowException when a limit is
+        exceeded, or 'truncate' to cut the event and flag it as truncated
+        @param raw: keep the data as bytes, e.g. to pass it to json.loads as is
+        @param decode: 'json' or a callable to decode the data bytes of each
+        event, the events that fail to decode keep their string data and
+        carry the exception as error
+        """
+        options = dict(max_line_size=max_line_size, max_event_size=max_event_size, overflow=overflow,
+                       raw=raw, decode=Stream.__get_decoder(decode))
+        if isinstance(stream, SyncSSEResponseWrapper):
+            events = Stream._parse_sse_stream_sync(stream, **options)
+        elif hasattr(stream, 'iter_content'):
+            # Read directly from the content stream of requests response object
+            events = Stream._parse_sse_stream_from_response_sync(stream, **options)
+        else:
+            events = Stream._parse_sse_stream_sync(stream, **options)
+        yield from events
+
+    @staticmethod
+    async def read_as_sse_async(
+        stream,
+        max_line_size: int = DEFAULT_SSE_MAX_LINE_SIZE,
+        max_event_size: int = DEFAULT_SSE_MAX_EVENT_SIZE,
+        overflow: str = SSE_OVERFLOW_RAISE,
+        raw: bool = False,
+        decode: Union[str, Callable[[bytes], Any]] = None,
+    ) -> AsyncGenerator[SSEEvent, None]:
+        """
+        Read events from SSE stream, the stream is read only as fast as
+        the events are consumed
+        @param stream: the SSE stream
+        @param max_line_size: the maximum size in bytes of a line
+        @param max_event_size: the maximum size in bytes of the data of an event
+        @param overflow: 'raise' to raise SSEOverflowException when a limit is
+        exceeded, or 'truncate' to cut the event and flag it as truncated
+        @param raw: keep the data as bytes, e.g. to pass it to json.loads as is
+        @param decode: 'json' or a callable to decode the data bytes of each
+        event, the events that fail to decode keep their string data and
+        carry the exception as error
+        """
+        options = dict(max_line_size=max_line_size, max_event_size=max_event_size, overflow=overflow,
+                       raw=raw, decode=Stream.__get_decoder(decode))
+        if isinstance(stream, SSEResponseWrapper):
+            events = Stream._parse_sse_stream(stream, **options)
+        elif hasattr(stream, 'content'):
+            # Read directly from the content stream of aiohttp response object
+            events = Stream._parse_sse_stream_from_response(stream, **options)
+        else:
+            events = Stream._parse_sse_stream(stream, **options)
+        async for event in events:
+            yield event
+
+    def read(self, size=None):
+        if size is None:
+            return self.data[self.position:]
+        
+        start = self.position
+        end = min(start + size, len(self.data))
+        self.position = end
+        return self.data[start:end]
+
+    def write(self, data):
+        if isinstance(data, (bytes, str)):
+            self.data = data
+        else:
+            raise TypeError("Data should be bytes or string.")
+
+    def pipe(self, output_stream, buffer_size=1024):
+        if not isinstance(output_stream, Stream):
+            raise TypeError("Output stream should be an instance of Stream.")
+        
+        while True:
+            chunk = self.read(buffer_size)
+            if not chunk:
+                break
+            output_stream.write(chunk)
+    
+    @staticmethod
+    def to_readable(
+        value: Any,
+    ) -> BinaryIO:
+        """
+        Assert a value, if it is a readable, return it, otherwise throws
+        @return: the readable value
+        """
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+
+        if isinstance(value, bytes):
+            value = BytesIO(value)
+        elif not isinstance(value, READABLE):
+            raise ValueError(f'The value is not a readable')
+        return value
+
+    @staticmethod
+    def to_writeable(
+        value: Any,
+    ) -> WRITABLE:
+        """
+        Assert a value, if it is a writeable, return it, otherwise throws
+        @return: the writeable value
+        """
+        if isinstance(value, str):
+            value = StringIO(value)
+
+        elif isinstance(value, bytes):
+            value = BytesIO(value)
+        elif not isinstance(value, WRITABLE):
+            raise ValueError(f'The value is not a writeable')
+        return value
+    
+    @staticmethod
+    async def _parse_sse_stream(wrapper: SSEResponseWrapper, **options) -> AsyncGenerator[SSEEvent, None]:
+        """
+        Analyze SSE stream data
+        """
+        parser = SSEParser(**options)
+
+        async for chunk in wrapper:
+            for event in parser.feed(chunk):
+                yield event
+
+        for event in parser.close():
+            yield event
+
+    @staticmethod
+    async def _parse_sse_stream_from_response(response, **options) -> AsyncGenerator[SSEEvent, None]:
+        """
+        Parse SSE stream from aiohttp response object
+        """
+        parser = SSEParser(**options)
+
+        async for chunk in response.content.iter_chunked(8192):
+            for event in parser.feed(chunk):
+                yield event
+
+        for event in parser.close():
+            yield event
+
+    @staticmethod
+    def _parse_sse_stream_sync(wrapper: SyncSSEResponseWrapper, **options) -> Generator[SSEEvent, None, None]:
+        """
+        Analyze SSE stream data (synchronous version)
+        """
+        return SSEParser(**options).parse(wrapper)
+
+    @staticmethod
+    def _parse_sse_stream_from_response_sync(response, **options) -> Generator[SSEEvent, None, None]:
+        """
+        Parse SSE stream from requests response object (synchronous version)
+        """
+        return SSEParser(**options).parse(response.iter_content(chunk_size=8192))
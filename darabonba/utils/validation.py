@@ -2,6 +2,28 @@ import re
 
 from darabonba.exceptions import ValidateException
 
+# the compiled validation patterns, the re module cache only keeps the
+# last 512 patterns, which a large SDK exceeds
+_patterns = {}
+_MAX_PATTERNS = 4096
+
+
+def compile_pattern(pattern):
+    """
+    Compile a validation pattern once, it is matched case-insensitively
+    in multiline mode
+    @param pattern: the pattern string or compiled pattern
+    @return: the compiled pattern
+    """
+    compiled = _patterns.get(pattern)
+    if compiled is None:
+        if isinstance(pattern, re.Pattern):
+            return pattern
+        if len(_patterns) >= _MAX_PATTERNS:
+            _patterns.clear()
+        compiled = _patterns[pattern] = re.compile(pattern, re.M | re.I)
+    return compiled
+
 
 def assert_integer_positive(integer, name):
     if isinstance(integer, int) and integer > 0:
@@ -10,7 +32,7 @@ def assert_integer_positive(integer, name):
 
 
 def validate_pattern(prop, prop_name, pattern):
-    match_obj = re.search(pattern, prop, re.M | re.I)
+    match_obj = compile_pattern(pattern).search(prop)
     if not match_obj:
         raise ValidateException('The parameter %s not match with %s' % (prop_name, pattern))
 
@@ -1,43 +1,215 @@
 from xml.etree import ElementTree
-from darabonba.model import DaraModel
+from darabonba.model import DaraModel, DaraSlotsModel
+from darabonba.response import DaraResponse
 from collections import defaultdict
 
-class XML:
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+else:
+    # resolve_entities='internal' needs lxml 5
+    if lxml_etree.LXML_VERSION < (5,):
+        lxml_etree = None
 
-    _LIST_TYPE = (list, tuple, set)
+XML_BLOCK_SIZE = 64 * 1024
+XML_BACKEND_ETREE = 'etree'
+XML_BACKEND_LXML = 'lxml'
 
-    @staticmethod
-    def __get_xml_factory(elem, val, parent_element=None):
-        if val is None:
+
+def _etree_parser(target):
+    return ElementTree.XMLParser(target=target)
+
+
+# name: factory of the push parser calling the target, every parser
+# reports the same events for a document, so parse_xml gives the same dict
+_parsers = {XML_BACKEND_ETREE: _etree_parser}
+
+if lxml_etree is not None:
+    class _LXMLParser:
+        def __init__(self, target):
+            # like expat: no limit on the size of the document, no entity
+            # loaded from outside
+            self._parser = lxml_etree.XMLParser(
+                target=target, huge_tree=True, resolve_entities='internal', no_network=True)
+
+        def _error(self, e):
+            error = ElementTree.ParseError(str(e))
+            error.position = e.position
+            return error
+
+        def feed(self, data):
+            if isinstance(data, memoryview):
+                # lxml only takes bytes or str
+                data = data.tobytes()
+            try:
+                self._parser.feed(data)
+            except lxml_etree.XMLSyntaxError as e:
+                raise self._error(e) from e
+
+        def close(self):
+            try:
+                return self._parser.close()
+            except lxml_etree.XMLSyntaxError as e:
+                raise self._error(e) from e
+
+    _parsers[XML_BACKEND_LXML] = _LXMLParser
+
+
+# lxml calls the target more slowly than expat, it is only faster on
+# documents with large text values, so it is not the default
+_backend = XML_BACKEND_ETREE
+
+
+class _XMLDictBuilder:
+    """
+    Parser target building the dict of XML._parse_xml from the parser
+    events, no element tree is kept. With a path, only the elements at the
+    path are built and collected in items, each as soon as it ends.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        # the elements being built: [attrib, text parts, children or None]
+        self._stack = []
+        # the tags from the root to the current element outside of the path
+        self._tags = []
+        self.items = []
+        self.result = None
+
+    def start(self, tag, attrib):
+        stack = self._stack
+        if stack:
+            parent = stack[-1]
+            if parent[2] is None:
+                # the text after the first child is a tail, it is ignored
+                parent[2] = {}
+        elif self._path is not None:
+            self._tags.append(tag)
+            if self._tags != self._path:
+                return
+        stack.append([attrib, [], None])
+
+    def data(self, text):
+        if self._stack:
+            frame = self._stack[-1]
+            if frame[2] is None:
+                frame[1].append(text)
+
+    def end(self, tag):
+        stack = self._stack
+        if not stack:
+            self._tags.pop()
             return
+        attrib, text, children = stack.pop()
+        if children:
+            value = {k: v[0] if len(v) == 1 else v for k, v in children.items()}
+        else:
+            value = {} if attrib else None
+        if attrib:
+            value.update(('@' + k, v) for k, v in attrib.items())
+        if text:
+            text = ''.join(text).strip()
+            if children or attrib:
+                if text:
+                    value['#text'] = text
+            else:
+                value = text
+        if stack:
+            siblings = stack[-1][2].get(tag)
+            if siblings is None:
+                stack[-1][2][tag] = [value]
+            else:
+                siblings.append(value)
+        elif self._path is None:
+            self.result = {tag: value}
+        else:
+            self._tags.pop()
+            self.items.append(value)
+
+    def close(self):
+        return self.result
+
+
+def _escape(text: str) -> str:
+    # the escaping of ElementTree
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
 
-        if isinstance(val, dict):
-            XML.__get_xml_by_dict(elem, val)
+class _XMLWriter:
+    """
+    Writer of the XML of XML.to_xml straight from the values, the text
+    is the one ElementTree.tostring writes for the element trees the
+    values used to be converted to
+    """
+    # the number of parts buffered before they are joined into a chunk
+    FLUSH_PARTS = 4096
+
+    def __init__(self, stream=None):
+        self._parts = []
+        self._chunks = []
+        self._stream = stream
+
+    def write(self, tag, val, in_parent: bool = False):
+        parts = self._parts
+        if not isinstance(tag, str):
+            raise TypeError(f'cannot serialize {tag!r} (type {type(tag).__name__})')
+        if val is None:
+            parts.append(f'<{tag} />')
+        elif isinstance(val, dict):
+            if not val:
+                parts.append(f'<{tag} />')
+                return
+            parts.append(f'<{tag}>')
+            for k in val:
+                self.write(k, val[k], True)
+            parts.append(f'</{tag}>')
+            if len(parts) >= self.FLUSH_PARTS:
+                self.flush()
         elif isinstance(val, XML._LIST_TYPE):
-            if parent_element is None:
+            if not in_parent:
                 raise RuntimeError("Missing root tag")
-            XML.__get_xml_by_list(elem, val, parent_element)
+            # the items are siblings with the same tag
+            if val.__len__() == 0:
+                parts.append(f'<{tag} />')
+                return
+            for i in range(val.__len__()):
+                self.write(tag, val[i], True)
+                if len(parts) >= self.FLUSH_PARTS:
+                    self.flush()
         else:
-            elem.text = str(val)
+            text = str(val)
+            if text:
+                parts.append(f'<{tag}>{_escape(text)}</{tag}>')
+            else:
+                parts.append(f'<{tag} />')
 
-    @staticmethod
-    def __get_xml_by_dict(elem, val):
-        for k in val:
-            sub_elem = ElementTree.SubElement(elem, k)
-            XML.__get_xml_factory(sub_elem, val[k], elem)
+    def declaration(self):
+        self._parts.append('<?xml version="1.0" encoding="utf-8"?>')
 
-    @staticmethod
-    def __get_xml_by_list(elem, val, parent_element):
-        i = 0
-        tag_name = elem.tag
-        if val.__len__() > 0:
-            XML.__get_xml_factory(elem, val[0], parent_element)
-
-        for item in val:
-            if i > 0:
-                sub_elem = ElementTree.SubElement(parent_element, tag_name)
-                XML.__get_xml_factory(sub_elem, item, parent_element)
-            i = i + 1
+    def getvalue(self) -> str:
+        self.flush()
+        return b''.join(self._chunks).decode('ascii')
+
+    def flush(self):
+        # tostring writes ASCII, the other characters as references
+        chunk = ''.join(self._parts).encode('ascii', 'xmlcharrefreplace')
+        self._parts.clear()
+        if self._stream is None:
+            self._chunks.append(chunk)
+        elif chunk:
+            self._stream.write(chunk)
+
+
+class XML:
+
+    _LIST_TYPE = (list, tuple, set)
 
     @staticmethod
     def _parse_xml(t):
@@ -63,37 +235,128 @@ class XML:
         return d
 
     @staticmethod
-    def parse_xml(body, response=None):
+    def __iter_chunks(body, block_size: int):
+        if isinstance(body, DaraResponse):
+            body = body.body
+        if isinstance(body, (str, bytes, bytearray, memoryview)):
+            if not isinstance(body, str):
+                body = memoryview(body)
+            for i in range(0, len(body), block_size):
+                yield body[i:i + block_size]
+        elif hasattr(body, 'read'):
+            while True:
+                chunk = body.read(block_size)
+                if not chunk:
+                    break
+                yield chunk
+        elif body is not None:
+            yield from body
+
+    @staticmethod
+    def get_backend() -> str:
+        """
+        @return: the name of the XML parser backend in use
+        """
+        return _backend
+
+    @staticmethod
+    def set_backend(name: str = None):
+        """
+        Select the XML parser backend, the dicts parsed are the same with
+        every backend, to_xml does not depend on it. lxml is faster on
+        documents with large text values, etree on many small elements
+        @param name: 'lxml' or 'etree', etree if it is None
+        """
+        global _backend
+        name = name or XML_BACKEND_ETREE
+        if name not in _parsers:
+            raise ValueError(f'The XML backend "{name}" is not available')
+        _backend = name
+
+    @staticmethod
+    def __parse(body, path, block_size: int):
+        builder = _XMLDictBuilder(path)
+        parser = _parsers[_backend](builder)
+        for chunk in XML.__iter_chunks(body, block_size):
+            parser.feed(chunk)
+            if builder.items:
+                yield from builder.items
+                builder.items.clear()
+        parser.close()
+        yield from builder.items
+        if path is None:
+            yield builder.result
+
+    @staticmethod
+    def parse_xml(body, response=None, block_size: int = XML_BLOCK_SIZE):
         """
         Parse body into the response, and put the resposne into a object
-        @param body: source content
+        @param body: source content, a string, bytes, readable stream,
+        iterable of chunks or DaraResponse, it is parsed block by block
         @param response: target model
+        @param block_size: the size of the blocks read from a stream
         @return the final object
         """
-        return XML._parse_xml(ElementTree.fromstring(body))
+        return next(XML.__parse(body, None, block_size))
 
     @staticmethod
-    def to_xml(body):
+    def parse_xml_items(body, path, block_size: int = XML_BLOCK_SIZE):
         """
-        Parse body as a xml string
-        @param body: source body
-        @return the xml string
+        Parse the repeated elements of a list response one by one, each is
+        built as soon as it ends and the rest of the document is skipped,
+        so that a large body is never held in memory as a whole
+        @param body: source content, a string, bytes, readable stream,
+        iterable of chunks or DaraResponse
+        @param path: the tags from the root to the repeated element, as a
+        list or a string separated by '/', e.g. 'ListBucketResult/Contents'
+        @param block_size: the size of the blocks read from a stream
+        @return: the generator of the elements, each parsed as parse_xml
+        would parse it, without the tag
         """
-        if body is None:
-            return
+        if isinstance(path, str):
+            path = path.split('/')
+        return XML.__parse(body, list(path), block_size)
 
+    @staticmethod
+    def __write_xml(body, writer: _XMLWriter) -> bool:
         dic = {}
-        if isinstance(body, DaraModel):
+        if isinstance(body, (DaraModel, DaraSlotsModel)):
             dic = body.to_map()
         elif isinstance(body, dict):
             dic = body
 
         if dic.__len__() == 0:
+            return False
+        writer.declaration()
+        for k in dic:
+            writer.write(k, dic[k])
+        return True
+
+    @staticmethod
+    def to_xml(body):
+        """
+        Parse body as a xml string
+        @param body: source body
+        @return the xml string
+        """
+        if body is None:
+            return
+
+        writer = _XMLWriter()
+        if not XML.__write_xml(body, writer):
             return ""
-        else:
-            result_xml = '<?xml version="1.0" encoding="utf-8"?>'
-            for k in dic:
-                elem = ElementTree.Element(k)
-                XML.__get_xml_factory(elem, dic[k])
-                result_xml += bytes.decode(ElementTree.tostring(elem), encoding="utf-8")
-            return result_xml
\ No newline at end of file
+        return writer.getvalue()
+
+    @staticmethod
+    def write_xml(body, stream):
+        """
+        Write body as xml into a binary stream, piece by piece, the bytes
+        are those of the to_xml string
+        @param body: source body
+        @param stream: the writable binary stream
+        """
+        if body is None:
+            return
+        writer = _XMLWriter(stream)
+        if XML.__write_xml(body, writer):
+            writer.flush()
@@ -1,11 +1,17 @@
+import aiohttp
 import asyncio
 import threading
 import time
 import unittest
 import ssl
 import io
+import os
+import shutil
+import tempfile
+import certifi
+import requests
 from http.server import BaseHTTPRequestHandler, HTTPServer
-from requests import PreparedRequest
+from requests import PreparedRequest, adapters
 from unittest.mock import Mock, patch, MagicMock
 
 # For Python < 3.8, we need to import AsyncMock from unittest.mock
@@ -18,8 +24,11 @@ except ImportError:
             return super(AsyncMock, self).__call__(*args, **kwargs)
 
 from darabonba.utils.stream import BaseStream, SyncSSEResponseWrapper, SSEResponseWrapper
-from darabonba.core import DaraCore, _TLSAdapter, TLSVersion, _ModelEncoder
-from darabonba.exceptions import RetryError, DaraException
+from darabonba.core import DaraCore, _TLSAdapter, TLSVersion, _ModelEncoder, DEFAULT_POOL_SIZE
+from darabonba.pool import AsyncSessionPool, SessionPool
+from darabonba.utils import json_codec
+from darabonba.utils.form import Form, FileField
+from darabonba.exceptions import RetryError, DaraException, ResponseException
 from darabonba.model import DaraModel
 from darabonba.request import DaraRequest
 from darabonba.response import DaraResponse
@@ -148,6 +157,10 @@ class TestCore(unittest.TestCase):
         server = threading.Thread(target=run_server)
         server.daemon = True
         server.start()
+
+    def setUp(self):
+        DaraCore._async_sessions = AsyncSessionPool()
+        DaraCore._ssl_contexts.clear()
     
     def test_default_with_dara_model(self):
         mock_model = Mock(spec=DaraModel)
@@ -191,6 +204,23 @@ class TestCore(unittest.TestCase):
             DaraCore.to_json_string(any_dict)
         )
 
+    def test_to_json_string_backends(self):
+        # the output does not depend on the backend selected for parsing
+        any_dict = {'bytes': b'100', 'model': TestModel(), 'utf8': '你好',
+                    'list': [1.5, None, float('nan'), 1e16, 2 ** 70]}
+        expected = DaraCore.to_json_string(any_dict)
+        self.assertEqual(
+            '{"bytes":"100","model":{"test_a":"a","test_b":"b"},"utf8":"你好",'
+            '"list":[1.5,null,NaN,1e+16,%d]}' % 2 ** 70,
+            expected
+        )
+        try:
+            for backend in json_codec._backends:
+                json_codec.set_backend(backend)
+                self.assertEqual(expected, DaraCore.to_json_string(any_dict))
+        finally:
+            json_codec.set_backend()
+
     def test_to_json_string_with_dict(self):
         result = DaraCore.to_json_string({"key": "value"})
         self.assertEqual(result, '{"key":"value"}')
@@ -647,10 +677,9 @@ class TestCore(unittest.TestCase):
         
         # Create a custom async context manager for ClientSession
         class MockClientSession:
+            closed = False
+
             def __init__(self, *args, **kwargs):
-                pass
-            
-            async def __aenter__(self):
                 # Create mock response
                 mock_response = Mock()
                 mock_response.read = AsyncMock(return_value=b'{"result": "test"}')
@@ -659,6 +688,8 @@ class TestCore(unittest.TestCase):
                 mock_response.reason = 'OK'
                 
                 self.mock_response = mock_response
+
+            async def __aenter__(self):
                 return self
                 
             async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -722,10 +753,9 @@ class TestCore(unittest.TestCase):
         
         # Create a custom async context manager for ClientSession
         class MockClientSession:
+            closed = False
+
             def __init__(self, *args, **kwargs):
-                pass
-            
-            async def __aenter__(self):
                 # Create mock response
                 mock_response = Mock()
                 mock_response.read = AsyncMock(return_value=b'{"result": "test"}')
@@ -734,6 +764,8 @@ class TestCore(unittest.TestCase):
                 mock_response.reason = 'OK'
                 
                 self.mock_response = mock_response
+
+            async def __aenter__(self):
                 return self
                 
             async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -785,10 +817,9 @@ class TestCore(unittest.TestCase):
         
         # Create a custom async context manager for ClientSession
         class MockClientSession:
+            closed = False
+
             def __init__(self, *args, **kwargs):
-                pass
-            
-            async def __aenter__(self):
                 # Create mock response
                 mock_response = Mock()
                 mock_response.read = AsyncMock(return_value=b'{"result": "test"}')
@@ -797,6 +828,8 @@ class TestCore(unittest.TestCase):
                 mock_response.reason = 'OK'
                 
                 self.mock_response = mock_response
+
+            async def __aenter__(self):
                 return self
                 
             async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -861,10 +894,9 @@ class TestCore(unittest.TestCase):
         
         # Create a custom async context manager for ClientSession
         class MockClientSession:
+            closed = False
+
             def __init__(self, *args, **kwargs):
-                pass
-            
-            async def __aenter__(self):
                 # Create mock response
                 mock_response = Mock()
                 mock_response.read = AsyncMock(return_value=b'{"result": "test"}')
@@ -873,6 +905,8 @@ class TestCore(unittest.TestCase):
                 mock_response.reason = 'OK'
                 
                 self.mock_response = mock_response
+
+            async def __aenter__(self):
                 return self
                 
             async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -1009,7 +1043,199 @@ class TestCore(unittest.TestCase):
         request.body = f
         loop.run_until_complete(task)
         self.assertEqual(b'{"result": "Dara test"}', task.result().body)
-    
+
+    def test_prepare_async_body(self):
+        class UnsizedStream(DaraStream):
+            def __bool__(self):
+                return True
+
+            def __len__(self):
+                raise NotImplementedError('__len__ method must be overridden')
+
+        async def collect(payload):
+            return [chunk async for chunk in payload]
+
+        loop = asyncio.get_event_loop()
+        request = DaraRequest()
+        request.headers['host'] = '127.0.0.1:8889'
+        request.body = DaraStream()
+        body, headers = DaraCore._prepare_async_body(request)
+        self.assertEqual('9', headers['content-length'])
+        self.assertNotIn('content-length', request.headers)
+        self.assertEqual([b'Dara test'], loop.run_until_complete(collect(body)))
+
+        request.body = UnsizedStream()
+        body, headers = DaraCore._prepare_async_body(request)
+        self.assertNotIn('content-length', headers)
+        self.assertEqual([b'Dara test'], loop.run_until_complete(collect(body)))
+
+        class RecordingStream(DaraStream):
+            def __init__(self):
+                super().__init__()
+                self.buf = io.BytesIO(b'x' * 10000)
+                self.threads = set()
+
+            def readinto(self, b):
+                self.threads.add(threading.get_ident())
+                return self.buf.readinto(b)
+
+            def __len__(self):
+                return 10000
+
+        stream = RecordingStream()
+        request.body = stream
+        body, headers = DaraCore._prepare_async_body(request, 4096)
+        chunks = loop.run_until_complete(collect(body))
+        self.assertEqual([4096, 4096, 1808], [len(chunk) for chunk in chunks])
+        self.assertTrue(all(isinstance(chunk, bytes) for chunk in chunks))
+        self.assertNotIn(threading.get_ident(), stream.threads)
+
+        request.body = '中文'
+        body, headers = DaraCore._prepare_async_body(request)
+        self.assertEqual('中文'.encode('utf-8'), body)
+
+        request.body = None
+        body, headers = DaraCore._prepare_async_body(request)
+        self.assertEqual(b'', body)
+
+    def test_async_file_form_upload(self):
+        form = {
+            'key': 'value',
+            'file': FileField(filename='test.txt', content_type='text/plain',
+                              content=io.BytesIO(b'x' * 100000))
+        }
+        request = DaraRequest()
+        request.method = 'POST'
+        request.protocol = 'http'
+        request.headers['host'] = "127.0.0.1:8889"
+        request.body = Form.to_file_form(form, 'boundary')
+        expected = b''.join(Form.to_file_form(form, 'boundary'))
+        form['file'].content.seek(0)
+
+        loop = asyncio.get_event_loop()
+        response = loop.run_until_complete(DaraCore.async_do_action(request))
+        self.assertEqual(b'{"result": "%s"}' % expected, response.body)
+
+    def test_prepare_body(self):
+        self.assertEqual(b'bytes', DaraCore._prepare_body(b'bytes'))
+        self.assertIsNone(DaraCore._prepare_body(None))
+
+        body = DaraCore._prepare_body(io.BytesIO(b'0123456789'), 4)
+        self.assertEqual(10, len(body))
+        self.assertEqual([b'0123', b'4567', b'89'], [bytes(chunk) for chunk in body])
+
+        stream = io.BytesIO(b'0123456789')
+        stream.read(2)
+        self.assertEqual(8, len(DaraCore._prepare_body(stream)))
+
+        body = DaraCore._prepare_body(DaraStream(), 4)
+        self.assertEqual(9, len(body))
+
+        class UnsizedStream(DaraStream):
+            def __len__(self):
+                raise NotImplementedError('__len__ method must be overridden')
+
+        body = DaraCore._prepare_body(UnsizedStream())
+        self.assertFalse(hasattr(body, '__len__'))
+        self.assertEqual([b'Dara test'], list(body))
+
+        p = PreparedRequest()
+        p.prepare(method='POST', url='http://127.0.0.1:8889', data=body)
+        self.assertEqual('chunked', p.headers['Transfer-Encoding'])
+
+    def test_do_action_stream_upload(self):
+        request = DaraRequest()
+        request.method = 'POST'
+        request.protocol = 'http'
+        request.headers['host'] = "127.0.0.1:8889"
+
+        request.body = DaraStream()
+        resp = DaraCore.do_action(request)
+        self.assertEqual(b'{"result": "Dara test"}', resp.body)
+        # the session is released once the response is read
+        self.assertTrue(all(entry.in_use == 0 for entry in DaraCore._sessions._lru._entries.values()))
+
+        request.body = io.BytesIO(b'x' * 100000)
+        resp = DaraCore.do_action(request, {'uploadChunkSize': 4096})
+        self.assertEqual(b'{"result": "%s"}' % (b'x' * 100000), resp.body)
+
+        with tempfile.TemporaryFile() as f:
+            f.write(b'y' * 100000)
+            f.seek(0)
+            request.body = f
+            resp = DaraCore.do_action(request)
+        self.assertEqual(b'{"result": "%s"}' % (b'y' * 100000), resp.body)
+
+        form = {
+            'key': 'value',
+            'file': FileField(filename='test.txt', content_type='text/plain',
+                              content=io.BytesIO(b'z' * 100000))
+        }
+        request.body = Form.to_file_form(form, 'boundary')
+        expected = b''.join(Form.to_file_form(form, 'boundary'))
+        form['file'].content.seek(0)
+        resp = DaraCore.do_action(request)
+        self.assertEqual(b'{"result": "%s"}' % expected, resp.body)
+
+    def test_async_do_action_reuse_session(self):
+        request = DaraRequest()
+        request.method = 'POST'
+        request.protocol = 'http'
+        request.headers['host'] = "127.0.0.1:8889"
+        request.body = 'reuse'
+
+        async def run():
+            first = await DaraCore.async_do_action(request)
+            second = await DaraCore.async_do_action(request)
+            lru = DaraCore._async_sessions._find_lru(asyncio.get_running_loop())
+            self.assertEqual(1, len(lru))
+            await DaraCore.close_async_sessions()
+            return first, second
+
+        loop = asyncio.get_event_loop()
+        first, second = loop.run_until_complete(run())
+        self.assertEqual(b'{"result": "reuse"}', first.body)
+        self.assertEqual(b'{"result": "reuse"}', second.body)
+
+    def test_async_sessions_closed_with_loop(self):
+        request = DaraRequest()
+        request.method = 'POST'
+        request.protocol = 'http'
+        request.headers['host'] = "127.0.0.1:8889"
+        request.body = 'loop'
+        sessions = []
+
+        async def run():
+            response = await DaraCore.async_do_action(request)
+            lru = DaraCore._async_sessions._find_lru(asyncio.get_running_loop())
+            sessions.extend(entry.session for entry in lru._entries.values())
+            return response
+
+        for _ in range(2):
+            loop = asyncio.new_event_loop()
+            try:
+                self.assertEqual(b'{"result": "loop"}', loop.run_until_complete(run()).body)
+            finally:
+                loop.close()
+        self.assertEqual(2, len(sessions))
+        self.assertTrue(all(session.closed for session in sessions))
+        self.assertEqual([], [loop for loop in DaraCore._async_sessions._loops
+                              if DaraCore._async_sessions._find_lru(loop)])
+
+    def test_set_session_pool(self):
+        sessions, async_sessions = DaraCore._sessions, DaraCore._async_sessions
+        DaraCore._sessions = SessionPool()
+        try:
+            DaraCore.set_session_pool(max_size=8)
+            self.assertEqual(8, DaraCore._sessions.max_size)
+            self.assertEqual(8, DaraCore._async_sessions.max_size)
+            self.assertEqual(300, DaraCore._sessions.idle_timeout)
+            DaraCore.set_session_pool(idle_timeout=30)
+            self.assertEqual(8, DaraCore._sessions.max_size)
+            self.assertEqual(30, DaraCore._async_sessions.idle_timeout)
+        finally:
+            DaraCore._sessions, DaraCore._async_sessions = sessions, async_sessions
+
     def test_get_adapter(self):
         # Test TLSv1
         with patch('darabonba.core.ssl.create_default_context') as mock_create_default_context:
@@ -1059,6 +1285,236 @@ class TestCore(unittest.TestCase):
             adapter = DaraCore.get_adapter('http', 'TLSv1.2')
             self.assertNotIsInstance(mock_context.minimum_version, ssl.TLSVersion)
 
+    def test_get_adapter_pool_size(self):
+        adapter = DaraCore.get_adapter('http')
+        self.assertEqual(DEFAULT_POOL_SIZE * 4, adapter._pool_maxsize)
+        self.assertFalse(adapter._pool_block)
+
+        adapter = DaraCore.get_adapter('https', max_idle_conns=200)
+        self.assertEqual(200, adapter._pool_maxsize)
+        self.assertEqual(200, adapter.poolmanager.connection_pool_kw['maxsize'])
+
+        session = DaraCore._get_session(('https', 'pool.test', 443, 300), 'https', verify=False,
+                                        max_idle_conns=300)
+        self.assertEqual(300, session.get_adapter('https://pool.test')._pool_maxsize)
+        self.assertIsNone(session.get_adapter('https://pool.test').ssl_context)
+
+    def test_adapters(self):
+        self.assertIsInstance(DaraCore.http_adapter, adapters.HTTPAdapter)
+        self.assertIsInstance(DaraCore.https_adapter, adapters.HTTPAdapter)
+
+    def test_get_connector(self):
+        async def run():
+            connector = DaraCore._get_connector()
+            self.assertEqual(100, connector.limit)
+            self.assertFalse(connector.force_close)
+            await connector.close()
+
+            connector = DaraCore._get_connector(keep_alive=False)
+            self.assertEqual(100, connector.limit)
+            self.assertTrue(connector.force_close)
+            await connector.close()
+
+        asyncio.get_event_loop().run_until_complete(run())
+
+    def test_do_action_keep_alive(self):
+        mock_session = Mock()
+        mock_session.send.return_value = Mock(status_code=200, reason='OK', headers={}, content=b'')
+        request = DaraRequest()
+        request.headers['host'] = "127.0.0.1:8889"
+
+        with patch('darabonba.core.DaraCore._get_session', return_value=mock_session) as mock_get_session:
+            DaraCore.do_action(request, {'keepAlive': False, 'maxIdleConns': 100})
+            prepared = mock_session.send.call_args[0][0]
+            self.assertEqual('close', prepared.headers['Connection'])
+            self.assertEqual(100, mock_get_session.call_args[1]['max_idle_conns'])
+
+            DaraCore.do_action(request, {'keepAlive': True})
+            prepared = mock_session.send.call_args[0][0]
+            self.assertNotIn('Connection', prepared.headers)
+
+    def test_do_actions_batch(self):
+        requests = []
+        for i in range(20):
+            request = DaraRequest()
+            request.headers['host'] = "127.0.0.1:8889"
+            request.pathname = '/%d' % i
+            requests.append(request)
+
+        in_flight = []
+        peak = []
+        lock = threading.Lock()
+
+        def do_action(request, runtime_option):
+            with lock:
+                in_flight.append(request)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.remove(request)
+            if request.pathname == '/3':
+                raise RetryError('failed')
+            return request.pathname
+
+        with patch('darabonba.core.DaraCore.do_action', side_effect=do_action) as mock_do_action:
+            results = DaraCore.do_actions_batch(requests, {'readTimeout': 100}, concurrency=4)
+            self.assertEqual(20, mock_do_action.call_count)
+            self.assertEqual({'readTimeout': 100}, mock_do_action.call_args[0][1])
+        self.assertLessEqual(max(peak), 4)
+        self.assertIsInstance(results[3], RetryError)
+        self.assertEqual(['/%d' % i for i in range(20) if i != 3], [r for r in results if r is not results[3]])
+        self.assertEqual([], DaraCore.do_actions_batch([]))
+        with self.assertRaises(ValueError):
+            DaraCore.do_actions_batch(requests, concurrency=0)
+
+    def test_async_do_actions_batch(self):
+        requests = []
+        for i in range(20):
+            request = DaraRequest()
+            request.pathname = '/%d' % i
+            requests.append(request)
+
+        in_flight = []
+        peak = []
+
+        async def async_do_action(request, runtime_option):
+            in_flight.append(request)
+            peak.append(len(in_flight))
+            await asyncio.sleep(0.01 * (20 - int(request.pathname[1:])) / 20)
+            in_flight.remove(request)
+            if request.pathname == '/3':
+                raise RetryError('failed')
+            return request.pathname
+
+        loop = asyncio.get_event_loop()
+        with patch('darabonba.core.DaraCore.async_do_action', side_effect=async_do_action):
+            results = loop.run_until_complete(DaraCore.async_do_actions_batch(requests, concurrency=5))
+        self.assertEqual(5, max(peak))
+        self.assertIsInstance(results[3], RetryError)
+        self.assertEqual(['/%d' % i for i in range(20) if i != 3], [r for r in results if r is not results[3]])
+        with self.assertRaises(ValueError):
+            loop.run_until_complete(DaraCore.async_do_actions_batch(requests, concurrency=0))
+
+    def test_get_session_key(self):
+        request = DaraRequest()
+        request.protocol = 'https'
+        request.headers['host'] = 'ecs.aliyuncs.com/'
+        key = DaraCore._get_session_key(request, True, None, None, ())
+        self.assertEqual(('https', 'ecs.aliyuncs.com', 80, True, None, None, ()), key)
+        self.assertEqual(key, DaraCore._get_session_key(request, True, None, None, ()))
+        self.assertNotEqual(key, DaraCore._get_session_key(request, True, None, 'TLSv1.2', ()))
+        self.assertNotEqual(key, DaraCore._get_session_key(request, '/path/ca.pem', None, None, ()))
+        self.assertNotEqual(key, DaraCore._get_session_key(request, False, None, None, ()))
+        self.assertNotEqual(key, DaraCore._get_session_key(request, True, ['a.crt', 'a.key'], None, ()))
+        self.assertNotEqual(key, DaraCore._get_session_key(request, True, None, None,
+                                                           (('https', 'http://127.0.0.1'),)))
+        self.assertEqual(DaraCore._get_session_key(request, True, ('a.crt', 'a.key'), None, ()),
+                         DaraCore._get_session_key(request, True, ['a.crt', 'a.key'], None, ()))
+
+        request.protocol = 'http'
+        self.assertEqual(DaraCore._get_session_key(request, True, None, None, ()),
+                         DaraCore._get_session_key(request, '/path/ca.pem', 'a.crt', 'TLSv1.2', ()))
+
+    def test_do_action_session_per_tls_settings(self):
+        mock_response = Mock(status_code=200, reason='OK', headers={}, content=b'')
+        request = DaraRequest()
+        request.protocol = 'https'
+        request.headers['host'] = 'tls.test'
+        DaraCore._sessions.close_all()
+
+        with patch('requests.Session.send', return_value=mock_response):
+            DaraCore.do_action(request, {'tlsMinVersion': 'TLSv1.2'})
+            DaraCore.do_action(request, {'tlsMinVersion': 'TLSv1.2'})
+            self.assertEqual(1, len(DaraCore._sessions))
+            DaraCore.do_action(request, {'tlsMinVersion': 'TLSv1.3'})
+            DaraCore.do_action(request, {'ignoreSSL': True})
+            self.assertEqual(3, len(DaraCore._sessions))
+
+        contexts = set()
+        for key in list(DaraCore._sessions._lru._entries):
+            adapter = DaraCore._sessions[key].get_adapter('https://tls.test')
+            contexts.add(id(adapter.ssl_context))
+            if key[3] is False:
+                self.assertIsNone(adapter.ssl_context)
+            else:
+                self.assertEqual(ssl.TLSVersion[key[5].replace('.', '_')], adapter.ssl_context.minimum_version)
+        self.assertEqual(3, len(contexts))
+        DaraCore._sessions.close_all()
+
+    def test_tls_adapter_cert_verify(self):
+        conn = Mock(ca_certs=None, cert_file=None)
+        adapter = DaraCore.get_adapter('https', cert=None)
+        adapter.cert_verify(conn, 'https://ecs.aliyuncs.com', True, ('a.crt', 'a.key'))
+        self.assertEqual('CERT_REQUIRED', conn.cert_reqs)
+        self.assertIsNone(conn.ca_certs)
+        self.assertIsNone(conn.cert_file)
+
+        conn = Mock(ca_certs=None)
+        adapter = DaraCore.get_adapter('https', verify=False)
+        adapter.cert_verify(conn, 'https://ecs.aliyuncs.com', False, None)
+        self.assertEqual('CERT_NONE', conn.cert_reqs)
+
+        if hasattr(adapters.HTTPAdapter, 'build_connection_pool_key_attributes'):
+            adapter = DaraCore.get_adapter('https')
+            p = PreparedRequest()
+            p.prepare(method='GET', url='https://ecs.aliyuncs.com')
+            _, pool_kwargs = adapter.build_connection_pool_key_attributes(p, certifi.where(), 'a.crt')
+            self.assertNotIn('ca_certs', pool_kwargs)
+            self.assertNotIn('cert_file', pool_kwargs)
+
+    def test_get_ssl_context(self):
+        context = DaraCore.get_ssl_context()
+        self.assertIsInstance(context, ssl.SSLContext)
+        self.assertIs(context, DaraCore.get_ssl_context())
+        self.assertIs(context, DaraCore.get_ssl_context(certifi.where()))
+
+        tls_context = DaraCore.get_ssl_context(tls_min_version='TLSv1.2')
+        self.assertIsNot(context, tls_context)
+        self.assertEqual(ssl.TLSVersion.TLSv1_2, tls_context.minimum_version)
+
+        with patch('darabonba.core.ssl.create_default_context') as mock_create_default_context:
+            DaraCore.get_ssl_context(tls_min_version='TLSv1.2')
+            mock_create_default_context.assert_not_called()
+
+    def test_get_ssl_context_ca_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ca = os.path.join(tmp, 'ca.pem')
+            shutil.copyfile(certifi.where(), ca)
+            context = DaraCore.get_ssl_context(ca)
+            self.assertIs(context, DaraCore.get_ssl_context(ca))
+
+            mtime = os.stat(ca).st_mtime
+            os.utime(ca, (mtime + 10, mtime + 10))
+            self.assertIsNot(context, DaraCore.get_ssl_context(ca))
+
+    def test_get_session_ca_modified(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            ca = os.path.join(tmp, 'ca.pem')
+            shutil.copyfile(certifi.where(), ca)
+            key = ('https', 'ca.test', 443, ca)
+            session = DaraCore._get_session(key, 'https', verify=ca)
+            try:
+                adapter = session.get_adapter('https://ca.test')
+                p = PreparedRequest()
+                p.prepare(method='GET', url='https://ca.test')
+                pool = adapter.get_connection_with_tls_context(p, ca)
+                context = adapter.ssl_context
+                self.assertIs(context, pool.conn_kw['ssl_context'])
+                self.assertIs(pool, adapter.get_connection_with_tls_context(p, ca))
+
+                # the busy session is kept, its adapter loads the new CA file
+                with open(ca, 'ab') as f:
+                    f.write(b'\n')
+                mtime = os.stat(ca).st_mtime
+                os.utime(ca, (mtime + 10, mtime + 10))
+                new_pool = adapter.get_connection_with_tls_context(p, ca)
+                self.assertIsNot(context, adapter.ssl_context)
+                self.assertIs(DaraCore.get_ssl_context(ca), adapter.ssl_context)
+                self.assertIs(adapter.ssl_context, new_pool.conn_kw['ssl_context'])
+                self.assertIsNot(pool, new_pool)
+            finally:
+                DaraCore._sessions.release(key, session)
+
     def test_get_session(self):
         request = DaraRequest()
         request.headers['host'] = "127.0.0.1:9999"
@@ -1071,7 +1527,7 @@ class TestCore(unittest.TestCase):
             mock_get_adapter.return_value = mock_adapter
 
             session = DaraCore._get_session(session_key, request.protocol, 'TLSv1.2')
-            mock_get_adapter.assert_called_once_with(request.protocol, 'TLSv1.2')
+            mock_get_adapter.assert_called_once_with(request.protocol, 'TLSv1.2', None, True, None)
             self.assertIn(session_key, DaraCore._sessions)
             self.assertEqual(session, DaraCore._sessions[session_key])
 
@@ -1094,7 +1550,7 @@ class TestCore(unittest.TestCase):
             mock_get_adapter.return_value = mock_adapter
 
             session = DaraCore._get_session(session_key, request.protocol, 'TLSv1.2')
-            mock_get_adapter.assert_called_once_with(request.protocol, 'TLSv1.2')
+            mock_get_adapter.assert_called_once_with(request.protocol, 'TLSv1.2', None, True, None)
             self.assertIn(session_key, DaraCore._sessions)
             self.assertEqual(session, DaraCore._sessions[session_key])
 
@@ -1543,6 +1999,7 @@ class TestRetry(unittest.TestCase):
         
 class TestSSEActions(unittest.TestCase):
     def setUp(self):
+        DaraCore._ssl_contexts.clear()
         # 创建测试用的 DaraRequest
         self.request = DaraRequest()
         self.request.protocol = 'https'
@@ -1837,6 +2294,29 @@ class TestSSEActions(unittest.TestCase):
         # 运行异步测试
         asyncio.run(run_test())
 
+    def test_do_sse_action_pooled_session_kept(self):
+        self.request.protocol = 'http'
+        self.request.headers = {'host': 'sse.pool.test'}
+
+        def send(request, **kwargs):
+            response = Mock(status_code=200, reason='OK', headers={'content-type': 'text/event-stream'})
+            response.iter_content.return_value = iter([b'data: 1\n\n'])
+            return response
+
+        sessions = []
+        with patch('darabonba.core.Session.send', autospec=True,
+                   side_effect=lambda session, request, **kwargs: sessions.append(session) or send(request)), \
+                patch.object(adapters.HTTPAdapter, 'close') as mock_close:
+            for _ in range(2):
+                result = DaraCore.do_sse_action(self.request, self.runtime_option)
+                self.assertEqual([b'data: 1\n\n'], list(result.body))
+        self.assertIs(sessions[0], sessions[1])
+        mock_close.assert_not_called()
+        adapter = sessions[0].get_adapter('http://sse.pool.test')
+        self.assertIsNotNone(adapter.poolmanager.connection_from_url('http://sse.pool.test'))
+        entries = [e for e in DaraCore._sessions._lru._entries.values() if e.session is sessions[0]]
+        self.assertEqual([0], [entry.in_use for entry in entries])
+
     def test_sse_wrapper_read(self):
         # 测试 SyncSSEResponseWrapper 的 read 方法
         mock_session = Mock()
@@ -1853,3 +2333,122 @@ class TestSSEActions(unittest.TestCase):
         mock_response.close.assert_called_once()
         mock_session.close.assert_called_once()
 
+
+    def test_do_resumable_sse_action(self):
+        def dropped():
+            yield b'id: 1\nretry: 500\ndata: first\n\n'
+            yield b'id: 2\ndata: second\n\n'
+            raise requests.exceptions.ChunkedEncodingError('connection broken')
+
+        def resumed():
+            yield b'id: 2\ndata: second\n\n'
+            yield b'id: 3\ndata: third\n\n'
+
+        responses = [Mock(status_code=200, body=dropped()), Mock(status_code=200, body=resumed())]
+        headers = []
+
+        def do_sse_action(request, runtime_option):
+            headers.append(dict(request.headers))
+            return responses.pop(0)
+
+        with patch('darabonba.core.DaraCore.do_sse_action', side_effect=do_sse_action), \
+                patch('darabonba.core.DaraCore.sleep') as mock_sleep:
+            events = list(DaraCore.do_resumable_sse_action(self.request, self.runtime_option))
+        self.assertEqual(['first', 'second', 'third'], [e.data for e in events])
+        self.assertNotIn('last-event-id', headers[0])
+        self.assertEqual('2', headers[1]['last-event-id'])
+        mock_sleep.assert_called_once_with(500)
+
+    def test_do_resumable_sse_action_max_reconnects(self):
+        self.request.headers = {'host': 'example.com'}
+        with patch('darabonba.core.DaraCore.do_sse_action', side_effect=RetryError('refused')) as mock_action, \
+                patch('darabonba.core.DaraCore.sleep') as mock_sleep:
+            with self.assertRaises(RetryError):
+                list(DaraCore.do_resumable_sse_action(self.request, max_reconnects=2, last_event_id='9'))
+        self.assertEqual(3, mock_action.call_count)
+        self.assertEqual(2, mock_sleep.call_count)
+        self.assertEqual(3000, mock_sleep.call_args[0][0])
+        self.assertEqual('9', mock_action.call_args[0][0].headers['last-event-id'])
+        # the request of the caller is left unchanged
+        self.assertEqual({'host': 'example.com'}, self.request.headers)
+
+        error = Mock(status_code=400, status_message='Bad Request', body=b'{"Code": "InvalidParameter"}')
+        with patch('darabonba.core.DaraCore.do_sse_action', return_value=error) as mock_action:
+            with self.assertRaises(ResponseException) as context:
+                list(DaraCore.do_resumable_sse_action(self.request))
+        mock_action.assert_called_once()
+        self.assertEqual(400, context.exception.status_code)
+        self.assertEqual('{"Code": "InvalidParameter"}', context.exception.message)
+
+    def test_do_resumable_sse_action_state(self):
+        def replayed():
+            yield b'id: 1\ndata: first\n\n'
+            raise requests.exceptions.ChunkedEncodingError('connection broken')
+
+        def control():
+            # the id and retry fields of a block without data still count
+            yield b'id: 5\nretry: 20\n\n'
+            raise requests.exceptions.ChunkedEncodingError('connection broken')
+
+        def done():
+            yield b'id: 6\ndata: sixth\n\n'
+
+        # a server replaying the same event does not reset the reconnections
+        responses = [Mock(status_code=200, body=replayed()) for _ in range(4)]
+        with patch('darabonba.core.DaraCore.do_sse_action', side_effect=lambda r, o: responses.pop(0)), \
+                patch('darabonba.core.DaraCore.sleep'):
+            events = []
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                for event in DaraCore.do_resumable_sse_action(self.request, max_reconnects=2):
+                    events.append(event)
+        self.assertEqual(['first'], [e.data for e in events])
+        self.assertEqual(1, len(responses))
+
+        responses = [Mock(status_code=200, body=control()), Mock(status_code=200, body=done())]
+        headers = []
+
+        def do_sse_action(request, runtime_option):
+            headers.append(dict(request.headers))
+            return responses.pop(0)
+
+        with patch('darabonba.core.DaraCore.do_sse_action', side_effect=do_sse_action), \
+                patch('darabonba.core.DaraCore.sleep') as mock_sleep:
+            events = list(DaraCore.do_resumable_sse_action(self.request))
+        self.assertEqual(['sixth'], [e.data for e in events])
+        self.assertEqual('5', headers[1]['last-event-id'])
+        mock_sleep.assert_called_once_with(20)
+
+    def test_async_do_resumable_sse_action(self):
+        class Body:
+            def __init__(self, chunks, error=None):
+                self.chunks = chunks
+                self.error = error
+
+            def __aiter__(self):
+                return self.iterate()
+
+            async def iterate(self):
+                for chunk in self.chunks:
+                    yield chunk
+                if self.error:
+                    raise self.error
+
+        responses = [
+            Mock(status_code=200, body=Body([b'id: a\nretry: 10\ndata: first\n\n'], aiohttp.ClientPayloadError('broken'))),
+            Mock(status_code=200, body=Body([b'id: a\ndata: first\n\n', b'data: no id\n\n', b'id: b\ndata: second\n\n'])),
+        ]
+        headers = []
+
+        async def async_do_sse_action(request, runtime_option):
+            headers.append(dict(request.headers))
+            return responses.pop(0)
+
+        async def run():
+            return [e async for e in DaraCore.async_do_resumable_sse_action(self.request)]
+
+        with patch('darabonba.core.DaraCore.async_do_sse_action', side_effect=async_do_sse_action), \
+                patch('darabonba.core.DaraCore.sleep_async') as mock_sleep:
+            events = asyncio.run(run())
+        self.assertEqual(['first', 'no id', 'second'], [e.data for e in events])
+        self.assertEqual('a', headers[1]['last-event-id'])
+        mock_sleep.assert_called_once_with(10)
@@ -1,5 +1,6 @@
 import unittest
-from darabonba.model import DaraModel
+from darabonba.model import DaraModel, DaraField, DaraSlotsModel, skip_validation
+from darabonba.exceptions import RequiredArgumentException, ValidateException
 
 class TestDaraModel(unittest.TestCase):
     class TestRegModel(DaraModel):
@@ -108,4 +109,357 @@ class TestDaraModel(unittest.TestCase):
             'testNoAttr': "noAttr",
             'subModel': None,
             'testListStr': ["str", "test"]
-        })
\ No newline at end of file
+        })
+
+    class TestFieldSubModel(DaraModel):
+        _fields = (
+            DaraField('name', 'Name', str),
+            DaraField('children', 'Children', 'TestFieldSubModel', container=list),
+        )
+
+        def __init__(self, name=None, children=None):
+            self.name = name
+            self.children = children
+
+    class TestFieldModel(DaraModel):
+        _fields = (
+            DaraField('request_id', 'RequestId', str),
+            DaraField('count', 'Count', int),
+            DaraField('sub_model', 'SubModel', 'TestFieldSubModel'),
+            DaraField('items', 'Items', 'TestFieldSubModel', container=list),
+            DaraField('tags', 'Tags', 'TestFieldSubModel', container=dict),
+        )
+
+        def __init__(self, request_id=None, count=None, sub_model=None, items=None, tags=None):
+            self.request_id = request_id
+            self.count = count
+            self.sub_model = sub_model
+            self.items = items
+            self.tags = tags
+
+    def test_fields(self):
+        with self.assertRaises(ValueError):
+            DaraField('not a name')
+        with self.assertRaises(ValueError):
+            DaraField('items', container=set)
+        self.assertEqual('ExtraName', DaraField('extra_name', 'ExtraName').wire_name)
+        self.assertEqual('extra_name', DaraField('extra_name').wire_name)
+        self.assertEqual(['request_id', 'count', 'sub_model', 'items', 'tags'],
+                         [f.name for f in self.TestFieldModel.get_fields()])
+        self.assertEqual((), DaraModel.get_fields())
+
+    def test_field_serializers(self):
+        sub = self.TestFieldSubModel
+        model = self.TestFieldModel(
+            request_id='id',
+            count=0,
+            sub_model=sub('a', [sub('b')]),
+            items=[sub('c'), None],
+            tags={'d': sub('d')},
+        )
+        expected = {
+            'RequestId': 'id',
+            'Count': 0,
+            'SubModel': {'Name': 'a', 'Children': [{'Name': 'b'}]},
+            'Items': [{'Name': 'c'}, None],
+            'Tags': {'d': {'Name': 'd'}},
+        }
+        self.assertEqual(expected, model.to_map())
+        self.assertEqual({}, self.TestFieldModel().to_map())
+
+        expected['Items'] = [{'Name': 'c'}]
+        result = self.TestFieldModel().from_map(expected)
+        self.assertIsInstance(result, self.TestFieldModel)
+        self.assertEqual('id', result.request_id)
+        self.assertEqual(0, result.count)
+        self.assertIsInstance(result.sub_model, sub)
+        self.assertEqual('b', result.sub_model.children[0].name)
+        self.assertIsInstance(result.tags['d'], sub)
+        self.assertEqual(expected, result.to_map())
+        self.assertIsNone(self.TestFieldModel().from_map(None).request_id)
+
+        model._map = {'raw': True}
+        self.assertEqual({'raw': True}, model.to_map())
+
+    def test_field_inheritance(self):
+        class Base(DaraModel):
+            _fields = (DaraField('a', 'A'),)
+
+            def __init__(self):
+                self.a = 1
+
+        class Child(Base):
+            _fields = (DaraField('b', 'B'),)
+
+            def __init__(self):
+                super().__init__()
+                self.b = 2
+
+        class Explicit(Base):
+            _fields = (DaraField('c', 'C'),)
+
+            def to_map(self):
+                _map = super().to_map()
+                _map['explicit'] = True
+                return _map
+
+        self.assertEqual({'A': 1}, Base().to_map())
+        self.assertEqual({'A': 1, 'B': 2}, Child().to_map())
+        self.assertEqual(1, Child().from_map({'A': 1}).a)
+        explicit = Explicit()
+        explicit.c = 3
+        self.assertEqual({'A': 1, 'C': 3, 'explicit': True}, explicit.to_map())
+        self.assertEqual({'A': 1, 'C': 3, 'explicit': True}, explicit.to_map())
+
+        class Missing(DaraModel):
+            _fields = (DaraField('a', 'A', 'NotDefinedModel'),)
+
+        with self.assertRaises(NameError):
+            Missing().to_map()
+
+    def test_lazy_from_map(self):
+        sub = self.TestFieldSubModel
+        raw = {
+            'RequestId': 'id',
+            'SubModel': {'Name': 'a', 'Children': [{'Name': 'b'}]},
+            'Items': [{'Name': 'c'}, {'Name': 'd'}],
+            'Tags': {'e': {'Name': 'e'}},
+            'Extra': 'kept',
+        }
+        self.assertTrue(self.TestFieldModel.supports_lazy())
+        self.assertFalse(self.TestRegModel.supports_lazy())
+        model = self.TestFieldModel().from_map(raw, lazy=True)
+        self.assertEqual('id', model.request_id)
+        self.assertNotIn('sub_model', model.__dict__)
+        result = model.to_map()
+        self.assertEqual(raw, result)
+        self.assertIsNot(raw, result)
+
+        # the nested models are built on their first access, lazily too
+        self.assertIsInstance(model.sub_model, sub)
+        self.assertIn('sub_model', model.__dict__)
+        self.assertNotIn('children', model.sub_model.__dict__)
+        self.assertEqual('b', model.sub_model.children[0].name)
+        self.assertEqual(['c', 'd'], [item.name for item in model.items])
+        self.assertEqual('e', model.tags['e'].name)
+        result = model.to_map()
+        self.assertEqual(raw, result)
+        self.assertIsNot(raw, result)
+        # the unchanged nested models keep their raw maps
+        self.assertIs(raw['SubModel'], result['SubModel'])
+        self.assertIs(raw['Items'], result['Items'])
+        self.assertIsNone(model.count)
+        with self.assertRaises(AttributeError):
+            model.not_a_field
+
+        # a change gives a new map, the raw map is left untouched
+        model.items[1].name = 'changed'
+        model.count = 1
+        model.tags = None
+        result = model.to_map()
+        self.assertEqual({
+            'RequestId': 'id',
+            'Count': 1,
+            'SubModel': {'Name': 'a', 'Children': [{'Name': 'b'}]},
+            'Items': [{'Name': 'c'}, {'Name': 'changed'}],
+            'Extra': 'kept',
+        }, result)
+        self.assertIs(raw['SubModel'], result['SubModel'])
+        self.assertIs(raw['Items'][0], result['Items'][0])
+        self.assertEqual('d', raw['Items'][1]['Name'])
+        self.assertIn('Tags', raw)
+
+        model = self.TestFieldModel().from_map(raw, lazy=True)
+        model.items.append(sub('f'))
+        self.assertEqual(3, len(model.to_map()['Items']))
+
+        # changing the result of to_map does not change the model
+        model = self.TestFieldModel().from_map(raw, lazy=True)
+        result = model.to_map()
+        result['RequestId'] = 'changed'
+        result['Added'] = 1
+        self.assertEqual('id', model.request_id)
+        self.assertEqual('id', model.to_map()['RequestId'])
+        self.assertNotIn('Added', raw)
+
+        class Extended(self.TestFieldModel):
+            def to_map(self):
+                result = super().to_map()
+                result['RequestId'] = 'override'
+                return result
+
+        model = Extended().from_map({'RequestId': 'id', 'SubModel': {'Name': 'a'}}, lazy=True)
+        self.assertEqual('override', model.to_map()['RequestId'])
+        self.assertEqual('id', model.request_id)
+        self.assertEqual('a', model.sub_model.name)
+
+    def test_lazy_core_from_map(self):
+        from darabonba.core import DaraCore
+        from darabonba.runtime import RuntimeOptions
+
+        raw = {'Items': [{'Name': 'a'}]}
+        model = DaraCore.from_map(self.TestFieldModel(), raw, lazy=True)
+        self.assertNotIn('items', model.__dict__)
+        self.assertEqual('a', model.items[0].name)
+        model = DaraCore.from_map(self.TestFieldModel(), raw)
+        self.assertIn('items', model.__dict__)
+
+        # the models without declared fields are always built at once
+        class HandWritten(DaraModel):
+            def from_map(self, m=None):
+                self.items = m.get('Items')
+                return self
+
+        model = DaraCore.from_map(HandWritten(), raw, lazy=True)
+        self.assertEqual([{'Name': 'a'}], model.items)
+
+        raw = {'readTimeout': 1, 'extendsParameters': {'headers': {'a': 'b'}}}
+        option = DaraCore.from_map(RuntimeOptions(), raw, lazy=True)
+        self.assertEqual(1, option.read_timeout)
+        self.assertEqual({'a': 'b'}, option.extends_parameters.headers)
+        self.assertEqual(raw, option.to_map())
+        self.assertIsNot(raw, option.to_map())
+
+    class TestValidateModel(DaraModel):
+        _fields = (
+            DaraField('name', 'Name', str, required=True, max_length=5, min_length=2, pattern='^[a-z]+$'),
+            DaraField('size', 'Size', int, maximum=10, minimum=1),
+            DaraField('sub', 'Sub', 'TestValidateModel'),
+            DaraField('items', 'Items', 'TestValidateModel', container=list),
+            DaraField('tags', 'Tags', 'TestValidateModel', container=dict),
+        )
+
+        def __init__(self, name=None, size=None, sub=None, items=None, tags=None):
+            self.name = name
+            self.size = size
+            self.sub = sub
+            self.items = items
+            self.tags = tags
+
+    def test_validate_plan(self):
+        model = self.TestValidateModel
+        model('abc', 5, sub=model('ABC'), items=[model('de'), None], tags={'a': model('fg')}).validate()
+        cases = [
+            (model(size=1), RequiredArgumentException, '"name" is required.'),
+            (model('abcdef'), ValidateException, 'name is exceed max-length: 5'),
+            (model('a'), ValidateException, 'name is less than min-length: 2'),
+            (model('ab1'), ValidateException, 'name is not match: ^[a-z]+$'),
+            (model('abc', 11), ValidateException, 'size is greater than the maximum: 10'),
+            (model('abc', 0), ValidateException, 'size is less than the minimum: 1'),
+            (model('abc', sub=model()), RequiredArgumentException, '"name" is required.'),
+            (model('abc', items=[model('a')]), ValidateException, 'name is less than min-length: 2'),
+            (model('abc', tags={'a': model('a1')}), ValidateException, 'name is not match: ^[a-z]+$'),
+        ]
+        for m, exception, message in cases:
+            with self.assertRaises(exception) as context:
+                m.validate()
+            self.assertEqual(message, str(context.exception))
+
+        with skip_validation():
+            for m, _, _ in cases:
+                m.validate()
+        with self.assertRaises(RequiredArgumentException):
+            model().validate()
+
+        # an explicit validate is kept
+        class Explicit(model):
+            def validate(self):
+                self.validated = True
+
+        m = Explicit()
+        m.validate()
+        self.assertTrue(m.validated)
+
+
+class TestDaraSlotsModel(unittest.TestCase):
+    class TestItem(DaraSlotsModel):
+        _fields = (
+            DaraField('name', 'Name', str),
+            DaraField('size', 'Size', int),
+        )
+
+        def __init__(self, name=None, size=None):
+            self.name = name
+            self.size = size
+
+        def validate(self):
+            self.validate_required(self.name, 'name')
+            self.validate_maximum(self.size, 'size', 10)
+
+    class TestList(DaraSlotsModel):
+        __slots__ = ('cache',)
+        _fields = (
+            DaraField('request_id', 'RequestId', str),
+            DaraField('items', 'Items', 'TestItem', container=list),
+        )
+
+        def __init__(self, request_id=None, items=None):
+            self.request_id = request_id
+            self.items = items
+            self.cache = None
+
+    def test_slots(self):
+        item = self.TestItem('a', 1)
+        self.assertFalse(hasattr(item, '__dict__'))
+        self.assertEqual(('name', 'size'), self.TestItem.__slots__)
+        self.assertEqual(('cache', 'request_id', 'items'), self.TestList.__slots__)
+        with self.assertRaises(AttributeError):
+            item.other = 1
+
+        class Child(self.TestItem):
+            _fields = (
+                DaraField('name', 'Name', str),
+                DaraField('extra', 'Extra', str),
+            )
+
+        self.assertEqual(('extra',), Child.__slots__)
+        self.assertFalse(hasattr(Child(), '__dict__'))
+
+    def test_to_map_from_map(self):
+        model = self.TestList('id', [self.TestItem('a', 1), self.TestItem('b')])
+        expected = {'RequestId': 'id', 'Items': [{'Name': 'a', 'Size': 1}, {'Name': 'b'}]}
+        self.assertEqual(expected, model.to_map())
+        self.assertEqual("{'Name': 'a', 'Size': 1}", str(model.items[0]))
+
+        result = self.TestList().from_map(expected)
+        self.assertIsInstance(result.items[1], self.TestItem)
+        self.assertEqual('b', result.items[1].name)
+        self.assertIsNone(result.items[1].size)
+        self.assertEqual(expected, result.to_map())
+
+        self.assertIsNone(model._map)
+        model._map = {'raw': True}
+        self.assertEqual({'raw': True}, model.to_map())
+
+    def test_validate(self):
+        self.TestItem('a', 1).validate()
+        with self.assertRaises(Exception) as context:
+            self.TestItem(size=1).validate()
+        self.assertEqual('"name" is required.', str(context.exception))
+        with self.assertRaises(Exception) as context:
+            self.TestItem('a', 11).validate()
+        self.assertEqual('size is greater than the maximum: 10', str(context.exception))
+
+    def test_core_helpers(self):
+        from darabonba.core import DaraCore
+
+        item = self.TestItem('a', 1)
+        self.assertEqual({'Name': 'a', 'Size': 1}, DaraCore.to_map(item))
+        self.assertEqual({'Name': 'a', 'Size': 1, 'k': 'v'}, DaraCore.merge(item, {'k': 'v'}))
+        self.assertEqual('{"Name":"a","Size":1}', DaraCore.to_json_string(item))
+        self.assertEqual('b', DaraCore.from_map(self.TestItem(), {'Name': 'b'}).name)
+        # a map that cannot be converted is kept as is
+        model = DaraCore.from_map(self.TestList(), {'Items': 1})
+        self.assertEqual({'Items': 1}, model.to_map())
+
+    def test_lazy_from_map(self):
+        raw = {'RequestId': 'id', 'Items': [{'Name': 'a', 'Size': 1}]}
+        model = self.TestList().from_map(raw, lazy=True)
+        self.assertEqual(raw, model.to_map())
+        self.assertEqual('a', model.items[0].name)
+        self.assertIs(raw['Items'], model.to_map()['Items'])
+        model.items[0].size = 2
+        self.assertEqual({'RequestId': 'id', 'Items': [{'Name': 'a', 'Size': 2}]}, model.to_map())
+        self.assertEqual(1, raw['Items'][0]['Size'])
+        with self.assertRaises(AttributeError):
+            model.not_a_field
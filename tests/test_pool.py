@@ -0,0 +1,266 @@
+import asyncio
+import gc
+import threading
+import time
+import unittest
+import weakref
+from unittest.mock import Mock
+
+from darabonba.pool import AsyncSessionPool, SessionPool
+
+
+class FakeAsyncSession:
+    def __init__(self):
+        self.closed = False
+        self.detached = False
+
+    async def close(self):
+        self.closed = True
+
+    def detach(self):
+        self.detached = True
+        self.closed = True
+
+
+class TestSessionPool(unittest.TestCase):
+
+    def test_get(self):
+        pool = SessionPool()
+        factory = Mock(side_effect=Mock)
+        s1 = pool.get('a', factory)
+        s2 = pool.get('a', factory)
+        s3 = pool.get('b', factory)
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+        self.assertEqual(2, factory.call_count)
+        self.assertIn('a', pool)
+        self.assertIs(s1, pool['a'])
+        self.assertEqual(2, len(pool))
+        with self.assertRaises(KeyError):
+            pool['c']
+        self.assertEqual({'size': 2, 'hits': 1, 'misses': 2, 'evictions': 0}, pool.stats())
+
+    def test_max_size(self):
+        pool = SessionPool(max_size=2)
+        a = pool.get('a', Mock)
+        b = pool.get('b', Mock)
+        pool.get('a', Mock)
+        c = pool.get('c', Mock)
+        self.assertNotIn('b', pool)
+        b.close.assert_called_once()
+        a.close.assert_not_called()
+        c.close.assert_not_called()
+        self.assertEqual(1, pool.stats()['evictions'])
+
+        pool.max_size = 1
+        pool.get('c', Mock)
+        self.assertEqual(['c'], [key for key in ('a', 'b', 'c') if key in pool])
+        a.close.assert_called_once()
+
+    def test_idle_timeout(self):
+        pool = SessionPool(idle_timeout=0.01)
+        a = pool.get('a', Mock)
+        time.sleep(0.02)
+        pool.get('b', Mock)
+        self.assertNotIn('a', pool)
+        a.close.assert_called_once()
+
+    def test_acquired_not_evicted(self):
+        pool = SessionPool(max_size=1)
+        a = pool.acquire('a', Mock)
+        b = pool.get('b', Mock)
+        self.assertIn('a', pool)
+        a.close.assert_not_called()
+        b.close.assert_not_called()
+
+        pool.release('a', a)
+        pool.get('c', Mock)
+        self.assertNotIn('a', pool)
+        a.close.assert_called_once()
+
+        # releasing a session that is not pooled anymore is ignored
+        pool.release('a', a)
+        pool.release('d', Mock())
+
+    def test_close_all(self):
+        pool = SessionPool()
+        a = pool.get('a', Mock)
+        b = pool.get('b', Mock)
+        pool.close_all()
+        self.assertEqual(0, len(pool))
+        a.close.assert_called_once()
+        b.close.assert_called_once()
+
+    def test_concurrent_get(self):
+        pool = SessionPool()
+
+        def factory():
+            time.sleep(0.01)
+            return Mock()
+
+        sessions = []
+        threads = [threading.Thread(target=lambda: sessions.append(pool.get('a', factory)))
+                   for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(1, len(set(map(id, sessions))))
+        self.assertEqual(1, pool.stats()['misses'])
+        self.assertEqual(9, pool.stats()['hits'])
+
+
+class TestAsyncSessionPool(unittest.TestCase):
+
+    def test_session_reuse(self):
+        pool = AsyncSessionPool()
+        factory = Mock(side_effect=FakeAsyncSession)
+
+        async def run():
+            async with pool.session('a', factory) as s1:
+                pass
+            async with pool.session('a', factory) as s2:
+                pass
+            async with pool.session('b', factory) as s3:
+                pass
+            return s1, s2, s3
+
+        s1, s2, s3 = asyncio.run(run())
+        self.assertIs(s1, s2)
+        self.assertIsNot(s1, s3)
+        self.assertEqual(2, factory.call_count)
+
+    def test_recreate_closed_session(self):
+        pool = AsyncSessionPool()
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as s1:
+                await s1.close()
+            async with pool.session('a', FakeAsyncSession) as s2:
+                pass
+            return s1, s2, s2.closed
+
+        s1, s2, closed = asyncio.run(run())
+        self.assertIsNot(s1, s2)
+        self.assertFalse(closed)
+
+    def test_max_size(self):
+        pool = AsyncSessionPool(max_size=2)
+
+        async def run():
+            sessions = []
+            for key in ('a', 'b', 'c'):
+                async with pool.session(key, FakeAsyncSession) as s:
+                    sessions.append(s)
+            return [s.closed for s in sessions]
+
+        self.assertEqual([True, False, False], asyncio.run(run()))
+
+    def test_in_use_not_evicted(self):
+        pool = AsyncSessionPool(max_size=1)
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as a:
+                async with pool.session('b', FakeAsyncSession) as b:
+                    self.assertFalse(a.closed)
+                    self.assertFalse(b.closed)
+                async with pool.session('c', FakeAsyncSession) as c:
+                    pass
+            return [a.closed, b.closed, c.closed]
+
+        self.assertEqual([False, True, False], asyncio.run(run()))
+
+    def test_idle_timeout(self):
+        pool = AsyncSessionPool(idle_timeout=0)
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as a:
+                pass
+            await asyncio.sleep(0.01)
+            async with pool.session('b', FakeAsyncSession) as b:
+                pass
+            return [a.closed, b.closed]
+
+        self.assertEqual([True, False], asyncio.run(run()))
+
+    def test_close(self):
+        pool = AsyncSessionPool()
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as a:
+                pass
+            await pool.close()
+            async with pool.session('a', FakeAsyncSession) as b:
+                pass
+            return a, b
+
+        a, b = asyncio.run(run())
+        self.assertTrue(a.closed)
+        self.assertIsNot(a, b)
+
+    def test_closed_loop_released(self):
+        pool = AsyncSessionPool()
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as s:
+                return s
+
+        # the sessions are closed along with the loop
+        first = asyncio.run(run())
+        self.assertTrue(first.closed)
+        self.assertFalse(first.detached)
+        self.assertEqual([], [loop for loop in pool._loops if pool._find_lru(loop)])
+
+        # or detached once the loop is found closed
+        loop = asyncio.new_event_loop()
+        second = loop.run_until_complete(run())
+        type(loop).close(loop)
+        third = asyncio.run(run())
+        self.assertTrue(second.detached)
+        self.assertIsNot(second, third)
+        self.assertIsNone(pool._find_lru(loop))
+        self.assertEqual([], [loop for loop in pool._loops if pool._find_lru(loop)])
+
+    def test_unclosed_loop_collected(self):
+        pool = AsyncSessionPool()
+
+        class LoopSession(FakeAsyncSession):
+            def __init__(self):
+                super().__init__()
+                # like aiohttp, the session holds its loop
+                self.loop = asyncio.get_running_loop()
+
+        async def run():
+            async with pool.session('a', LoopSession) as s:
+                return s
+
+        loop = asyncio.new_event_loop()
+        session = weakref.ref(loop.run_until_complete(run()))
+        loop_ref = weakref.ref(loop)
+        self.assertIsNotNone(pool._find_lru(loop))
+        del loop
+        gc.collect()
+        self.assertIsNone(loop_ref())
+        self.assertIsNone(session())
+        self.assertEqual(0, len(pool._loops))
+
+    def test_close_with_loop_once(self):
+        pool = AsyncSessionPool()
+
+        async def run():
+            async with pool.session('a', FakeAsyncSession) as a:
+                pass
+            closer = loop.close
+            await pool.close()
+            async with pool.session('a', FakeAsyncSession) as b:
+                pass
+            return a, b, closer
+
+        loop = asyncio.new_event_loop()
+        a, b, closer = loop.run_until_complete(run())
+        self.assertIs(closer, loop.close)
+        self.assertIsNone(closer.previous)
+        loop.close()
+        self.assertTrue(a.closed)
+        self.assertTrue(b.closed)
+        self.assertTrue(loop.is_closed())
@@ -1,6 +1,6 @@
 import unittest
 from io import BytesIO
-from darabonba.utils.form import Form, FileField
+from darabonba.utils.form import Form, FileField, FileFormInputStream
 from darabonba.exceptions import RequiredArgumentException
 
 class TestForm(unittest.TestCase):
@@ -110,6 +110,58 @@ class TestForm(unittest.TestCase):
         self.assertEqual(content.encode(), form_str)
         self.assertEqual(len(content.encode()), len(form_str))
         
+    def test_file_form_chunks(self):
+        form = {
+            'stringkey': 'v' * 3000,
+            'filefield1': FileField(filename='a.bin', content_type='application/octet-stream',
+                                    content=BytesIO(b'a' * 1024)),
+            'filefield2': FileField(filename='b.txt', content_type='text/plain', content=BytesIO(b'bbb')),
+            'filefield3': FileField(filename='c.txt', content_type='text/plain', content=b'ccc'),
+        }
+        content = "--boundary\r\n" + \
+                  "Content-Disposition: form-data; name=\"stringkey\"\r\n\r\n" + \
+                  "v" * 3000 + "\r\n" + \
+                  "--boundary\r\n" + \
+                  "Content-Disposition: form-data; name=\"filefield1\"; filename=\"a.bin\"\r\n" + \
+                  "Content-Type: application/octet-stream\r\n\r\n" + \
+                  "a" * 1024 + "\r\n" + \
+                  "--boundary\r\n" + \
+                  "Content-Disposition: form-data; name=\"filefield2\"; filename=\"b.txt\"\r\n" + \
+                  "Content-Type: text/plain\r\n\r\n" + \
+                  "bbb\r\n" + \
+                  "--boundary\r\n" + \
+                  "Content-Disposition: form-data; name=\"filefield3\"; filename=\"c.txt\"\r\n" + \
+                  "Content-Type: text/plain\r\n\r\n" + \
+                  "ccc\r\n" + \
+                  "--boundary--\r\n"
+        content = content.encode('utf-8')
+
+        for size in (1, 7, 1024, 65536):
+            body = FileFormInputStream(form, 'boundary', size)
+            self.assertEqual(len(content), len(body))
+            chunks = list(body)
+            self.assertTrue(all(len(chunk) <= size for chunk in chunks))
+            self.assertEqual(content, b''.join(chunks))
+            # the stream is rewound at the end to be sent again
+            self.assertEqual(content, body.read())
+            self.assertEqual(b'', body.read())
+
+            buf = bytearray(size)
+            result = bytearray()
+            while True:
+                n = body.readinto(buf)
+                if not n:
+                    break
+                result += buf[:n]
+            self.assertEqual(content, bytes(result))
+            for field in form.values():
+                if isinstance(field, FileField) and hasattr(field.content, 'seek'):
+                    field.content.seek(0)
+
+        body = Form.to_file_form({}, 'boundary')
+        self.assertEqual(len(b'--boundary--\r\n'), len(body))
+        self.assertEqual(b'--boundary--\r\n', body.read(1024))
+
 class TestFileField(unittest.TestCase):
     
     def test_file_field_validate(self):
@@ -0,0 +1,152 @@
+import datetime
+import json
+import unittest
+
+from darabonba.utils import json_codec
+
+
+class TestJSONCodec(unittest.TestCase):
+
+    def tearDown(self):
+        json_codec.set_backend()
+
+    def test_loads(self):
+        for backend in json_codec._backends:
+            json_codec.set_backend(backend)
+            self.assertEqual(backend, json_codec.get_backend())
+            self.assertEqual({'a': ['你', 1.5, None]}, json_codec.loads('{"a": ["你", 1.5, null]}'))
+            self.assertEqual({'a': '你'}, json_codec.loads('{"a": "你"}'.encode('utf-8')))
+            self.assertEqual([1], json_codec.loads(bytearray(b'[1]')))
+            self.assertEqual([1], json_codec.loads(memoryview(b'[1]')))
+            with self.assertRaises(ValueError):
+                json_codec.loads(b'{"a":')
+
+    def test_loads_big_integers(self):
+        self.assertEqual('json', json_codec.get_backend())
+        for doc in ('12345678901234567890123', b'12345678901234567890123', memoryview(b'12345678901234567890123')):
+            result = json_codec.loads(doc)
+            self.assertIs(int, type(result))
+            self.assertEqual(12345678901234567890123, result)
+        self.assertEqual([-9999999999999999999], json_codec.loads(b'[-9999999999999999999]'))
+
+    def test_loads_errors(self):
+        def failing(data):
+            raise OverflowError('not supported')
+
+        json_codec._backends['failing'] = failing
+        try:
+            json_codec.set_backend('failing')
+            self.assertEqual([1], json_codec.loads(memoryview(b'[1]')))
+            with self.assertRaises(ValueError):
+                json_codec.loads(b'[1,')
+        finally:
+            del json_codec._backends['failing']
+
+    def test_set_backend(self):
+        json_codec.set_backend('json')
+        self.assertIs(json.loads, json_codec._loads)
+        with self.assertRaises(ValueError):
+            json_codec.set_backend('unknown')
+        self.assertEqual('json', json_codec.get_backend())
+        for backend in json_codec._backends:
+            json_codec.set_backend(backend)
+            json_codec.set_backend()
+            self.assertEqual('json', json_codec.get_backend())
+
+    def test_dumps(self):
+        def default(o):
+            if isinstance(o, bytes):
+                return o.decode('utf-8')
+            raise TypeError(f'{type(o)} is not serializable')
+
+        for backend in json_codec._backends:
+            json_codec.set_backend(backend)
+            self.assertEqual('{"a":["你",1.5,null,true],"1":"http://a/b"}',
+                             json_codec.dumps({'a': ['你', 1.5, None, True], 1: 'http://a/b'}))
+            self.assertEqual('{"b":"100"}', json_codec.dumps({'b': b'100'}, default=default))
+            self.assertEqual(str(2 ** 70), json_codec.dumps(2 ** 70))
+            self.assertEqual('[NaN,1e+16]', json_codec.dumps([float('nan'), 1e16]))
+            with self.assertRaises(TypeError):
+                json_codec.dumps({'a': {1, 2}})
+            with self.assertRaises(TypeError):
+                json_codec.dumps({'a': datetime.datetime(2024, 1, 1)})
+            with self.assertRaises(TypeError):
+                json_codec.dumps({'a': {1, 2}}, default=default)
+
+
+class TestJSONItemParser(unittest.TestCase):
+    doc = {
+        'RequestId': 'id',
+        'Meta': {'Other': [[1], {'a': '}]'}], 'Escaped': '\\"{['},
+        'Instances': {
+            'Skip': [{'a': [1, 2]}],
+            'Instance': [{'Id': 'i-%d' % i, 'Name': '名称"]}{[%d' % i, 'Values': [i, None, True, -1.5e3]}
+                         for i in range(20)] + [1, 'str', None, [], {}, [[[[[[[['deep', ',]']]]]]]]], 2],
+        },
+        'Total': 20,
+    }
+
+    def test_parse(self):
+        expected = self.doc['Instances']['Instance']
+        for indent in (None, 2):
+            blob = json.dumps(self.doc, ensure_ascii=False, indent=indent).encode('utf-8')
+            self.assertEqual(expected, list(json_codec.JSONItemParser('Instances.Instance').parse([blob])))
+            # every chunk size, so that each token is split at every byte
+            for size in (1, 2, 3, 7, 64):
+                chunks = [blob[i:i + size] for i in range(0, len(blob), size)]
+                self.assertEqual(expected, list(json_codec.JSONItemParser(['Instances', 'Instance']).parse(chunks)))
+            self.assertEqual([[1], {'a': '}]'}], list(json_codec.JSONItemParser('Meta.Other').parse([blob])))
+            self.assertEqual([], list(json_codec.JSONItemParser('Missing').parse([blob])))
+            self.assertEqual([], list(json_codec.JSONItemParser('RequestId').parse([blob])))
+
+        blob = json.dumps(expected)
+        self.assertEqual(expected, list(json_codec.JSONItemParser().parse([blob[:10], blob[10:]])))
+        self.assertEqual([], list(json_codec.JSONItemParser().parse([' [ ] '])))
+
+    def test_large_elements(self):
+        expected = ['a\\"b' * 1000, {'s': ['x\\"' * 500, {'t': 'y' * 2000}]}, 1]
+        blob = json.dumps({'Skip': ['z\\"' * 500], 'a': expected}).encode('utf-8')
+        for size in (1, 2, 3, 7, 64):
+            chunks = [blob[i:i + size] for i in range(0, len(blob), size)]
+            self.assertEqual(expected, list(json_codec.JSONItemParser('a').parse(chunks)))
+
+    def test_feed(self):
+        parser = json_codec.JSONItemParser('a')
+        self.assertEqual([], parser.feed(b'{"a": [{"b": 1'))
+        self.assertEqual([{'b': 1}, 2], parser.feed(b'}, 2, 3'))
+        self.assertFalse(parser.done)
+        self.assertEqual([3], parser.feed(b'] '))
+        self.assertTrue(parser.done)
+        self.assertEqual([], parser.feed(b', "b": 1}'))
+        self.assertEqual([], parser.close())
+
+    def test_tail(self):
+        self.assertEqual([1], list(json_codec.JSONItemParser().parse([b'[1]', b' \r\n\t'])))
+        self.assertEqual([1], list(json_codec.JSONItemParser('a').parse([b'{"a": [1], "a": [2], ', b'"b": {"a": 3}} '])))
+        self.assertEqual([], list(json_codec.JSONItemParser('a.b').parse([b'{"a": {"c": 1}, "b": [2]}'])))
+
+        parser = json_codec.JSONItemParser()
+        self.assertEqual([1], parser.feed(b'[1]'))
+        self.assertTrue(parser.done)
+        with self.assertRaises(ValueError) as context:
+            parser.feed(b' x')
+        self.assertEqual('Invalid JSON document at offset 4', str(context.exception))
+
+    def test_big_integers(self):
+        expected = [12345678901234567890123, {'a': -9999999999999999999}, 1, 12345678901234567890123]
+        blob = b'[12345678901234567890123, {"a": -9999999999999999999}, 1, 12345678901234567890123]'
+        for chunks in ([blob], [blob[:40], blob[40:]]):
+            result = list(json_codec.JSONItemParser().parse(chunks))
+            self.assertEqual(expected, result)
+            self.assertIs(int, type(result[0]))
+            self.assertIs(int, type(result[-1]))
+
+    def test_invalid(self):
+        for path, blob in ((None, b'[1, 2'), (None, b'[1 2]'), (None, b'{"a": []}'), ('a', b'{"a" 1}'),
+                           ('a', b'{"a": [1, "abc'), ('a', b'{"a": [{"b": 1}'), ('a', b'[1]'),
+                           (None, b'[1, 2, ]'), (None, b'[1,]'), (None, b'[{"b": 1},]'), ('a', b'{"b": 1, }'),
+                           ('a', b'{"b": 1, "a": [1, ]}'), (None, b'[1]x'), (None, b'[1] ]'), ('a', b'{"a": [1]}x'),
+                           ('a', b'{"a": [1], "b": 1 x}'), ('a', b'{"a": [1]'), ('a', b'{"a": null} {}'),
+                           ('a.b', b'{"a": {"c": 1}, "d": 2,}')):
+            with self.assertRaises(ValueError):
+                list(json_codec.JSONItemParser(path).parse([blob]))
@@ -1,8 +1,11 @@
+import json
 import unittest
 from unittest import mock
 import asyncio
-from darabonba.exceptions import DaraException
-from darabonba.utils.stream import Stream, BaseStream, READABLE, WRITABLE, STREAM_CLASS
+from darabonba.core import DaraCore
+from darabonba.event import Event, SSEEvent
+from darabonba.exceptions import DaraException, SSEOverflowException
+from darabonba.utils.stream import Stream, BaseStream, SSEParser, READABLE, WRITABLE, STREAM_CLASS
 import os
 from io import BytesIO, StringIO
 
@@ -63,7 +66,46 @@ class TestStream(unittest.TestCase):
         self.assertEqual(Stream.read_as_bytes('string data'), b'string data')
         self.stream.write('stream data')
         self.assertEqual(Stream.read_as_bytes(self.stream.read()), b'stream data')
-    
+
+    def test_read_as_bytes_readable(self):
+        data = os.urandom(300 * 1024)
+
+        class Readable:
+            def __init__(self):
+                self.buf = BytesIO(data)
+                self.sizes = []
+
+            def read(self, size=-1):
+                self.sizes.append(size)
+                return self.buf.read(size)
+
+            def __iter__(self):
+                return self
+
+        class ReadableInto(Readable):
+            def readinto(self, b):
+                n = self.buf.readinto(b[:1000])
+                self.sizes.append(n)
+                return n
+
+        f = Readable()
+        self.assertEqual(data, Stream.read_as_bytes(f, 1024 * 100))
+        self.assertEqual([1024 * 100] * 4, f.sizes)
+
+        f = ReadableInto()
+        self.assertEqual(data, Stream.read_as_bytes(f))
+        self.assertEqual(0, f.sizes[-1])
+
+        f = BytesIO(data)
+        f.read(10)
+        self.assertEqual(data[10:], Stream.read_as_bytes(f))
+        self.assertEqual(b'', Stream.read_as_bytes(f))
+
+        with open(os.path.join(root_path, 'test.txt'), 'rb') as f:
+            expected = f.read()
+            f.seek(0)
+            self.assertEqual(expected, Stream.read_as_bytes(f))
+
     def test_read_as_bytes_async(self):
         task1 = asyncio.run(Stream.read_as_bytes_async(b'test'))
 
@@ -78,6 +120,12 @@ class TestStream(unittest.TestCase):
         self.assertEqual(Stream.read_as_json(json_bytes), {"key": "value"})
     
     
+    def test_read_as_json_bytes(self):
+        self.assertEqual({"key": "你好"}, Stream.read_as_json(BytesIO('{"key": "你好"}'.encode('utf-8'))))
+        with self.assertRaises(RuntimeError) as context:
+            Stream.read_as_json(BytesIO(b'{"key": '))
+        self.assertEqual('Failed to parse the value as json format, Value: "{"key": ".', str(context.exception))
+
     def test_read_as_json_async(self):
         task1 = asyncio.run(Stream.read_as_json_async(b'{"key": "value"}'))
         self.assertEqual({"key": "value"}, task1)
@@ -310,4 +358,257 @@ class TestStream(unittest.TestCase):
             # Close should be called
             mock_response.close.assert_called_once()
         
-        asyncio.run(run_test())
\ No newline at end of file
+        asyncio.run(run_test())
+
+class TestSSEParser(unittest.TestCase):
+    sse_data = (b'id: 1\r\nevent: create\r\ndata: {"message": "test1"}\r\ndata:  second line\r\n\r\n'
+                b': comment\rretry: 3000\rdata: test2\r\r'
+                b'data: \xe4\xbd\xa0\xe5\xa5\xbd\n\n'
+                b'raw line\n\n'
+                b'data: tail')
+
+    expected = [
+        {'id': '1', 'event': 'create', 'data': '{"message": "test1"}\n second line'},
+        {'event': 'message', 'data': 'test2', 'retry': 3000},
+        {'event': 'message', 'data': '你好'},
+        {'event': 'message', 'data': 'raw line'},
+        {'event': 'message', 'data': 'tail'},
+    ]
+
+    def test_parse(self):
+        self.assertEqual(self.expected, [e.to_map() for e in SSEParser().parse([self.sse_data])])
+
+    def test_parse_split_chunks(self):
+        # every possible split point, including inside CRLF and multi-byte characters
+        for i in range(1, len(self.sse_data)):
+            chunks = [self.sse_data[:i], self.sse_data[i:]]
+            self.assertEqual(self.expected, [e.to_map() for e in SSEParser().parse(chunks)], i)
+        chunks = [self.sse_data[i:i + 1] for i in range(len(self.sse_data))]
+        self.assertEqual(self.expected, [e.to_map() for e in SSEParser().parse(chunks)])
+
+    def test_last_event_id(self):
+        parser = SSEParser()
+        self.assertIsNone(parser.last_event_id)
+        self.assertIsNone(parser.retry)
+        self.assertEqual([], parser.feed(b'id: 7\nretry: 50\n\n'))
+        self.assertEqual('7', parser.last_event_id)
+        self.assertEqual(50, parser.retry)
+        events = parser.feed(b'data: a\n\nid: 8\ndata: b\n\n')
+        self.assertEqual([None, '8'], [e.id for e in events])
+        self.assertEqual('8', parser.last_event_id)
+
+    def test_feed(self):
+        parser = SSEParser()
+        self.assertEqual([], parser.feed(b'data: a'))
+        self.assertEqual(7, parser.buffered)
+        self.assertEqual([], parser.feed('bc\r'))
+        self.assertEqual(0, parser.buffered)
+        events = parser.feed(b'\n\r\n')
+        self.assertEqual(['abc'], [e.data for e in events])
+        self.assertEqual([], parser.feed(b'event: ping\n\n'))
+        self.assertEqual([], parser.close())
+
+    def test_read_as_sse(self):
+        mock_response = mock.MagicMock()
+        mock_response.iter_content.return_value = [self.sse_data[i:i + 5] for i in range(0, len(self.sse_data), 5)]
+        events = list(Stream.read_as_sse(mock_response))
+        self.assertEqual([e['data'] for e in self.expected], [e.data for e in events])
+        self.assertEqual('create', events[0].event)
+        self.assertEqual(3000, events[1].retry)
+
+    def test_read_as_sse_async(self):
+        sse_data = self.sse_data
+
+        class Content:
+            async def iter_chunked(self, size):
+                for i in range(0, len(sse_data), 7):
+                    yield sse_data[i:i + 7]
+
+        response = mock.MagicMock()
+        response.content = Content()
+
+        async def run():
+            return [event async for event in Stream.read_as_sse_async(response)]
+
+        events = asyncio.run(run())
+        self.assertEqual([e['data'] for e in self.expected], [e.data for e in events])
+        self.assertEqual('1', events[0].id)
+
+    def test_max_line_size(self):
+        with self.assertRaises(SSEOverflowException) as context:
+            list(SSEParser(max_line_size=10).parse([b'data: 0123456789\n\n']))
+        self.assertEqual(10, context.exception.limit)
+        self.assertEqual('SSEOverflow', context.exception.code)
+
+        parser = SSEParser(max_line_size=10)
+        with self.assertRaises(SSEOverflowException):
+            parser.feed(b'data: 01234')
+            parser.feed(b'56789')
+
+        parser = SSEParser(max_line_size=10, overflow='truncate')
+        chunks = [b'data: 01', b'23456789', b'abcdef', b'ghi\r', b'\ndata: ok\n\n', b'data: next\n\n']
+        events = [e.to_map() for e in parser.parse(chunks)]
+        self.assertEqual([
+            {'event': 'message', 'data': '0123\nok', 'truncated': True},
+            {'event': 'message', 'data': 'next'},
+        ], events)
+        self.assertEqual(0, parser.buffered)
+
+    def test_max_event_size(self):
+        chunks = [b'data: 0123\n', b'data: 4567\n', b'data: 89\n', b'id: 1\n\n', b'data: next\n\n']
+        with self.assertRaises(SSEOverflowException) as context:
+            list(SSEParser(max_event_size=10).parse(chunks))
+        self.assertEqual(10, context.exception.limit)
+
+        events = [e.to_map() for e in SSEParser(max_event_size=10, overflow='truncate').parse(chunks)]
+        self.assertEqual([
+            {'id': '1', 'event': 'message', 'data': '0123\n4567\n', 'truncated': True},
+            {'event': 'message', 'data': 'next'},
+        ], events)
+
+        with self.assertRaises(ValueError):
+            SSEParser(overflow='drop')
+
+    def test_read_as_sse_truncate(self):
+        mock_response = mock.MagicMock()
+        mock_response.iter_content.return_value = [b'data: 0123456789\n\n', b'data: ok\n\n']
+        events = list(Stream.read_as_sse(mock_response, max_event_size=4, overflow='truncate'))
+        self.assertEqual(['0123', 'ok'], [e.data for e in events])
+        self.assertTrue(events[0].truncated)
+        self.assertIsNone(events[1].truncated)
+        self.assertEqual({'event': 'message', 'data': '0123', 'truncated': True}, events[0].to_map())
+
+        mock_response.iter_content.return_value = [b'data: 0123456789\n\n']
+        with self.assertRaises(SSEOverflowException):
+            list(Stream.read_as_sse(mock_response, max_event_size=4))
+
+    def test_read_as_sse_backpressure(self):
+        pulled = []
+
+        def chunks():
+            for i in range(3):
+                pulled.append(i)
+                yield b'data: %d\n\n' % i
+
+        mock_response = mock.MagicMock()
+        mock_response.iter_content.return_value = chunks()
+        events = Stream.read_as_sse(mock_response)
+        self.assertEqual('0', next(events).data)
+        self.assertEqual([0], pulled)
+        self.assertEqual('1', next(events).data)
+        self.assertEqual([0, 1], pulled)
+
+    def test_sse_event(self):
+        event = next(SSEParser().parse([b'id: 1\nevent: update\ndata: test\nretry: 10\n\n']))
+        self.assertIsInstance(event, SSEEvent)
+        self.assertIsInstance(event, Event)
+        event.validate()
+        self.assertEqual({'id': '1', 'event': 'update', 'data': 'test', 'retry': 10}, event.to_map())
+        self.assertEqual(event.to_map(), DaraCore.to_map(event))
+
+        # the decoding error is not part of the map
+        event = next(SSEParser(decode=json.loads).parse([b'id: 2\ndata: {\n\n']))
+        self.assertIsInstance(event.error, ValueError)
+        self.assertEqual({'id': '2', 'event': 'message', 'data': '{'}, event.to_map())
+        json.dumps(DaraCore.to_map(event))
+        self.assertIn(f'error={event.error!r}', repr(event))
+        self.assertEqual("SSEEvent(id='1', event=None, data='a', retry=None, truncated=True, error=None)",
+                         repr(SSEEvent(id='1', data='a', truncated=True)))
+
+        event = next(SSEParser().parse([b'id: 1\nevent: update\ndata: test\nretry: 10\n\n']))
+        model = event.to_event()
+        self.assertIsInstance(model, Event)
+        self.assertEqual(event.to_map(), model.to_map())
+        self.assertIsNone(model.truncated)
+
+    def test_multi_line_data(self):
+        lines = [b'data: {"line": %d}' % i for i in range(10000)]
+        chunks = [b'\n'.join(lines) + b'\n\n', b'data: next\n\n']
+        events = list(SSEParser().parse(chunks))
+        self.assertEqual('\n'.join('{"line": %d}' % i for i in range(10000)), events[0].data)
+        self.assertEqual('next', events[1].data)
+
+    def test_raw(self):
+        chunks = [b'id: 1\ndata: {"a":\ndata: "\xe4\xbd\xa0"}\n\n']
+        event = next(SSEParser(raw=True).parse(chunks))
+        self.assertEqual(b'{"a":\n"\xe4\xbd\xa0"}', event.data)
+        self.assertEqual('1', event.id)
+
+        mock_response = mock.MagicMock()
+        mock_response.iter_content.return_value = chunks
+        event = next(Stream.read_as_sse(mock_response, raw=True))
+        self.assertEqual({'a': '你'}, json.loads(event.data))
+
+    def test_read_as_sse_decode_json(self):
+        chunks = [b'id: 1\ndata: {"text": "\xe4\xbd\xa0"}\n\n', b'data: [DONE]\n\n', b'data: [1,\ndata: 2]\n\n']
+        mock_response = mock.MagicMock()
+        mock_response.iter_content.return_value = chunks
+        events = list(Stream.read_as_sse(mock_response, decode='json'))
+        self.assertEqual({'text': '你'}, events[0].data)
+        self.assertIsNone(events[0].error)
+        self.assertEqual('[DONE]', events[1].data)
+        self.assertIsInstance(events[1].error, ValueError)
+        self.assertEqual([1, 2], events[2].data)
+
+        events = list(SSEParser(decode=lambda data: data.upper()).parse([b'data: abc\n\n']))
+        self.assertEqual(b'ABC', events[0].data)
+
+        with self.assertRaises(ValueError):
+            list(Stream.read_as_sse(mock_response, decode='xml'))
+
+    def test_read_as_sse_async_decode_json(self):
+        class Content:
+            async def iter_chunked(self, size):
+                yield b'data: {"a": 1}\n\ndata: {"a":\n\n'
+
+        response = mock.MagicMock()
+        response.content = Content()
+
+        async def run():
+            return [event async for event in Stream.read_as_sse_async(response, decode='json')]
+
+        events = asyncio.run(run())
+        self.assertEqual({'a': 1}, events[0].data)
+        self.assertEqual('{"a":', events[1].data)
+        self.assertIsInstance(events[1].error, ValueError)
+
+    def test_read_as_json_items(self):
+        doc = {'RequestId': 'id', 'Instances': {'Instance': [{'Id': i, 'Name': '名称'} for i in range(1000)]}}
+        blob = json.dumps(doc, ensure_ascii=False).encode('utf-8')
+        items = Stream.read_as_json_items(BytesIO(blob), 'Instances.Instance', block_size=100)
+        self.assertEqual({'Id': 0, 'Name': '名称'}, next(items))
+        self.assertEqual(doc['Instances']['Instance'][1:], list(items))
+        self.assertEqual([1, 2], list(Stream.read_as_json_items('[1, 2]')))
+        self.assertEqual([1, 2], list(Stream.read_as_json_items(b'{"a": [1, 2]}', 'a')))
+        with self.assertRaises(RuntimeError) as context:
+            list(Stream.read_as_json_items(b'{"a": [1, 2'))
+        self.assertIn('Failed to parse the value as json format', str(context.exception))
+        with self.assertRaises(RuntimeError):
+            list(Stream.read_as_json_items(BytesIO(b'[1]x'), block_size=1))
+
+    def test_read_as_json_items_async(self):
+        blob = json.dumps({'a': {'b': [{'Id': i} for i in range(100)]}}).encode('utf-8')
+
+        class Body:
+            async def read(self):
+                return blob
+
+            def __aiter__(self):
+                return self.iterate()
+
+            async def iterate(self):
+                for i in range(0, len(blob), 10):
+                    yield blob[i:i + 10]
+
+        async def run(stream):
+            return [item async for item in Stream.read_as_json_items_async(stream, 'a.b')]
+
+        self.assertEqual([{'Id': i} for i in range(100)], asyncio.run(run(Body())))
+        self.assertEqual([{'Id': i} for i in range(100)], asyncio.run(run(blob)))
+
+        async def run_invalid(stream):
+            return [item async for item in Stream.read_as_json_items_async(stream)]
+
+        for stream in (b'[1,', b'[1]x'):
+            with self.assertRaises(RuntimeError):
+                asyncio.run(run_invalid(stream))
@@ -1,5 +1,6 @@
 import unittest
-from darabonba.utils.validation import assert_integer_positive, validate_pattern, is_null
+import re
+from darabonba.utils.validation import assert_integer_positive, validate_pattern, is_null, compile_pattern
 from darabonba.exceptions import ValidateException
 
 
@@ -22,6 +23,15 @@ class TestValidation(unittest.TestCase):
         with self.assertRaises(ValidateException) as context:
             validate_pattern("abcdef", "test_param", r"\d+")
         self.assertEqual(str(context.exception), "The parameter test_param not match with \\d+")
+        self.assertIsNone(validate_pattern("ABC", "test_param", r"^abc$"))
+
+    def test_compile_pattern(self):
+        pattern = compile_pattern(r"^abc$")
+        self.assertIs(pattern, compile_pattern(r"^abc$"))
+        self.assertEqual(re.M | re.I, pattern.flags & (re.M | re.I))
+        self.assertTrue(pattern.search("x\nABC"))
+        compiled = re.compile(r"\d")
+        self.assertIs(compiled, compile_pattern(compiled))
 
     def test_is_null(self):
         with self.assertRaises(ValidateException) as context:
@@ -1,6 +1,9 @@
+import io
 import unittest
+from xml.etree import ElementTree
 
 from darabonba.utils.xml import XML as xml
+from darabonba.response import DaraResponse
 from darabonba.model import DaraModel
 
 
@@ -107,3 +110,118 @@ class TestClient(unittest.TestCase):
             xml.to_xml(dic)
         except Exception as e:
             self.assertEqual('Missing root tag', str(e))
+
+    def test_parse_xml_stream(self):
+        docs = [
+            '<a/>',
+            '<a>  </a>',
+            '<a k="1"> t </a>',
+            '<a>t<b>1</b>tail<b>2</b><c/></a>',
+            '<?xml version="1.0" encoding="utf-8"?><r xmlns:p="urn:p"><p:i a="&amp;">&lt;1&gt;'
+            '<![CDATA[<raw>]]></p:i><!-- c --><i>2</i></r>',
+            '<r><e><k>1</k><k>2</k><m a="b">v<n/></m></e><e/><f>  中文  </f></r>',
+        ]
+        for doc in docs:
+            expected = xml._parse_xml(ElementTree.fromstring(doc))
+            data = doc.encode('utf-8')
+            response = DaraResponse()
+            response.body = data
+            self.assertEqual(expected, xml.parse_xml(doc))
+            self.assertEqual(expected, xml.parse_xml(data, block_size=1))
+            self.assertEqual(expected, xml.parse_xml(io.BytesIO(data), block_size=3))
+            self.assertEqual(expected, xml.parse_xml(iter([data[:5], data[5:]])))
+            self.assertEqual(expected, xml.parse_xml(response))
+
+        with self.assertRaises(ElementTree.ParseError):
+            xml.parse_xml(b'<a><b></a>')
+        with self.assertRaises(ElementTree.ParseError):
+            xml.parse_xml(b'')
+
+    def test_parse_xml_items(self):
+        doc = (b'<ListBucketResult><Name>bucket</Name>'
+               b'<Contents><Key>a</Key><Owner><ID>1</ID></Owner></Contents>'
+               b'<Other><Contents><Key>not matched</Key></Contents></Other>'
+               b'<Contents a="1"><Key>b</Key></Contents>'
+               b'<Contents/></ListBucketResult>')
+        expected = [
+            {'Key': 'a', 'Owner': {'ID': '1'}},
+            {'Key': 'b', '@a': '1'},
+            None,
+        ]
+        self.assertEqual(expected, list(xml.parse_xml_items(doc, 'ListBucketResult/Contents')))
+        self.assertEqual(expected, list(xml.parse_xml_items(io.BytesIO(doc), ['ListBucketResult', 'Contents'], 4)))
+        self.assertEqual([{'Key': 'not matched'}],
+                         list(xml.parse_xml_items(doc, 'ListBucketResult/Other/Contents')))
+        self.assertEqual([], list(xml.parse_xml_items(doc, 'ListBucketResult/Missing')))
+
+        # the elements are produced while the body is read
+        chunks = [doc[i:i + 8] for i in range(0, len(doc), 8)]
+        read = []
+
+        def body():
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        items = xml.parse_xml_items(body(), 'ListBucketResult/Contents')
+        self.assertEqual('a', next(items)['Key'])
+        self.assertLess(len(read), len(chunks))
+
+
+    def test_xml_backend(self):
+        from darabonba.utils import xml as xml_module
+        backends = [xml_module.XML_BACKEND_ETREE]
+        if xml_module.lxml_etree is not None:
+            backends.append(xml_module.XML_BACKEND_LXML)
+        self.assertIn(xml.get_backend(), backends)
+        with self.assertRaises(ValueError):
+            xml.set_backend('unknown')
+        try:
+            for backend in backends:
+                xml.set_backend(backend)
+                self.assertEqual(backend, xml.get_backend())
+                self.test_parse_xml_stream()
+                self.test_parse_xml_items()
+                self.assertEqual({'a': 'é'},
+                                 xml.parse_xml('<?xml version="1.0" encoding="ISO-8859-1"?><a>é</a>'.encode('latin-1')))
+                with self.assertRaises(ElementTree.ParseError) as e:
+                    xml.parse_xml('<a>\n<b></a>')
+                self.assertEqual(2, e.exception.position[0])
+                # external entities are never loaded
+                with self.assertRaises(ElementTree.ParseError):
+                    xml.parse_xml('<!DOCTYPE a [<!ENTITY e SYSTEM "file:///etc/passwd">]><a>&e;</a>')
+        finally:
+            xml.set_backend()
+    def test_to_xml_text(self):
+        body = {'r': {
+            'a': '中&<>"\'',
+            'b': '',
+            'c': None,
+            'd': {},
+            'e': [1, [2, 3], [], None, {'x': 1}],
+            'f': True,
+            'g': b'x',
+        }}
+        expected = ('<?xml version="1.0" encoding="utf-8"?><r><a>&#20013;&amp;&lt;&gt;"\'</a><b /><c /><d />'
+                    '<e>1</e><e>2</e><e>3</e><e /><e /><e><x>1</x></e><f>True</f><g>b\'x\'</g></r>')
+        self.assertEqual(expected, xml.to_xml(body))
+        self.assertEqual('<?xml version="1.0" encoding="utf-8"?><a>1</a><b />', xml.to_xml({'a': 1, 'b': None}))
+
+        with self.assertRaises(TypeError) as context:
+            xml.to_xml({'r': {1: 2}})
+        self.assertEqual('cannot serialize 1 (type int)', str(context.exception))
+        with self.assertRaises(RuntimeError) as context:
+            xml.to_xml({'r': [1]})
+        self.assertEqual('Missing root tag', str(context.exception))
+
+    def test_write_xml(self):
+        body = {'Delete': {'Quiet': 'true', 'Object': [{'Key': f'对象-{i}&'} for i in range(3000)]}}
+        stream = io.BytesIO()
+        xml.write_xml(body, stream)
+        self.assertEqual(xml.to_xml(body).encode('ascii'), stream.getvalue())
+        self.assertEqual(3000, len(xml.parse_xml(stream.getvalue())['Delete']['Object']))
+
+        stream = io.BytesIO()
+        xml.write_xml({}, stream)
+        xml.write_xml(None, stream)
+        self.assertEqual(b'', stream.getvalue())